@@ -0,0 +1,431 @@
+"""
+FoodDelight analytics snapshot
+- Incremental exporter: new orders, order items and payments are appended to
+  Parquet files partitioned by order month, tracked by an order_id high-water mark
+- Orders changed since the last export (status, partner, payment) are found
+  through the order_events change log and re-exported into the same batch
+- AnalyticsEngine computes the admin reports with pandas over those files,
+  so report traffic never reaches the MySQL server that serves checkout
+
+    python analytics.py export                  # append everything new since the last export
+    python analytics.py export --full           # drop the snapshot and rebuild it
+    python analytics.py report top_spenders
+
+Every export writes one numbered batch; rows of a later batch replace the same
+order in earlier ones. _state.json is written last, so a crashed export leaves
+files the engine ignores and the next export overwrites. Deleted orders (and the
+superseded copies of changed ones) stay on disk until a --full rebuild. An export
+that finds change-log events it never saw already pruned (archive.py keeps
+event_days of them) rebuilds the snapshot.
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+from mysql.connector import Error
+
+try:
+    import fcntl
+except ImportError:   # Windows
+    fcntl = None
+    import msvcrt
+
+# root: snapshot directory
+# chunk: orders read and written per file on the first (or a large) export
+# event_overlap: change-log entries re-read each export, for transactions that
+#                committed after a later event id was already exported
+SNAPSHOT_CONFIG = {
+    "root": os.environ.get("FOODAPP_SNAPSHOT_DIR", "snapshot"),
+    "chunk": 50000,
+    "event_overlap": 100
+}
+
+# Hot tables plus the archive (archive.py), so a --full rebuild still sees
+# orders moved out of `orders`; archive rows carry order_id and order_date
+FACT_QUERIES = {
+    "orders": """
+        SELECT o.order_id, o.order_date, o.total_amt, o.status, o.user_id, o.partner_id, o.pay_id
+        FROM orders o WHERE {where}
+        UNION ALL
+        SELECT o.order_id, o.order_date, o.total_amt, o.status, o.user_id, o.partner_id, o.pay_id
+        FROM orders_archive o WHERE {where}
+    """,
+    "orderitem": """
+        SELECT oi.order_id, oi.item_id, oi.quantity, oi.price, o.order_date
+        FROM orderitem oi JOIN orders o ON oi.order_id = o.order_id
+        WHERE {where}
+        UNION ALL
+        SELECT o.order_id, o.item_id, o.quantity, o.price, o.order_date
+        FROM orderitem_archive o WHERE {where}
+    """,
+    "payment": """
+        SELECT p.pay_id, p.method, p.amount, p.status, o.order_id, o.order_date
+        FROM payment p JOIN orders o ON o.pay_id = p.pay_id
+        WHERE {where}
+        UNION ALL
+        SELECT o.pay_id, o.method, o.amount, o.status, o.order_id, o.order_date
+        FROM payment_archive o WHERE {where}
+    """
+}
+
+# Row identity within each fact table; a later batch wins
+FACT_KEYS = {
+    "orders": ["order_id"],
+    "orderitem": ["order_id", "item_id"],
+    "payment": ["pay_id"]
+}
+
+# Fixed column types, so every batch file has the same schema even when a
+# column happens to be all NULL in it
+COLUMN_TYPES = {
+    "order_id": "Int64", "user_id": "Int64", "partner_id": "Int64", "pay_id": "Int64",
+    "item_id": "Int64", "rest_id": "Int64", "quantity": "Int64",
+    "total_amt": "float64", "price": "float64", "amount": "float64", "rating": "float64",
+    "order_date": "datetime64[us]",
+    "status": "string", "method": "string", "name": "string", "email": "string"
+}
+
+# Small, mutable lookup tables: rewritten whole on every export
+DIMENSION_QUERIES = {
+    "user": "SELECT user_id, name, email FROM user",
+    "deliverypartner": "SELECT partner_id, name, rating FROM deliverypartner",
+    "restaurant": "SELECT rest_id, name, rating FROM restaurant",
+    "menuitem": "SELECT item_id, name, rest_id FROM menuitem"
+}
+
+# -------------------- EXPORT --------------------
+def read_state(root):
+    try:
+        with open(os.path.join(root, "_state.json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"batch": 0, "order_id": 0, "event_id": 0, "orders": 0, "exported_at": None}
+
+def write_json(path, value):
+    with open(path, "w") as f:
+        json.dump(value, f)
+
+def write_atomic(path, write):
+    """Write through a temp file and rename, so readers never see half a file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    write(tmp)
+    os.replace(tmp, path)
+
+def to_frame(cur, rows):
+    df = pd.DataFrame(rows, columns=[d[0] for d in cur.description])
+    for column in df.columns:
+        if COLUMN_TYPES.get(column) == "float64":
+            df[column] = pd.to_numeric(df[column], errors="coerce")
+    return df.astype({c: COLUMN_TYPES[c] for c in df.columns if c in COLUMN_TYPES})
+
+def write_partitions(root, table, df, batch, part):
+    """Append one frame as month=YYYY-MM partitions of a fact table."""
+    if df.empty:
+        return
+    df = df.assign(_batch=batch)
+    months = df["order_date"].dt.strftime("%Y-%m")
+    for month, group in df.groupby(months):
+        path = os.path.join(root, table, f"month={month}", f"batch-{batch:06d}-{part:04d}.parquet")
+        write_atomic(path, lambda tmp: group.to_parquet(tmp, index=False))
+
+def export_facts(cur, root, where, params, batch, part):
+    """Export orders, items and payments matching an orders-side filter; returns order rows written."""
+    written = 0
+    for table, query in FACT_QUERIES.items():
+        cur.execute(query.format(where=where), params * query.count("{where}"))
+        df = to_frame(cur, cur.fetchall())
+        write_partitions(root, table, df, batch, part)
+        if table == "orders":
+            written = len(df)
+    return written
+
+def events_pruned_since(conn, event_id):
+    """True when archive.py has pruned change-log events after event_id."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MIN(event_id) FROM order_events")
+        oldest = cur.fetchone()[0]
+    finally:
+        cur.close()
+    return oldest is not None and oldest > event_id + 1
+
+class ExportInProgress(Exception):
+    """Raised when another export of the same snapshot is running."""
+
+@contextmanager
+def export_lock(root):
+    """Hold <root>.lock exclusively for one export; the OS drops it if the process dies.
+
+    The lock file sits next to the snapshot directory, not in it, so a --full
+    rebuild deleting the directory can't delete a lock that is held.
+    """
+    path = os.path.abspath(root) + ".lock"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    f = open(path, "a+")
+    try:
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            raise ExportInProgress(f"Another export of {root} is running") from None
+        yield
+    finally:
+        f.close()
+
+def export_snapshot(conn, root=None, full=False, chunk=None):
+    """Append everything new or changed since the last export; returns the new state.
+
+    Raises ExportInProgress instead of waiting when another export (another
+    process, or the app's Export Now) holds the snapshot: two exports would
+    take the same batch number and delete each other's files.
+    """
+    root = root or SNAPSHOT_CONFIG["root"]
+    with export_lock(root):
+        return _export_batch(conn, root, full, chunk or SNAPSHOT_CONFIG["chunk"])
+
+def _export_batch(conn, root, full, chunk):
+    state = read_state(root)
+    # Changes in pruned events can't be found any more: rebuild instead
+    if not full and state["batch"] and events_pruned_since(conn, state["event_id"]):
+        full = True
+    if full and os.path.isdir(root):
+        shutil.rmtree(root)
+        state = read_state(root)
+    batch = state["batch"] + 1
+    # Drop leftovers of a crashed export that used this batch number
+    for path in glob.glob(os.path.join(root, "*", "month=*", f"batch-{batch:06d}-*.parquet")):
+        os.remove(path)
+
+    cur = conn.cursor()
+    try:
+        # Log head first: orders changed while exporting are picked up next time
+        cur.execute("SELECT COALESCE(MAX(event_id), 0) FROM order_events")
+        head_event = cur.fetchone()[0]
+        cur.execute("""
+            SELECT GREATEST((SELECT COALESCE(MAX(order_id), 0) FROM orders),
+                            (SELECT COALESCE(MAX(order_id), 0) FROM orders_archive))
+        """)
+        head_order = cur.fetchone()[0]
+
+        # New orders, by primary key range
+        exported, part = 0, 0
+        low = state["order_id"]
+        while low < head_order:
+            high = min(low + chunk, head_order)
+            exported += export_facts(cur, root, "o.order_id > %s AND o.order_id <= %s", (low, high), batch, part)
+            low, part = high, part + 1
+
+        # Already exported orders that changed since the last export
+        cur.execute("""
+            SELECT DISTINCT order_id FROM order_events
+            WHERE event_id > %s AND event_id <= %s AND order_id <= %s
+        """, (max(0, state["event_id"] - SNAPSHOT_CONFIG["event_overlap"]), head_event, state["order_id"]))
+        changed = [row[0] for row in cur.fetchall()]
+        for start in range(0, len(changed), chunk):
+            ids = changed[start:start + chunk]
+            placeholders = ", ".join(["%s"] * len(ids))
+            export_facts(cur, root, f"o.order_id IN ({placeholders})", tuple(ids), batch, part)
+            part += 1
+
+        for table, query in DIMENSION_QUERIES.items():
+            cur.execute(query)
+            df = to_frame(cur, cur.fetchall())
+            write_atomic(os.path.join(root, "dims", f"{table}.parquet"), lambda tmp: df.to_parquet(tmp, index=False))
+    finally:
+        cur.close()
+
+    state = {
+        "batch": batch,
+        "order_id": max(state["order_id"], head_order),
+        "event_id": head_event,
+        "orders": state["orders"] + exported,
+        "changed": len(changed),
+        "exported_at": datetime.now().isoformat(timespec="seconds")
+    }
+    write_atomic(os.path.join(root, "_state.json"), lambda tmp: write_json(tmp, state))
+    return state
+
+# -------------------- ANALYTICS ENGINE --------------------
+class AnalyticsEngine:
+    """The admin reports over a Parquet snapshot; frames are reloaded when a new batch lands."""
+
+    def __init__(self, root=None):
+        self.root = root or SNAPSHOT_CONFIG["root"]
+        self._lock = threading.Lock()
+        self.state = None
+        self.frames = {}
+
+    def available(self):
+        return os.path.exists(os.path.join(self.root, "_state.json"))
+
+    def refresh(self):
+        """Load the snapshot if its batch changed since the last load; returns the state."""
+        state = read_state(self.root)
+        with self._lock:
+            if self.state and self.state["batch"] == state["batch"]:
+                return self.state
+            frames = {}
+            for table, keys in FACT_KEYS.items():
+                frames[table] = self._read_fact(table, keys, state["batch"])
+            for table in DIMENSION_QUERIES:
+                path = os.path.join(self.root, "dims", f"{table}.parquet")
+                frames[table] = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+            self.frames, self.state = frames, state
+            return state
+
+    def _read_fact(self, table, keys, batch):
+        path = os.path.join(self.root, table)
+        if not glob.glob(os.path.join(path, "month=*", "*.parquet")):
+            return pd.DataFrame()
+        df = pd.read_parquet(path, filters=[("_batch", "<=", batch)])
+        # Latest batch of each row wins (re-exported orders carry new status/payment)
+        df = df.sort_values("_batch").drop_duplicates(keys, keep="last")
+        return df.drop(columns=["_batch", "month"], errors="ignore").reset_index(drop=True)
+
+    def _delivered(self):
+        orders = self.frames["orders"]
+        return orders[orders["status"] == "Delivered"] if not orders.empty else orders
+
+    def top_spenders(self, limit=10):
+        delivered = self._delivered()
+        if delivered.empty:
+            return pd.DataFrame()
+        totals = delivered.groupby("user_id").agg(total_spent=("total_amt", "sum"),
+                                                  total_orders=("order_id", "count"))
+        df = self.frames["user"].merge(totals, left_on="user_id", right_index=True)
+        return df.nlargest(limit, "total_spent").reset_index(drop=True)
+
+    def best_rated_restaurants(self, limit=10):
+        restaurants = self.frames["restaurant"]
+        if restaurants.empty:
+            return pd.DataFrame()
+        restaurants = restaurants[restaurants["rating"].notna()]
+        items = self.frames["orderitem"]
+        if items.empty:
+            counts = pd.Series(dtype="int64", name="total_orders")
+        else:
+            lines = items.merge(self.frames["menuitem"][["item_id", "rest_id"]], on="item_id")
+            counts = lines.groupby("rest_id")["order_id"].nunique().rename("total_orders")
+        df = restaurants.merge(counts, left_on="rest_id", right_index=True, how="left")
+        df["total_orders"] = df["total_orders"].fillna(0).astype("int64")
+        return df.sort_values("rating", ascending=False).head(limit).reset_index(drop=True)
+
+    def revenue_by_method(self):
+        delivered = self._delivered()
+        if delivered.empty:
+            return pd.DataFrame()
+        payments = self.frames["payment"][["pay_id", "method"]]
+        df = delivered.merge(payments, on="pay_id", how="left")
+        df["payment_method"] = df["method"].fillna("Unknown")
+        df = df.groupby("payment_method").agg(total_orders=("order_id", "count"),
+                                              total_revenue=("total_amt", "sum"))
+        df["avg_order_value"] = df["total_revenue"] / df["total_orders"]
+        return df.sort_values("total_revenue", ascending=False).reset_index()
+
+    def partner_performance(self):
+        orders = self.frames["orders"]
+        if orders.empty:
+            return pd.DataFrame()
+        orders = orders[orders["status"].notna() & orders["partner_id"].notna()]
+        stats = orders.assign(delivered=(orders["status"] == "Delivered").astype("int64")).groupby("partner_id").agg(
+            total_deliveries=("order_id", "count"),
+            successful_deliveries=("delivered", "sum"),
+            avg_order_value=("total_amt", "mean"))
+        partners = self.frames["deliverypartner"].rename(columns={"name": "partner_name"})
+        df = partners.merge(stats, left_on="partner_id", right_index=True)
+        df = df[["partner_id", "partner_name", "rating", "total_deliveries", "successful_deliveries", "avg_order_value"]]
+        return df.sort_values(["successful_deliveries", "rating"], ascending=False).reset_index(drop=True)
+
+    def monthly_trend(self, months=6):
+        orders = self.frames["orders"]
+        if orders.empty:
+            return pd.DataFrame()
+        since = (pd.Timestamp.now() - pd.DateOffset(months=months)).normalize()
+        recent = orders[orders["order_date"] >= since]
+        df = recent.groupby(recent["order_date"].dt.strftime("%Y-%m").rename("month")).agg(
+            total_orders=("order_id", "count"),
+            total_revenue=("total_amt", "sum"))
+        df["avg_order_value"] = df["total_revenue"] / df["total_orders"]
+        return df.sort_index(ascending=False).reset_index()
+
+    def popular_items(self, limit=15):
+        delivered = self._delivered()
+        items = self.frames["orderitem"]
+        if delivered.empty or items.empty:
+            return pd.DataFrame()
+        lines = items[items["order_id"].isin(delivered["order_id"])]
+        lines = lines.assign(revenue=lines["quantity"] * lines["price"])
+        totals = lines.groupby("item_id").agg(total_ordered=("quantity", "sum"),
+                                              total_revenue=("revenue", "sum"))
+        menu = self.frames["menuitem"].rename(columns={"name": "item_name"})
+        restaurants = self.frames["restaurant"][["rest_id", "name"]].rename(columns={"name": "restaurant"})
+        df = menu.merge(restaurants, on="rest_id").merge(totals, left_on="item_id", right_index=True)
+        df = df[["item_id", "item_name", "restaurant", "total_ordered", "total_revenue"]]
+        return df.nlargest(limit, "total_ordered").reset_index(drop=True)
+
+REPORTS = ["top_spenders", "best_rated_restaurants", "revenue_by_method",
+           "partner_performance", "monthly_trend", "popular_items"]
+
+# -------------------- CLI --------------------
+def run_export(args):
+    from benchmark import connect
+    conn = connect(args)
+    try:
+        started = time.perf_counter()
+        state = export_snapshot(conn, args.root, full=args.full, chunk=args.chunk)
+    finally:
+        conn.close()
+    print(f"✓ Exported batch {state['batch']} to {args.root or SNAPSHOT_CONFIG['root']} in "
+          f"{time.perf_counter() - started:.1f}s: {state['orders']} orders, "
+          f"{state['changed']} changed, high-water mark order_id={state['order_id']}")
+
+def run_report(args):
+    engine = AnalyticsEngine(args.root)
+    if not engine.available():
+        print("No snapshot yet; run `python analytics.py export` first")
+        return 1
+    started = time.perf_counter()
+    engine.refresh()
+    loaded = time.perf_counter()
+    df = getattr(engine, args.report)()
+    print(df.to_string(index=False))
+    print(f"\nload {1000 * (loaded - started):.0f} ms, report {1000 * (time.perf_counter() - loaded):.1f} ms")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="FoodDelight analytics snapshot")
+    parser.add_argument("--host")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--database")
+    parser.add_argument("--root", help=f"snapshot directory (default {SNAPSHOT_CONFIG['root']})")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    exporter = sub.add_parser("export", help="append new and changed orders to the snapshot")
+    exporter.add_argument("--full", action="store_true", help="delete the snapshot and rebuild it")
+    exporter.add_argument("--chunk", type=int, default=SNAPSHOT_CONFIG["chunk"])
+    exporter.set_defaults(func=run_export)
+
+    report = sub.add_parser("report", help="print one report from the snapshot")
+    report.add_argument("report", choices=REPORTS)
+    report.set_defaults(func=run_report)
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    try:
+        sys.exit(args.func(args) or 0)
+    except (Error, ExportInProgress) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,285 @@
+"""
+FoodDelight order archive mover
+- Moves closed (Delivered / Cancelled) orders of past months, with their items
+  and payments, from the hot tables into the monthly-partitioned *_archive tables
+- Bulk batches: one INSERT ... SELECT per table and one DELETE per batch, each
+  batch its own short transaction, so checkout never waits long on the mover
+- Adds the month partitions it needs before moving a month in
+- KPI counters, partner_stats and the daily_sales rollup are left as they
+  are: an archived order is still an order
+- Prunes order_events (the change log the partner feed and the analytics
+  export read) down to the last event_days days, oldest ids first
+
+    python archive.py run                     # move closed orders older than keep_months
+    python archive.py run --keep-months 6 --batch 2000
+    python archive.py run --every 3600        # keep running, one pass an hour
+    python archive.py run --event-days 14     # keep two weeks of change log
+    python archive.py status                  # rows per hot table and archive partition
+
+Open orders stay hot however old they are, as do orders whose payment is also
+referenced by a user row or by another order.
+"""
+
+import argparse
+import sys
+import time
+from datetime import date
+
+from mysql.connector import Error
+
+# keep_months: whole months kept hot besides the current one
+# batch: orders moved per transaction
+# pause: seconds between batches, to leave the server to the app
+# event_days: days of order_events kept; partner feeds reload after an hour
+#             idle and an analytics export older than this rebuilds the snapshot
+ARCHIVE_CONFIG = {
+    "keep_months": 3,
+    "batch": 1000,
+    "pause": 0.05,
+    "event_days": 7
+}
+
+CLOSED_STATUSES = ("Delivered", "Cancelled")
+ARCHIVE_TABLES = ("orders_archive", "orderitem_archive", "payment_archive")
+
+PICK_QUERY = f"""
+    SELECT o.order_id, o.pay_id FROM orders o
+    WHERE o.order_date < %s AND o.status IN ({", ".join(["%s"] * len(CLOSED_STATUSES))})
+      AND NOT EXISTS (SELECT 1 FROM user u WHERE u.pay_id = o.pay_id)
+      AND NOT EXISTS (SELECT 1 FROM orders o2 WHERE o2.pay_id = o.pay_id AND o2.order_id <> o.order_id)
+    LIMIT %s
+    FOR UPDATE OF o SKIP LOCKED
+"""
+
+def month_start(day, months_back=0):
+    """First day of the month months_back months before day's month (negative: after)."""
+    index = day.year * 12 + day.month - 1 - months_back
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f"p{month:%Y%m}"
+
+# -------------------- PARTITIONS --------------------
+def archive_partitions(cur, table):
+    """{partition name: rows} of an archive table (row counts are InnoDB estimates)."""
+    cur.execute("""
+        SELECT partition_name, table_rows FROM information_schema.partitions
+        WHERE table_schema = DATABASE() AND table_name = %s
+        ORDER BY partition_ordinal_position
+    """, (table,))
+    return dict(cur.fetchall())
+
+def ensure_partitions(cur, first, cutoff):
+    """Split p_future so every month from first up to cutoff has its own partition.
+
+    Months are only ever added after the newest one, so an older month that
+    arrives late lands in the oldest partition; queries still prune correctly.
+    """
+    added = 0
+    for table in ARCHIVE_TABLES:
+        existing = [name for name in archive_partitions(cur, table) if name != "p_future"]
+        newest = max(existing) if existing else None
+        months, month = [], first
+        while month < cutoff:
+            if newest is None or partition_name(month) > newest:
+                months.append(month)
+            month = month_start(month, -1)
+        if not months:
+            continue
+        parts = ", ".join(f"PARTITION `{partition_name(m)}` VALUES LESS THAN ('{month_start(m, -1):%Y-%m-%d}')"
+                          for m in months)
+        cur.execute(f"""
+            ALTER TABLE `{table}` REORGANIZE PARTITION `p_future` INTO (
+                {parts}, PARTITION `p_future` VALUES LESS THAN (MAXVALUE))
+        """)
+        added += len(months)
+    return added
+
+# -------------------- MOVER --------------------
+def move_batch(conn, cutoff, batch):
+    """Move up to batch closed orders dated before cutoff; returns how many moved."""
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        cur.execute(PICK_QUERY, (cutoff, *CLOSED_STATUSES, batch))
+        picked = cur.fetchall()
+        if not picked:
+            conn.rollback()
+            return 0
+        order_ids = [order_id for order_id, _ in picked]
+        pay_ids = [pay_id for _, pay_id in picked if pay_id is not None]
+        orders_in = ", ".join(["%s"] * len(order_ids))
+
+        # Tells the orders delete triggers this is a move, not a delete
+        cur.execute("SET @archiving = 1")
+        cur.execute(f"""
+            INSERT INTO orders_archive (order_id, order_date, total_amt, status, user_id, partner_id, pay_id)
+            SELECT order_id, order_date, total_amt, status, user_id, partner_id, pay_id
+            FROM orders WHERE order_id IN ({orders_in})
+        """, order_ids)
+        cur.execute(f"""
+            INSERT INTO orderitem_archive (orderitem_id, order_id, item_id, quantity, price, order_date)
+            SELECT oi.orderitem_id, oi.order_id, oi.item_id, oi.quantity, oi.price, o.order_date
+            FROM orderitem oi JOIN orders o ON o.order_id = oi.order_id
+            WHERE oi.order_id IN ({orders_in})
+        """, order_ids)
+        cur.execute(f"""
+            INSERT INTO payment_archive (pay_id, method, currency, amount, status, order_id, order_date)
+            SELECT p.pay_id, p.method, p.currency, p.amount, p.status, o.order_id, o.order_date
+            FROM payment p JOIN orders o ON o.pay_id = p.pay_id
+            WHERE o.order_id IN ({orders_in})
+        """, order_ids)
+        # orderitem and order_intake rows go with their order (ON DELETE CASCADE)
+        cur.execute(f"DELETE FROM orders WHERE order_id IN ({orders_in})", order_ids)
+        if pay_ids:
+            cur.execute(f"DELETE FROM payment WHERE pay_id IN ({', '.join(['%s'] * len(pay_ids))})", pay_ids)
+        conn.commit()
+        return len(order_ids)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        try:
+            cur.execute("SET @archiving = NULL")
+        finally:
+            cur.close()
+
+def archive_orders(conn, keep_months=None, batch=None, pause=None, today=None):
+    """Move every closed order older than keep_months; returns (orders moved, partitions added)."""
+    keep_months = ARCHIVE_CONFIG["keep_months"] if keep_months is None else keep_months
+    batch = batch or ARCHIVE_CONFIG["batch"]
+    pause = ARCHIVE_CONFIG["pause"] if pause is None else pause
+    cutoff = month_start(today or date.today(), keep_months)
+
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+            SELECT MIN(order_date) FROM orders
+            WHERE order_date < %s AND status IN ({", ".join(["%s"] * len(CLOSED_STATUSES))})
+        """, (cutoff, *CLOSED_STATUSES))
+        oldest = cur.fetchone()[0]
+        # ALTER TABLE commits; it runs before any batch opens a transaction
+        added = ensure_partitions(cur, month_start(oldest), cutoff) if oldest else 0
+    finally:
+        cur.close()
+    if not oldest:
+        return 0, added
+
+    moved = 0
+    while True:
+        count = move_batch(conn, cutoff, batch)
+        moved += count
+        if count < batch:
+            return moved, added
+        time.sleep(pause)
+
+# -------------------- CHANGE LOG --------------------
+def prune_events(conn, event_days=None, batch=None, pause=None):
+    """Delete order_events older than event_days in primary-key batches; returns rows deleted.
+
+    Event ids grow with time, so each batch looks at the oldest batch ids and
+    deletes up to the newest expired one among them: a range on the primary
+    key, with no index needed on created_at. The newest event is always kept,
+    so readers can tell from MIN(event_id) whether events they never saw
+    were pruned.
+    """
+    event_days = event_days or ARCHIVE_CONFIG["event_days"]
+    batch = batch or ARCHIVE_CONFIG["batch"]
+    pause = ARCHIVE_CONFIG["pause"] if pause is None else pause
+    deleted = 0
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT MAX(event_id) FROM order_events")
+        newest = cur.fetchone()[0]
+        while newest is not None:
+            cur.execute("""
+                SELECT MAX(event_id) FROM (
+                    SELECT event_id, created_at FROM order_events ORDER BY event_id LIMIT %s
+                ) head
+                WHERE created_at < NOW(3) - INTERVAL %s DAY
+            """, (batch, event_days))
+            expired = cur.fetchone()[0]
+            upto = 0 if expired is None else min(expired, newest - 1)
+            if upto < 1:
+                return deleted
+            cur.execute("DELETE FROM order_events WHERE event_id <= %s", (upto,))
+            count = cur.rowcount
+            conn.commit()
+            deleted += count
+            if count < batch:
+                return deleted
+            time.sleep(pause)
+        return deleted
+    finally:
+        cur.close()
+
+def archive_status(conn):
+    """Row counts of the hot tables and of every archive partition."""
+    cur = conn.cursor()
+    try:
+        hot = {}
+        for table in ("orders", "orderitem", "payment", "order_events"):
+            cur.execute(f"SELECT COUNT(*) FROM `{table}`")
+            hot[table] = cur.fetchone()[0]
+        archive = {table: archive_partitions(cur, table) for table in ARCHIVE_TABLES}
+    finally:
+        cur.close()
+    return hot, archive
+
+# -------------------- CLI --------------------
+def run_mover(args):
+    from benchmark import connect
+    while True:
+        conn = connect(args)
+        try:
+            started = time.perf_counter()
+            moved, added = archive_orders(conn, args.keep_months, args.batch)
+            pruned = prune_events(conn, args.event_days, args.batch)
+        finally:
+            conn.close()
+        print(f"✓ Archived {moved} orders older than {month_start(date.today(), args.keep_months)} "
+              f"in {time.perf_counter() - started:.1f}s ({added} partitions added)")
+        print(f"✓ Pruned {pruned} change-log events older than {args.event_days} days")
+        if not args.every:
+            return
+        time.sleep(args.every)
+
+def run_status(args):
+    from benchmark import connect
+    conn = connect(args)
+    try:
+        hot, archive = archive_status(conn)
+    finally:
+        conn.close()
+    print("Hot:     " + " | ".join(f"{table} {rows}" for table, rows in hot.items()))
+    for table, partitions in archive.items():
+        print(f"\n{table} (estimated rows per partition)")
+        for name, rows in partitions.items():
+            print(f"  {name:<12}{rows}")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="FoodDelight order archive mover")
+    parser.add_argument("--host")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    mover = sub.add_parser("run", help="move closed orders of past months into the archive")
+    mover.add_argument("--keep-months", type=int, default=ARCHIVE_CONFIG["keep_months"])
+    mover.add_argument("--batch", type=int, default=ARCHIVE_CONFIG["batch"])
+    mover.add_argument("--event-days", type=int, default=ARCHIVE_CONFIG["event_days"])
+    mover.add_argument("--every", type=int, help="repeat every this many seconds")
+    mover.set_defaults(func=run_mover)
+
+    status = sub.add_parser("status", help="row counts of the hot tables and archive partitions")
+    status.set_defaults(func=run_status)
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    try:
+        sys.exit(args.func(args) or 0)
+    except Error as e:
+        print(f"Error: {e}")
+        sys.exit(1)
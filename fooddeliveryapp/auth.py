@@ -0,0 +1,149 @@
+"""
+FoodDelight credentials and session tokens
+- Salted PBKDF2-SHA256 password hashes, self-describing so the work factor
+  can be raised later (old hashes are upgraded on the next successful login)
+- Signed, expiring session tokens: a page reload presents the token instead
+  of the password, and the signature is checked without the database
+- SessionCache: signed-in principals and revoked tokens, kept in process
+
+Nothing here talks to MySQL; dbmstest1.py stores the hashes in `credentials`.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+# iterations: PBKDF2 work factor for new hashes (~40 ms per verify on one core)
+# token_ttl: seconds a session token stays valid
+# secret: HMAC key for tokens; without FOODAPP_SECRET_KEY a random per-process
+#         key is used and tokens stop working when the app restarts
+AUTH_CONFIG = {
+    "iterations": 100_000,
+    "token_ttl": 12 * 3600,
+    "principal_ttl": 300,   # seconds a cached principal is trusted before it is read again
+    "secret": os.environ.get("FOODAPP_SECRET_KEY") or secrets.token_hex(32)
+}
+
+HASH_ALGORITHM = "pbkdf2_sha256"
+
+# -------------------- PASSWORD HASHES --------------------
+def hash_password(password, iterations=None):
+    """Return "pbkdf2_sha256$iterations$salt$hash" for password."""
+    iterations = iterations or AUTH_CONFIG["iterations"]
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations)
+    return f"{HASH_ALGORITHM}${iterations}${salt.hex()}${digest.hex()}"
+
+def verify_password(password, stored):
+    """Constant-time check of password against a hash_password() string."""
+    try:
+        algorithm, iterations, salt, expected = stored.split("$")
+        if algorithm != HASH_ALGORITHM:
+            return False
+        digest = hashlib.pbkdf2_hmac("sha256", password.encode(), bytes.fromhex(salt), int(iterations))
+    except (AttributeError, ValueError):
+        return False
+    return hmac.compare_digest(digest.hex(), expected)
+
+def needs_rehash(stored):
+    """True when a hash was made with a smaller work factor than the current one."""
+    try:
+        return int(stored.split("$")[1]) < AUTH_CONFIG["iterations"]
+    except (AttributeError, IndexError, ValueError):
+        return True
+
+# Verified against when a login matches no credential, so unknown logins take
+# as long as wrong passwords
+DUMMY_HASH = hash_password(secrets.token_hex(8))
+
+# -------------------- SESSION TOKENS --------------------
+def _b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(payload):
+    return hmac.new(AUTH_CONFIG["secret"].encode(), payload.encode(), hashlib.sha256).digest()
+
+def issue_token(role, principal_id, ttl=None):
+    """Signed token naming a principal; the payload is readable, not secret."""
+    claims = {"r": role, "p": principal_id, "e": int(time.time()) + (ttl or AUTH_CONFIG["token_ttl"]),
+              "n": secrets.token_hex(8)}
+    payload = _b64(json.dumps(claims, separators=(",", ":")).encode())
+    return f"{payload}.{_b64(_sign(payload))}"
+
+def read_token(token):
+    """Claims of a valid, unexpired token, or None."""
+    try:
+        payload, signature = token.split(".")
+        if not hmac.compare_digest(_unb64(signature), _sign(payload)):
+            return None
+        claims = json.loads(_unb64(payload))
+    except (AttributeError, ValueError):
+        return None
+    return claims if claims.get("e", 0) > time.time() else None
+
+class SessionCache:
+    """Signed-in principals by (role, id), plus tokens revoked by logout.
+
+    A token that verifies and names a cached principal restores a session
+    without touching the database. A principal cached more than max_age
+    seconds ago is read again, so an edited or deleted account is noticed
+    without every writer having to evict it. Both maps are bounded;
+    revocations are kept until the token would have expired anyway.
+    """
+
+    def __init__(self, max_entries=10000, max_age=300):
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._principals = OrderedDict()   # (role, id) -> (user_data, cached_at)
+        self._revoked = {}                 # token nonce -> expiry
+        self._stats = {"hits": 0, "misses": 0, "rejected": 0}
+
+    def put(self, role, principal_id, user_data):
+        with self._lock:
+            self._principals[(role, principal_id)] = (dict(user_data), time.time())
+            self._principals.move_to_end((role, principal_id))
+            while len(self._principals) > self.max_entries:
+                self._principals.popitem(last=False)
+
+    def resolve(self, token):
+        """(claims, user_data) for a live token; user_data is None when not cached."""
+        claims = read_token(token)
+        with self._lock:
+            if claims is None or claims["n"] in self._revoked:
+                self._stats["rejected"] += 1
+                return None, None
+            entry = self._principals.get((claims["r"], claims["p"]))
+            if entry is not None and time.time() - entry[1] > self.max_age:
+                del self._principals[(claims["r"], claims["p"])]
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return claims, None
+            self._principals.move_to_end((claims["r"], claims["p"]))
+            self._stats["hits"] += 1
+            return claims, dict(entry[0])
+
+    def revoke(self, token):
+        claims = read_token(token)
+        if claims is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._revoked = {nonce: expiry for nonce, expiry in self._revoked.items() if expiry > now}
+            self._revoked[claims["n"]] = claims["e"]
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(principals=len(self._principals), revoked=len(self._revoked))
+        return stats
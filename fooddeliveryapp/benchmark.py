@@ -0,0 +1,555 @@
+"""
+FoodDelight benchmarks
+- Seeder that fills the schema at a configurable scale
+- Latency (p50/p95/p99), rows examined and throughput of every app query
+- Delivery partner assignment: random pick vs least-loaded pick (partner_load)
+- Catalog search: index build time and query latency (exact, prefix, typo, multi-word)
+- Machine-readable results, comparable across commits
+
+Run against a database created with createfoodappdatabase.py:
+
+    python benchmark.py seed --orders 100000 --create
+    python benchmark.py queries --iterations 200 --output results.json
+    python benchmark.py compare baseline.json results.json
+    python benchmark.py assignment --orders 2000
+    python benchmark.py search --iterations 2000
+
+The assignment benchmark works inside a transaction that is rolled back, so
+no benchmark data is left behind. The seeder commits its data.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+from mysql.connector import Error
+
+from createfoodappdatabase import APP_QUERIES, apply_migrations
+from queries import PARTNER_ASSIGNMENT_QUERY, PARTNER_FEED_HEAD_QUERY
+from search import SEARCH_CONFIG, SEARCH_WEIGHTS, SearchIndex, tokenize
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "placeholder",
+    "database": "foodapp"
+}
+
+ASSIGNMENT_STRATEGIES = {
+    "random": "SELECT partner_id FROM deliverypartner ORDER BY RAND() LIMIT 1",
+    "least_loaded": PARTNER_ASSIGNMENT_QUERY
+}
+
+def connect(args, use_database=True):
+    config = dict(DB_CONFIG)
+    for key in ("host", "user", "password", "database"):
+        if getattr(args, key, None):
+            config[key] = getattr(args, key)
+    if not use_database:
+        config.pop("database")
+    return mysql.connector.connect(**config)
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def latency_summary(samples_ms):
+    return {
+        "count": len(samples_ms),
+        "p50_ms": percentile(samples_ms, 50),
+        "p95_ms": percentile(samples_ms, 95),
+        "p99_ms": percentile(samples_ms, 99),
+        "mean_ms": statistics.fmean(samples_ms) if samples_ms else 0.0
+    }
+
+# -------------------- PARTNER ASSIGNMENT --------------------
+def run_assignment(conn, strategy, orders, complete_every, seed):
+    """Simulate a burst of orders assigned with one strategy, then roll back.
+
+    Every complete_every orders the oldest open order of the burst is marked
+    Delivered, so partners drain work the way they do in production.
+    """
+    rng = random.Random(seed)
+    pick_sql = ASSIGNMENT_STRATEGIES[strategy]
+    cur = conn.cursor(buffered=True)
+    latencies = []
+    open_orders = []
+    try:
+        conn.start_transaction()
+        cur.execute("SELECT user_id FROM user")
+        user_ids = [row[0] for row in cur.fetchall()] or [None]
+
+        for n in range(1, orders + 1):
+            start = time.perf_counter()
+            cur.execute(pick_sql)
+            row = cur.fetchone()
+            latencies.append((time.perf_counter() - start) * 1000)
+            partner_id = row[0] if row else None
+
+            cur.execute("""
+                INSERT INTO orders (user_id, total_amt, status, partner_id)
+                VALUES (%s, %s, 'Placed', %s)
+            """, (rng.choice(user_ids), round(rng.uniform(100, 1500), 2), partner_id))
+            open_orders.append(cur.lastrowid)
+
+            if complete_every and n % complete_every == 0 and open_orders:
+                cur.execute("UPDATE orders SET status='Delivered' WHERE order_id=%s", (open_orders.pop(0),))
+
+        # Balance is judged on the live open-order counts at the end of the burst
+        cur.execute("""
+            SELECT dp.partner_id, COUNT(o.order_id)
+            FROM deliverypartner dp
+            LEFT JOIN orders o ON o.partner_id = dp.partner_id
+                              AND o.status IN ('Placed', 'Out for Delivery')
+            GROUP BY dp.partner_id
+        """)
+        loads = [count for _, count in cur.fetchall()]
+    finally:
+        conn.rollback()
+        cur.close()
+
+    result = {"strategy": strategy, "orders": orders}
+    result.update(latency_summary(latencies))
+    result.update({
+        "max_load": max(loads) if loads else 0,
+        "min_load": min(loads) if loads else 0,
+        "load_stddev": statistics.pstdev(loads) if loads else 0.0
+    })
+    return result
+
+def benchmark_assignment(args):
+    conn = connect(args)
+    try:
+        results = [run_assignment(conn, strategy, args.orders, args.complete_every, args.seed)
+                   for strategy in ASSIGNMENT_STRATEGIES]
+    finally:
+        conn.close()
+
+    print(f"{'strategy':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max load':>10}{'min load':>10}{'stddev':>10}")
+    for r in results:
+        print(f"{r['strategy']:<14}{r['p50_ms']:>10.3f}{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}"
+              f"{r['max_load']:>10}{r['min_load']:>10}{r['load_stddev']:>10.2f}")
+    return results
+
+# -------------------- SEEDER --------------------
+ORDER_STATUS_WEIGHTS = [("Delivered", 80), ("Placed", 8), ("Out for Delivery", 5), ("Cancelled", 7)]
+PAYMENT_METHODS = ["UPI", "Card", "COD"]
+
+def next_id(cur, table, column):
+    cur.execute(f"SELECT COALESCE(MAX({column}), 0) + 1 FROM {table}")
+    return cur.fetchone()[0]
+
+def insert_rows(cur, sql, rows, batch_size):
+    for start in range(0, len(rows), batch_size):
+        cur.executemany(sql, rows[start:start + batch_size])
+
+def seed(args):
+    """Append a synthetic data set proportional to --orders.
+
+    Dimension tables scale with the order count (one user per 20 orders,
+    one partner per 500, one restaurant per 1000). Rows go in through the
+    normal triggers, so counters, partner load and rollups stay consistent.
+    """
+    rng = random.Random(args.seed)
+    orders = args.orders
+    n_users = max(50, orders // 20)
+    n_partners = max(10, orders // 500)
+    n_restaurants = max(10, orders // 1000)
+    items_per_restaurant = 20
+    database = args.database or DB_CONFIG["database"]
+
+    conn = connect(args, use_database=False)
+    cur = conn.cursor(buffered=True)
+    try:
+        if args.create:
+            cur.execute(f"CREATE DATABASE IF NOT EXISTS {database}")
+        cur.execute(f"USE {database}")
+        if args.create:
+            apply_migrations(conn, cur)
+
+        print(f"Seeding {orders} orders, {n_users} users, {n_partners} partners, "
+              f"{n_restaurants} restaurants...")
+        started = time.perf_counter()
+
+        first = next_id(cur, "deliverypartner", "partner_id")
+        partner_ids = list(range(first, first + n_partners))
+        insert_rows(cur, "INSERT INTO deliverypartner (partner_id, name, phone, rating) VALUES (%s, %s, %s, %s)",
+                    [(pid, f"Partner {pid}", f"9{pid:09d}", round(rng.uniform(3, 5), 1)) for pid in partner_ids],
+                    args.batch_size)
+
+        first = next_id(cur, "restaurant", "rest_id")
+        rest_ids = list(range(first, first + n_restaurants))
+        insert_rows(cur, "INSERT INTO restaurant (rest_id, name, address, rating, partner_id) VALUES (%s, %s, %s, %s, %s)",
+                    [(rid, f"Restaurant {rid}", f"{rid} Main Street", round(rng.uniform(2.5, 5), 1),
+                      rng.choice(partner_ids)) for rid in rest_ids],
+                    args.batch_size)
+
+        first = next_id(cur, "user", "user_id")
+        user_ids = list(range(first, first + n_users))
+        insert_rows(cur, "INSERT INTO user (user_id, name, email, address, phone) VALUES (%s, %s, %s, %s, %s)",
+                    [(uid, f"User {uid}", f"user{uid}@bench.example", f"{uid} Park Road", f"8{uid:09d}")
+                     for uid in user_ids],
+                    args.batch_size)
+
+        first = next_id(cur, "menuitem", "item_id")
+        items = []
+        for rid in rest_ids:
+            for _ in range(items_per_restaurant):
+                items.append((first + len(items), f"Dish {first + len(items)}",
+                              round(rng.uniform(50, 600), 2), 1000000, rid))
+        insert_rows(cur, "INSERT INTO menuitem (item_id, name, price, quantity, rest_id) VALUES (%s, %s, %s, %s, %s)",
+                    items, args.batch_size)
+        conn.commit()
+
+        statuses = [status for status, _ in ORDER_STATUS_WEIGHTS]
+        weights = [weight for _, weight in ORDER_STATUS_WEIGHTS]
+        now = datetime.now()
+        pay_id = next_id(cur, "payment", "pay_id")
+        order_id = next_id(cur, "orders", "order_id")
+        for start in range(0, orders, args.batch_size):
+            payments, order_rows, order_items = [], [], []
+            for _ in range(min(args.batch_size, orders - start)):
+                lines = rng.sample(items, rng.randint(1, 4))
+                line_rows = [(order_id, item[0], rng.randint(1, 3), item[2]) for item in lines]
+                total = round(sum(qty * price for _, _, qty, price in line_rows), 2)
+                status = rng.choices(statuses, weights)[0]
+                method = rng.choice(PAYMENT_METHODS)
+                payments.append((pay_id, method, total, "Paid" if status == "Delivered" else "Pending"))
+                order_rows.append((order_id, now - timedelta(seconds=rng.randint(0, args.days * 86400)),
+                                   total, status, rng.choice(user_ids), rng.choice(partner_ids), pay_id))
+                order_items.extend(line_rows)
+                pay_id += 1
+                order_id += 1
+            cur.executemany("INSERT INTO payment (pay_id, method, amount, status) VALUES (%s, %s, %s, %s)", payments)
+            cur.executemany("""
+                INSERT INTO orders (order_id, order_date, total_amt, status, user_id, partner_id, pay_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """, order_rows)
+            cur.executemany("INSERT INTO orderitem (order_id, item_id, quantity, price) VALUES (%s, %s, %s, %s)",
+                            order_items)
+            conn.commit()
+            done = start + len(order_rows)
+            print(f"  {done}/{orders} orders ({done / (time.perf_counter() - started):.0f}/s)")
+
+        cur.execute("ANALYZE TABLE orders, orderitem, payment, user, deliverypartner, restaurant, menuitem")
+        cur.fetchall()
+        print(f"✓ Seeded in {time.perf_counter() - started:.1f}s")
+    finally:
+        cur.close()
+        conn.close()
+
+# -------------------- APP QUERIES --------------------
+def load_samples(cur, size=1000):
+    """Real ids and login keys to bind into the app queries."""
+    samples = {}
+    cur.execute("SELECT user_id, email, phone FROM user ORDER BY RAND() LIMIT %s", (size,))
+    samples["users"] = cur.fetchall()
+    cur.execute("SELECT partner_id, name, phone FROM deliverypartner ORDER BY RAND() LIMIT %s", (size,))
+    samples["partners"] = cur.fetchall()
+    # Random window of orders without ORDER BY RAND() over the whole table
+    cur.execute("SELECT COALESCE(MIN(order_id), 0), COALESCE(MAX(order_id), 0) FROM orders")
+    low, high = cur.fetchone()
+    cur.execute("SELECT order_id, order_date, pay_id FROM orders WHERE order_id >= %s ORDER BY order_id LIMIT %s",
+                (random.randint(low, max(low, high - size)), size))
+    samples["orders"] = cur.fetchall()
+    # Partner feeds poll from just behind the change log head
+    cur.execute(PARTNER_FEED_HEAD_QUERY)
+    samples["head_event"] = max(0, cur.fetchone()[0] - 100)
+    return samples
+
+def bind_params(name, query, rng, samples):
+    """Parameters for one execution of a catalog query, drawn from real data."""
+    users, partners = samples["users"], samples["partners"]
+    orders = samples["orders"]
+    if name == "credential_lookup" and users:
+        return ("user", rng.choice(users)[1])
+    if name == "user_login_legacy" and users:
+        _, email, phone = rng.choice(users)
+        return (email, phone, email, phone)
+    if name == "partner_login_legacy" and partners:
+        _, partner_name, phone = rng.choice(partners)
+        return (partner_name, phone)
+    if name == "user_principal" and users:
+        return (rng.choice(users)[0],)
+    if name in ("partner_orders", "partner_stats") and partners:
+        return (rng.choice(partners)[0],)
+    if name == "partner_recent_deliveries" and partners:
+        # hot and archive branch
+        return (rng.choice(partners)[0],) * 2
+    if name in ("user_orders", "user_order_count", "user_total_spent") and users:
+        return (rng.choice(users)[0],) * 2
+    if name == "catalog_stock_delta":
+        # The app looks back a few seconds past its last poll
+        return (datetime.now() - timedelta(seconds=rng.randint(2, 10)),)
+    if name == "admin_orders_page" and orders:
+        order_id, order_date, _ = rng.choice(orders)
+        return (order_date, order_date, order_id, 51)   # a grid page reads page size + 1 rows
+    if name == "partner_feed_events" and partners:
+        return (rng.choice(partners)[0], max(0, samples["head_event"] - 200), 501)
+    if name == "partner_feed_orders" and orders and partners:
+        return (rng.choice(orders)[0], rng.choice(orders)[0], rng.choice(partners)[0])
+    if name == "admin_payments_page" and orders:
+        return (rng.choice(orders)[2], 51)
+    if name == "admin_users_page" and users:
+        return (rng.choice(users)[0], 51)
+    return query["params"]
+
+def rows_examined(cur):
+    """ROWS_EXAMINED of this session's previous statement (None without performance_schema)."""
+    try:
+        cur.execute("""
+            SELECT ROWS_EXAMINED FROM performance_schema.events_statements_history
+            WHERE THREAD_ID = PS_CURRENT_THREAD_ID()
+            ORDER BY EVENT_ID DESC LIMIT 1
+        """)
+        row = cur.fetchone()
+        return row[0] if row else None
+    except Error:
+        return None
+
+def table_sizes(cur):
+    sizes = {}
+    for table in ("orders", "orderitem", "payment", "user", "deliverypartner", "restaurant", "menuitem"):
+        cur.execute(f"SELECT COUNT(*) FROM {table}")
+        sizes[table] = cur.fetchone()[0]
+    return sizes
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def benchmark_queries(args):
+    rng = random.Random(args.seed)
+    conn = connect(args)
+    cur = conn.cursor(buffered=True)
+    names = args.only or list(APP_QUERIES)
+    try:
+        cur.execute("SELECT VERSION()")
+        server_version = cur.fetchone()[0]
+        samples = load_samples(cur)
+        results = {}
+        for name in names:
+            query = APP_QUERIES[name]
+            for _ in range(args.warmup):
+                cur.execute(query["sql"], bind_params(name, query, rng, samples))
+                cur.fetchall()
+
+            latencies, examined, returned = [], [], []
+            wall = 0.0
+            for _ in range(args.iterations):
+                params = bind_params(name, query, rng, samples)
+                start = time.perf_counter()
+                cur.execute(query["sql"], params)
+                rows = cur.fetchall()
+                elapsed = time.perf_counter() - start
+                wall += elapsed
+                latencies.append(elapsed * 1000)
+                returned.append(len(rows))
+                count = rows_examined(cur)
+                if count is not None:
+                    examined.append(count)
+
+            result = latency_summary(latencies)
+            result.update({
+                "rows_returned_avg": statistics.fmean(returned) if returned else 0,
+                "rows_examined_avg": statistics.fmean(examined) if examined else None,
+                "throughput_qps": args.iterations / wall if wall else 0.0
+            })
+            results[name] = result
+            examined_text = f"{result['rows_examined_avg']:.0f}" if examined else "n/a"
+            print(f"{name:<30}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                  f"{examined_text:>12}{result['throughput_qps']:>10.0f}")
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "server_version": server_version,
+            "iterations": args.iterations,
+            "table_sizes": table_sizes(cur),
+            "queries": results
+        }
+    finally:
+        cur.close()
+        conn.close()
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n✓ Results written to {args.output}")
+    return report
+
+# -------------------- CATALOG SEARCH --------------------
+def search_queries(rng, names, count):
+    """Query mix drawn from real catalog names: exact word, prefix, typo, two words."""
+    names = [tokens for tokens in (tokenize(name) for name in names) if tokens] or [["pizza"]]
+    words = [word for tokens in names for word in tokens if len(word) >= 5] or ["pizza"]
+    mix = {"search_exact": [], "search_prefix": [], "search_typo": [], "search_multi": []}
+    for _ in range(count):
+        word = rng.choice(words)
+        mix["search_exact"].append(word)
+        mix["search_prefix"].append(word[:rng.randint(2, 4)])
+        pos = rng.randrange(len(word))
+        mix["search_typo"].append(word[:pos] + word[pos + 1:] if rng.random() < 0.5
+                                  else word[:pos] + rng.choice("aeiou") + word[pos + 1:])
+        tokens = rng.choice(names)
+        mix["search_multi"].append(" ".join(tokens[:2]))
+    return mix
+
+def benchmark_search(args):
+    """Build the catalog search index from the database and time queries against it."""
+    rng = random.Random(args.seed)
+    conn = connect(args)
+    cur = conn.cursor(buffered=True)
+    try:
+        cur.execute("SELECT rest_id, name, address FROM restaurant")
+        restaurants = cur.fetchall()
+        cur.execute("SELECT m.item_id, m.name, r.name FROM menuitem m LEFT JOIN restaurant r ON m.rest_id = r.rest_id")
+        items = cur.fetchall()
+        sizes = table_sizes(cur)
+    finally:
+        cur.close()
+        conn.close()
+
+    # Same fields and weights as the app's menu catalog
+    weights = SEARCH_WEIGHTS
+    index = SearchIndex(**SEARCH_CONFIG)
+    start = time.perf_counter()
+    for rest_id, name, address in restaurants:
+        index.put(("restaurant", rest_id), [(name, weights["restaurant_name"]), (address, weights["address"])])
+    for item_id, name, rest_name in items:
+        index.put(("item", item_id), [(name, weights["item_name"]), (rest_name, weights["item_restaurant"])])
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"✓ Indexed {len(restaurants)} restaurants and {len(items)} items in {build_ms:.1f} ms {index.stats()}")
+
+    # Incremental re-index of one edited item, as after an admin edit
+    updates = []
+    for item_id, name, rest_name in rng.sample(items, min(len(items), args.iterations)):
+        start = time.perf_counter()
+        index.put(("item", item_id), [(name + " special", weights["item_name"]),
+                                      (rest_name, weights["item_restaurant"])])
+        updates.append((time.perf_counter() - start) * 1000)
+
+    names = [row[1] for row in restaurants] + [row[1] for row in items]
+    results = {}
+    print(f"\n{'query':<30}{'p50 us':>9}{'p95 us':>9}{'p99 us':>9}{'hits':>8}")
+    for name, queries in search_queries(rng, names, args.iterations).items():
+        for query in queries[:args.warmup]:
+            index.search(query)
+        latencies, hits = [], []
+        for query in queries:
+            start = time.perf_counter()
+            found = index.search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+            hits.append(len(found))
+        results[name] = latency_summary(latencies)
+        results[name]["rows_returned_avg"] = statistics.fmean(hits)
+        print(f"{name:<30}{results[name]['p50_ms'] * 1000:>9.0f}{results[name]['p95_ms'] * 1000:>9.0f}"
+              f"{results[name]['p99_ms'] * 1000:>9.0f}{results[name]['rows_returned_avg']:>8.1f}")
+    results["search_reindex_item"] = latency_summary(updates)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "iterations": args.iterations,
+        "table_sizes": sizes,
+        "build_ms": build_ms,
+        "index": index.stats(),
+        "queries": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\n✓ Results written to {args.output}")
+    return report
+
+def compare(args):
+    """Print per-query p95 changes between two result files; exit 1 on regressions."""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    print(f"baseline {baseline.get('commit')} ({baseline['table_sizes'].get('orders')} orders) -> "
+          f"current {current.get('commit')} ({current['table_sizes'].get('orders')} orders)")
+    regressions = []
+    for name, now in current["queries"].items():
+        before = baseline["queries"].get(name)
+        if not before:
+            print(f"{name:<30}{'new':>12}")
+            continue
+        ratio = now[args.metric] / before[args.metric] if before[args.metric] else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<30}{before[args.metric]:>10.2f} -> {now[args.metric]:>10.2f} ms  x{ratio:.2f}{flag}")
+    return regressions
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="FoodDelight benchmarks")
+    parser.add_argument("--host")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    assignment = sub.add_parser("assignment", help="random vs least-loaded partner assignment")
+    assignment.add_argument("--orders", type=int, default=2000)
+    assignment.add_argument("--complete-every", type=int, default=3,
+                            help="deliver the oldest open order every N orders (0 = never)")
+    assignment.add_argument("--seed", type=int, default=42)
+    assignment.set_defaults(func=benchmark_assignment)
+
+    seeder = sub.add_parser("seed", help="fill the schema with synthetic data")
+    seeder.add_argument("--orders", type=int, default=10000)
+    seeder.add_argument("--days", type=int, default=365, help="spread order dates over this many days")
+    seeder.add_argument("--batch-size", type=int, default=5000)
+    seeder.add_argument("--create", action="store_true", help="create the database and apply migrations first")
+    seeder.add_argument("--seed", type=int, default=42)
+    seeder.set_defaults(func=seed)
+
+    queries = sub.add_parser("queries", help="time every app query")
+    queries.add_argument("--iterations", type=int, default=100)
+    queries.add_argument("--warmup", type=int, default=5)
+    queries.add_argument("--only", nargs="+", choices=sorted(APP_QUERIES), help="benchmark a subset")
+    queries.add_argument("--output", default="benchmark_results.json")
+    queries.add_argument("--seed", type=int, default=42)
+    queries.set_defaults(func=benchmark_queries)
+
+    searching = sub.add_parser("search", help="time the in-memory catalog search index")
+    searching.add_argument("--iterations", type=int, default=2000)
+    searching.add_argument("--warmup", type=int, default=50)
+    searching.add_argument("--output", default="search_results.json")
+    searching.add_argument("--seed", type=int, default=42)
+    searching.set_defaults(func=benchmark_search)
+
+    comparison = sub.add_parser("compare", help="compare two results files")
+    comparison.add_argument("baseline")
+    comparison.add_argument("current")
+    comparison.add_argument("--metric", default="p95_ms", choices=["p50_ms", "p95_ms", "p99_ms", "mean_ms"])
+    comparison.add_argument("--threshold", type=float, default=1.25,
+                            help="flag queries slower than baseline by this factor")
+    comparison.set_defaults(func=compare)
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    try:
+        outcome = args.func(args)
+    except Error as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    # compare returns the regressed query names
+    sys.exit(1 if args.command == "compare" and outcome else 0)
@@ -1,284 +1,1732 @@
+import argparse
+import sys
+from datetime import datetime, timedelta
+
 import mysql.connector
 from mysql.connector import Error
 
-def create_foodapp_database():
-    """Create the entire foodapp database structure from the provided output"""
+from auth import hash_password
+from queries import (ADMIN_MENU_ITEMS_QUERY, ADMIN_ORDERS_GRID, ADMIN_PARTNERS_QUERY, ADMIN_PAYMENTS_GRID,
+                     ADMIN_RECENT_ORDERS_QUERY, ADMIN_USERS_GRID, BEST_RATED_RESTAURANTS_QUERY,
+                     CART_HOLD_EXPIRY_QUERY, CATALOG_ITEMS_QUERY, CATALOG_RESTAURANTS_QUERY,
+                     CATALOG_STOCK_DELTA_QUERY, CREDENTIAL_QUERY, GRID_COUNT_QUERIES, KPI_QUERY,
+                     LEGACY_LOGIN_QUERIES, MONTHLY_SALES_TREND_QUERY, PARTNER_ASSIGNMENT_QUERY,
+                     PARTNER_FEED_EVENTS_QUERY, PARTNER_FEED_HEAD_QUERY, PARTNER_FEED_ORDERS_QUERY,
+                     PARTNER_ORDERS_QUERY, PARTNER_PERFORMANCE_QUERY, PARTNER_RECENT_DELIVERIES_QUERY,
+                     PARTNER_STATS_QUERY, POPULAR_MENU_ITEMS_QUERY, PRINCIPAL_QUERIES,
+                     RESERVATION_SWEEP_QUERY, REVENUE_BY_METHOD_QUERY, TOP_SPENDING_USERS_QUERY,
+                     USER_ORDER_COUNT_QUERY, USER_ORDERS_QUERY, USER_TOTAL_SPENT_QUERY, grid_page_query)
+
+DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "placeholder"
+}
+DB_NAME = "foodapp"
+# Counter rows every checkout touches (kpi_counters, daily_sales, partner_stats)
+# are split into this many slots per key. Triggers write slot CONNECTION_ID() % N
+# and readers SUM the slots, so concurrent checkouts don't queue on one row lock.
+# Changing it later is safe: readers sum whatever slots exist.
+COUNTER_SLOTS = 16
+
+# -------------------- HELPERS --------------------
+def replace_object(cursor, kind, name, ddl):
+    """Drop-and-create a PROCEDURE, FUNCTION or TRIGGER so a step can be re-run."""
+    cursor.execute(f"DROP {kind} IF EXISTS `{name}`")
+    cursor.execute(ddl)
+    print(f"✓ Created {kind.lower()}: {name}")
+
+def add_index(cursor, table, name, columns):
+    """ALTER TABLE ... ADD INDEX unless an index with that name already exists."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (table, name))
+    if cursor.fetchall():
+        print(f"- Index exists: {table}.{name}")
+        return
+    cursor.execute(f"ALTER TABLE `{table}` ADD INDEX `{name}` ({columns})")
+    print(f"✓ Created index: {table}.{name} ({columns})")
+
+def add_column(cursor, table, name, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists."""
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (table, name))
+    if cursor.fetchall():
+        print(f"- Column exists: {table}.{name}")
+        return
+    cursor.execute(f"ALTER TABLE `{table}` ADD COLUMN `{name}` {definition}")
+    print(f"✓ Created column: {table}.{name}")
+
+def replace_primary_key(cursor, table, columns):
+    """Rebuild a table's PRIMARY KEY on the given columns unless it already matches."""
+    cursor.execute("""
+        SELECT column_name FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = 'PRIMARY'
+        ORDER BY seq_in_index
+    """, (table,))
+    current = [row[0] for row in cursor.fetchall()]
+    if current == [c.strip().strip("`") for c in columns.split(",")]:
+        print(f"- Primary key unchanged: {table} ({columns})")
+        return
+    cursor.execute(f"ALTER TABLE `{table}` DROP PRIMARY KEY, ADD PRIMARY KEY ({columns})")
+    print(f"✓ Rebuilt primary key: {table} ({columns})")
+
+# -------------------- MIGRATIONS --------------------
+# Every step must be idempotent (IF NOT EXISTS, drop-and-create, upserts) so a
+# run interrupted half way through can simply be repeated.
+
+def migration_001_base_schema(cursor):
+    """Tables, view, procedures, functions and triggers of the original app"""
+    # Create tables in correct order to handle foreign key dependencies
+    print("\nCreating tables...")
+
+    # 1. deliverypartner table (no foreign key dependencies)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `deliverypartner` (
+          `partner_id` int NOT NULL AUTO_INCREMENT,
+          `name` varchar(100) NOT NULL,
+          `phone` varchar(20) DEFAULT NULL,
+          `rating` decimal(2,1) DEFAULT NULL,
+          PRIMARY KEY (`partner_id`),
+          CONSTRAINT `deliverypartner_chk_1` CHECK ((`rating` between 0 and 5))
+        ) ENGINE=InnoDB AUTO_INCREMENT=15 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: deliverypartner")
+
+    # 2. payment table (no foreign key dependencies)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `payment` (
+          `pay_id` int NOT NULL AUTO_INCREMENT,
+          `method` varchar(50) NOT NULL,
+          `currency` varchar(10) DEFAULT 'INR',
+          `amount` decimal(10,2) DEFAULT NULL,
+          `status` varchar(30) NOT NULL,
+          PRIMARY KEY (`pay_id`),
+          CONSTRAINT `payment_chk_1` CHECK ((`amount` >= 0))
+        ) ENGINE=InnoDB AUTO_INCREMENT=49 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: payment")
+
+    # 3. user table (depends on payment)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `user` (
+          `user_id` int NOT NULL AUTO_INCREMENT,
+          `name` varchar(100) NOT NULL,
+          `email` varchar(150) NOT NULL,
+          `address` varchar(255) DEFAULT NULL,
+          `phone` varchar(20) DEFAULT NULL,
+          `pay_id` int DEFAULT NULL,
+          PRIMARY KEY (`user_id`),
+          UNIQUE KEY `email` (`email`),
+          KEY `pay_id` (`pay_id`),
+          CONSTRAINT `user_ibfk_1` FOREIGN KEY (`pay_id`) REFERENCES `payment` (`pay_id`) ON DELETE SET NULL ON UPDATE CASCADE
+        ) ENGINE=InnoDB AUTO_INCREMENT=17 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: user")
+
+    # 4. restaurant table (depends on deliverypartner)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `restaurant` (
+          `rest_id` int NOT NULL AUTO_INCREMENT,
+          `name` varchar(150) NOT NULL,
+          `address` varchar(255) DEFAULT NULL,
+          `rating` decimal(2,1) DEFAULT NULL,
+          `partner_id` int DEFAULT NULL,
+          PRIMARY KEY (`rest_id`),
+          KEY `partner_id` (`partner_id`),
+          CONSTRAINT `restaurant_ibfk_1` FOREIGN KEY (`partner_id`) REFERENCES `deliverypartner` (`partner_id`) ON DELETE SET NULL ON UPDATE CASCADE,
+          CONSTRAINT `restaurant_chk_1` CHECK ((`rating` between 0 and 5))
+        ) ENGINE=InnoDB AUTO_INCREMENT=14 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: restaurant")
+
+    # 5. orders table (depends on user, deliverypartner, payment)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `orders` (
+          `order_id` int NOT NULL AUTO_INCREMENT,
+          `order_date` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          `total_amt` decimal(10,2) DEFAULT NULL,
+          `status` varchar(30) DEFAULT NULL,
+          `user_id` int DEFAULT NULL,
+          `partner_id` int DEFAULT NULL,
+          `pay_id` int DEFAULT NULL,
+          PRIMARY KEY (`order_id`),
+          KEY `user_id` (`user_id`),
+          KEY `partner_id` (`partner_id`),
+          KEY `pay_id` (`pay_id`),
+          CONSTRAINT `orders_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `user` (`user_id`) ON DELETE CASCADE ON UPDATE CASCADE,
+          CONSTRAINT `orders_ibfk_2` FOREIGN KEY (`partner_id`) REFERENCES `deliverypartner` (`partner_id`) ON DELETE SET NULL ON UPDATE CASCADE,
+          CONSTRAINT `orders_ibfk_3` FOREIGN KEY (`pay_id`) REFERENCES `payment` (`pay_id`) ON DELETE SET NULL ON UPDATE CASCADE,
+          CONSTRAINT `orders_chk_1` CHECK ((`total_amt` >= 0))
+        ) ENGINE=InnoDB AUTO_INCREMENT=46 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: orders")
+
+    # 6. menuitem table (depends on restaurant, user)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `menuitem` (
+          `item_id` int NOT NULL AUTO_INCREMENT,
+          `name` varchar(150) NOT NULL,
+          `price` decimal(10,2) NOT NULL,
+          `quantity` int NOT NULL DEFAULT '1',
+          `rest_id` int DEFAULT NULL,
+          `user_id` int DEFAULT NULL,
+          PRIMARY KEY (`item_id`),
+          KEY `rest_id` (`rest_id`),
+          KEY `user_id` (`user_id`),
+          CONSTRAINT `menuitem_ibfk_1` FOREIGN KEY (`rest_id`) REFERENCES `restaurant` (`rest_id`) ON DELETE CASCADE ON UPDATE CASCADE,
+          CONSTRAINT `menuitem_ibfk_2` FOREIGN KEY (`user_id`) REFERENCES `user` (`user_id`) ON DELETE SET NULL ON UPDATE CASCADE,
+          CONSTRAINT `menuitem_chk_1` CHECK ((`price` > 0)),
+          CONSTRAINT `menuitem_chk_2` CHECK ((`quantity` >= 0))
+        ) ENGINE=InnoDB AUTO_INCREMENT=15 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: menuitem")
+
+    # 7. orderitem table (depends on orders, menuitem)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `orderitem` (
+          `orderitem_id` int NOT NULL AUTO_INCREMENT,
+          `order_id` int NOT NULL,
+          `item_id` int NOT NULL,
+          `quantity` int NOT NULL,
+          `price` decimal(10,2) NOT NULL,
+          PRIMARY KEY (`orderitem_id`),
+          KEY `order_id` (`order_id`),
+          KEY `item_id` (`item_id`),
+          CONSTRAINT `orderitem_ibfk_1` FOREIGN KEY (`order_id`) REFERENCES `orders` (`order_id`) ON DELETE CASCADE,
+          CONSTRAINT `orderitem_ibfk_2` FOREIGN KEY (`item_id`) REFERENCES `menuitem` (`item_id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB AUTO_INCREMENT=12 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: orderitem")
+    # Create view
+    print("\nCreating views...")
+    cursor.execute("""
+        CREATE OR REPLACE ALGORITHM=UNDEFINED SQL SECURITY DEFINER VIEW `order_summary_view` AS 
+        select `o`.`order_id` AS `order_id`,`o`.`order_date` AS `order_date`,`u`.`name` AS `customer_name`,
+        `dp`.`name` AS `delivery_partner`,`r`.`name` AS `restaurant_name`,`o`.`total_amt` AS `order_amount`,
+        `p`.`method` AS `payment_method`,`p`.`status` AS `payment_status`,`o`.`status` AS `order_status` 
+        from ((((`orders` `o` left join `user` `u` on((`o`.`user_id` = `u`.`user_id`))) 
+        left join `deliverypartner` `dp` on((`o`.`partner_id` = `dp`.`partner_id`))) 
+        left join `payment` `p` on((`o`.`pay_id` = `p`.`pay_id`))) 
+        left join `restaurant` `r` on((`dp`.`partner_id` = `r`.`partner_id`)))
+    """)
+    print("✓ Created view: order_summary_view")
+
+    # Create stored procedures
+    print("\nCreating stored procedures...")
+
+    # PlaceNewOrder procedure
+    replace_object(cursor, "PROCEDURE", "PlaceNewOrder", """
+        CREATE PROCEDURE `PlaceNewOrder`(
+            IN p_user_id INT,
+            IN p_total_amt DECIMAL(10,2),
+            IN p_method VARCHAR(50)
+        )
+        BEGIN
+            DECLARE v_pay_id INT;
+            DECLARE v_partner_id INT;
+
+            -- create payment
+            INSERT INTO payment(method, amount, status)
+            VALUES(p_method, p_total_amt, 'Pending');
+            SET v_pay_id = LAST_INSERT_ID();
+
+            -- assign random delivery partner
+            SELECT partner_id INTO v_partner_id
+            FROM deliverypartner
+            ORDER BY RAND()
+            LIMIT 1;
+
+            -- insert order
+            INSERT INTO orders(user_id, partner_id, pay_id, total_amt, status)
+            VALUES(p_user_id, v_partner_id, v_pay_id, p_total_amt, 'Placed');
+        END
+    """)
+
+    # UpdateOrderStatus procedure
+    replace_object(cursor, "PROCEDURE", "UpdateOrderStatus", """
+        CREATE PROCEDURE `UpdateOrderStatus`(
+            IN p_order_id INT,
+            IN p_new_status VARCHAR(30),
+            IN p_payment_status VARCHAR(30)
+        )
+        BEGIN
+            UPDATE orders
+            SET status = p_new_status
+            WHERE order_id = p_order_id;
+
+            UPDATE payment
+            SET status = p_payment_status
+            WHERE pay_id = (SELECT pay_id FROM orders WHERE order_id = p_order_id);
+        END
+    """)
+
+    # Create stored functions
+    print("\nCreating stored functions...")
+
+    # avg_restaurant_rating function
+    replace_object(cursor, "FUNCTION", "avg_restaurant_rating", """
+        CREATE FUNCTION `avg_restaurant_rating`() RETURNS decimal(3,2)
+        DETERMINISTIC
+        BEGIN
+            DECLARE avg_rating DECIMAL(3,2);
+            SELECT COALESCE(AVG(rating), 0)
+            INTO avg_rating
+            FROM restaurant;
+            RETURN avg_rating;
+        END
+    """)
+
+    # total_spent_by_user function
+    replace_object(cursor, "FUNCTION", "total_spent_by_user", """
+        CREATE FUNCTION `total_spent_by_user`(uid INT) RETURNS decimal(10,2)
+        DETERMINISTIC
+        BEGIN
+            DECLARE total DECIMAL(10,2);
+            SELECT COALESCE(SUM(p.amount), 0)
+            INTO total
+            FROM orders o
+            JOIN payment p ON o.pay_id = p.pay_id
+            WHERE o.user_id = uid;
+            RETURN total;
+        END
+    """)
+
+    # Create triggers
+    print("\nCreating triggers...")
+
+    # before_order_insert_create_payment trigger
+    replace_object(cursor, "TRIGGER", "before_order_insert_create_payment", """
+        CREATE TRIGGER `before_order_insert_create_payment` BEFORE INSERT ON `orders` FOR EACH ROW 
+        BEGIN
+            DECLARE v_pay_id INT;
+            IF NEW.pay_id IS NULL THEN
+                INSERT INTO payment(method, amount, status)
+                VALUES('COD', NEW.total_amt, 'Pending');
+                SET v_pay_id = LAST_INSERT_ID();
+                SET NEW.pay_id = v_pay_id;
+            END IF;
+        END
+    """)
+
+    # after_order_update_update_partner_rating trigger
+    replace_object(cursor, "TRIGGER", "after_order_update_update_partner_rating", """
+        CREATE TRIGGER `after_order_update_update_partner_rating` AFTER UPDATE ON `orders` FOR EACH ROW 
+        BEGIN
+            IF NEW.status = 'Delivered' AND OLD.status <> 'Delivered' THEN
+                UPDATE deliverypartner
+                SET rating = LEAST(5, COALESCE(rating, 3) + 0.1)
+                WHERE partner_id = NEW.partner_id;
+            END IF;
+        END
+    """)
+
+def migration_002_kpi_counters(cursor):
+    """Dashboard KPI counters maintained by triggers"""
+    # Kept current by the triggers below so the admin dashboard never has to
+    # scan orders/user/restaurant/deliverypartner
+    print("\nCreating KPI counters...")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `kpi_counters` (
+          `name` varchar(50) NOT NULL,
+          `value` decimal(14,2) NOT NULL DEFAULT '0.00',
+          PRIMARY KEY (`name`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    cursor.execute("""
+        INSERT INTO kpi_counters (name, value)
+        SELECT 'total_orders', COUNT(*) FROM orders
+        UNION ALL SELECT 'delivered_revenue', COALESCE(SUM(total_amt), 0) FROM orders WHERE status = 'Delivered'
+        UNION ALL SELECT 'total_users', COUNT(*) FROM user
+        UNION ALL SELECT 'total_restaurants', COUNT(*) FROM restaurant
+        UNION ALL SELECT 'restaurant_rating_sum', COALESCE(SUM(rating), 0) FROM restaurant
+        UNION ALL SELECT 'rated_restaurants', COUNT(rating) FROM restaurant
+        UNION ALL SELECT 'total_partners', COUNT(*) FROM deliverypartner
+        ON DUPLICATE KEY UPDATE value = VALUES(value)
+    """)
+    print("✓ Created table: kpi_counters")
+
+    replace_object(cursor, "TRIGGER", "after_order_insert_update_kpi", """
+        CREATE TRIGGER `after_order_insert_update_kpi` AFTER INSERT ON `orders` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value + 1 WHERE name = 'total_orders';
+            IF NEW.status = 'Delivered' THEN
+                UPDATE kpi_counters SET value = value + COALESCE(NEW.total_amt, 0)
+                WHERE name = 'delivered_revenue';
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_update_update_kpi", """
+        CREATE TRIGGER `after_order_update_update_kpi` AFTER UPDATE ON `orders` FOR EACH ROW 
+        BEGIN
+            DECLARE v_delta DECIMAL(12,2);
+            SET v_delta = IF(NEW.status = 'Delivered', COALESCE(NEW.total_amt, 0), 0)
+                        - IF(OLD.status = 'Delivered', COALESCE(OLD.total_amt, 0), 0);
+            IF v_delta <> 0 THEN
+                UPDATE kpi_counters SET value = value + v_delta WHERE name = 'delivered_revenue';
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_delete_update_kpi", """
+        CREATE TRIGGER `after_order_delete_update_kpi` AFTER DELETE ON `orders` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value - 1 WHERE name = 'total_orders';
+            IF OLD.status = 'Delivered' THEN
+                UPDATE kpi_counters SET value = value - COALESCE(OLD.total_amt, 0)
+                WHERE name = 'delivered_revenue';
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_user_insert_update_kpi", """
+        CREATE TRIGGER `after_user_insert_update_kpi` AFTER INSERT ON `user` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value + 1 WHERE name = 'total_users';
+        END
+    """)
+
+    # Orders removed by ON DELETE CASCADE do not fire their own triggers,
+    # so the user trigger accounts for them before the cascade runs
+    replace_object(cursor, "TRIGGER", "before_user_delete_update_kpi", """
+        CREATE TRIGGER `before_user_delete_update_kpi` BEFORE DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value - 1 WHERE name = 'total_users';
+            UPDATE kpi_counters
+            SET value = value - (SELECT COUNT(*) FROM orders WHERE user_id = OLD.user_id)
+            WHERE name = 'total_orders';
+            UPDATE kpi_counters
+            SET value = value - (SELECT COALESCE(SUM(total_amt), 0) FROM orders
+                                 WHERE user_id = OLD.user_id AND status = 'Delivered')
+            WHERE name = 'delivered_revenue';
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_restaurant_insert_update_kpi", """
+        CREATE TRIGGER `after_restaurant_insert_update_kpi` AFTER INSERT ON `restaurant` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value + 1 WHERE name = 'total_restaurants';
+            IF NEW.rating IS NOT NULL THEN
+                UPDATE kpi_counters SET value = value + NEW.rating WHERE name = 'restaurant_rating_sum';
+                UPDATE kpi_counters SET value = value + 1 WHERE name = 'rated_restaurants';
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_restaurant_update_update_kpi", """
+        CREATE TRIGGER `after_restaurant_update_update_kpi` AFTER UPDATE ON `restaurant` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.rating <=> OLD.rating) THEN
+                UPDATE kpi_counters
+                SET value = value + COALESCE(NEW.rating, 0) - COALESCE(OLD.rating, 0)
+                WHERE name = 'restaurant_rating_sum';
+                UPDATE kpi_counters
+                SET value = value + (NEW.rating IS NOT NULL) - (OLD.rating IS NOT NULL)
+                WHERE name = 'rated_restaurants';
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_restaurant_delete_update_kpi", """
+        CREATE TRIGGER `after_restaurant_delete_update_kpi` AFTER DELETE ON `restaurant` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value - 1 WHERE name = 'total_restaurants';
+            IF OLD.rating IS NOT NULL THEN
+                UPDATE kpi_counters SET value = value - OLD.rating WHERE name = 'restaurant_rating_sum';
+                UPDATE kpi_counters SET value = value - 1 WHERE name = 'rated_restaurants';
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_insert_update_kpi", """
+        CREATE TRIGGER `after_partner_insert_update_kpi` AFTER INSERT ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value + 1 WHERE name = 'total_partners';
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_delete_update_kpi", """
+        CREATE TRIGGER `after_partner_delete_update_kpi` AFTER DELETE ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            UPDATE kpi_counters SET value = value - 1 WHERE name = 'total_partners';
+        END
+    """)
+
+def migration_003_partner_load(cursor):
+    """Live per-partner load for least-loaded partner assignment"""
+    # Live count of 'Placed'/'Out for Delivery' orders per partner, maintained by
+    # triggers; the pick index makes least-loaded assignment a single index dive
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `partner_load` (
+          `partner_id` int NOT NULL,
+          `active_orders` int NOT NULL DEFAULT '0',
+          `rating` decimal(2,1) DEFAULT NULL,
+          PRIMARY KEY (`partner_id`),
+          KEY `idx_partner_load_pick` (`active_orders`, `rating` DESC),
+          CONSTRAINT `partner_load_ibfk_1` FOREIGN KEY (`partner_id`) REFERENCES `deliverypartner` (`partner_id`) ON DELETE CASCADE ON UPDATE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    cursor.execute("""
+        INSERT INTO partner_load (partner_id, active_orders, rating)
+        SELECT dp.partner_id, COUNT(o.order_id), dp.rating
+        FROM deliverypartner dp
+        LEFT JOIN orders o ON o.partner_id = dp.partner_id
+                          AND o.status IN ('Placed', 'Out for Delivery')
+        GROUP BY dp.partner_id, dp.rating
+        ON DUPLICATE KEY UPDATE active_orders = VALUES(active_orders), rating = VALUES(rating)
+    """)
+    print("✓ Created table: partner_load")
+
+    # Partner load triggers keep partner_load in step with order status changes
+    print("\nCreating partner load triggers...")
+    replace_object(cursor, "TRIGGER", "after_partner_insert_add_load", """
+        CREATE TRIGGER `after_partner_insert_add_load` AFTER INSERT ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            INSERT INTO partner_load (partner_id, active_orders, rating)
+            VALUES (NEW.partner_id, 0, NEW.rating);
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_update_sync_load", """
+        CREATE TRIGGER `after_partner_update_sync_load` AFTER UPDATE ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.rating <=> OLD.rating) THEN
+                UPDATE partner_load SET rating = NEW.rating WHERE partner_id = NEW.partner_id;
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_insert_update_load", """
+        CREATE TRIGGER `after_order_insert_update_load` AFTER INSERT ON `orders` FOR EACH ROW 
+        BEGIN
+            IF NEW.partner_id IS NOT NULL AND NEW.status IN ('Placed', 'Out for Delivery') THEN
+                UPDATE partner_load SET active_orders = active_orders + 1
+                WHERE partner_id = NEW.partner_id;
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_update_update_load", """
+        CREATE TRIGGER `after_order_update_update_load` AFTER UPDATE ON `orders` FOR EACH ROW 
+        BEGIN
+            DECLARE v_was_active BOOLEAN;
+            DECLARE v_is_active BOOLEAN;
+            SET v_was_active = OLD.partner_id IS NOT NULL AND COALESCE(OLD.status IN ('Placed', 'Out for Delivery'), FALSE);
+            SET v_is_active = NEW.partner_id IS NOT NULL AND COALESCE(NEW.status IN ('Placed', 'Out for Delivery'), FALSE);
+            IF v_was_active AND (NOT v_is_active OR NEW.partner_id <> OLD.partner_id) THEN
+                UPDATE partner_load SET active_orders = GREATEST(active_orders - 1, 0)
+                WHERE partner_id = OLD.partner_id;
+            END IF;
+            IF v_is_active AND (NOT v_was_active OR NEW.partner_id <> OLD.partner_id) THEN
+                UPDATE partner_load SET active_orders = active_orders + 1
+                WHERE partner_id = NEW.partner_id;
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_delete_update_load", """
+        CREATE TRIGGER `after_order_delete_update_load` AFTER DELETE ON `orders` FOR EACH ROW 
+        BEGIN
+            IF OLD.partner_id IS NOT NULL AND OLD.status IN ('Placed', 'Out for Delivery') THEN
+                UPDATE partner_load SET active_orders = GREATEST(active_orders - 1, 0)
+                WHERE partner_id = OLD.partner_id;
+            END IF;
+        END
+    """)
+
+    # Cascaded order deletes skip the orders triggers
+    replace_object(cursor, "TRIGGER", "before_user_delete_release_load", """
+        CREATE TRIGGER `before_user_delete_release_load` BEFORE DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            UPDATE partner_load pl
+            JOIN (SELECT partner_id, COUNT(*) AS n FROM orders
+                  WHERE user_id = OLD.user_id AND partner_id IS NOT NULL
+                    AND status IN ('Placed', 'Out for Delivery')
+                  GROUP BY partner_id) released ON released.partner_id = pl.partner_id
+            SET pl.active_orders = GREATEST(pl.active_orders - released.n, 0);
+        END
+    """)
+
+    # PlaceNewOrder picks from partner_load instead of ORDER BY RAND()
+    replace_object(cursor, "PROCEDURE", "PlaceNewOrder", """
+        CREATE PROCEDURE `PlaceNewOrder`(
+            IN p_user_id INT,
+            IN p_total_amt DECIMAL(10,2),
+            IN p_method VARCHAR(50)
+        )
+        BEGIN
+            DECLARE v_pay_id INT;
+            DECLARE v_partner_id INT;
+
+            -- create payment
+            INSERT INTO payment(method, amount, status)
+            VALUES(p_method, p_total_amt, 'Pending');
+            SET v_pay_id = LAST_INSERT_ID();
+
+            -- assign the least-loaded, then highest-rated, delivery partner
+            SELECT partner_id INTO v_partner_id
+            FROM partner_load
+            ORDER BY active_orders, rating DESC
+            LIMIT 1;
+
+            -- insert order
+            INSERT INTO orders(user_id, partner_id, pay_id, total_amt, status)
+            VALUES(p_user_id, v_partner_id, v_pay_id, p_total_amt, 'Placed');
+        END
+    """)
+
+def migration_004_workload_indexes(cursor):
+    """Composite/covering indexes for the app's access paths"""
+    print("\nCreating indexes...")
+    # Dashboard / admin grid / monthly trend: newest orders first, date ranges
+    add_index(cursor, "orders", "idx_orders_date", "`order_date`, `total_amt`")
+    # show_partner_orders and partner stats: one partner's orders by status and date
+    add_index(cursor, "orders", "idx_orders_partner_status_date", "`partner_id`, `status`, `order_date`")
+    # show_user_orders and profile: one user's orders, newest first
+    add_index(cursor, "orders", "idx_orders_user_date", "`user_id`, `order_date`")
+    # Analytics filtered on status ('Delivered'); covers revenue sums
+    add_index(cursor, "orders", "idx_orders_status_date", "`status`, `order_date`, `total_amt`")
+    # Partner login
+    add_index(cursor, "deliverypartner", "idx_partner_name_phone", "`name`, `phone`")
+
+def migration_005_daily_sales(cursor):
+    """Daily sales rollup maintained by triggers"""
+    print("\nCreating daily sales rollup...")
+    # One row per (day, payment method, order status); averages are revenue_sum / order_count
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `daily_sales` (
+          `sale_date` date NOT NULL,
+          `method` varchar(50) NOT NULL,
+          `status` varchar(30) NOT NULL,
+          `order_count` int NOT NULL DEFAULT '0',
+          `revenue_sum` decimal(14,2) NOT NULL DEFAULT '0.00',
+          PRIMARY KEY (`sale_date`, `method`, `status`),
+          KEY `idx_daily_sales_status_method` (`status`, `method`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    # Rebuilt from scratch so re-running the step leaves exact totals
+    cursor.execute("DELETE FROM daily_sales")
+    cursor.execute("""
+        INSERT INTO daily_sales (sale_date, method, status, order_count, revenue_sum)
+        SELECT DATE(o.order_date), COALESCE(p.method, 'Unknown'), COALESCE(o.status, ''),
+               COUNT(*), COALESCE(SUM(o.total_amt), 0)
+        FROM orders o
+        LEFT JOIN payment p ON o.pay_id = p.pay_id
+        GROUP BY DATE(o.order_date), COALESCE(p.method, 'Unknown'), COALESCE(o.status, '')
+    """)
+    print("✓ Created table: daily_sales")
+
+    replace_object(cursor, "PROCEDURE", "bump_daily_sales", """
+        CREATE PROCEDURE `bump_daily_sales`(
+            IN p_date DATE,
+            IN p_pay_id INT,
+            IN p_status VARCHAR(30),
+            IN p_count INT,
+            IN p_amount DECIMAL(10,2)
+        )
+        BEGIN
+            DECLARE v_method VARCHAR(50);
+            SELECT method INTO v_method FROM payment WHERE pay_id = p_pay_id;
+            INSERT INTO daily_sales (sale_date, method, status, order_count, revenue_sum)
+            VALUES (p_date, COALESCE(v_method, 'Unknown'), COALESCE(p_status, ''),
+                    p_count, p_count * COALESCE(p_amount, 0))
+            ON DUPLICATE KEY UPDATE
+                order_count = order_count + VALUES(order_count),
+                revenue_sum = revenue_sum + VALUES(revenue_sum);
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_insert_update_daily_sales", """
+        CREATE TRIGGER `after_order_insert_update_daily_sales` AFTER INSERT ON `orders` FOR EACH ROW 
+        BEGIN
+            CALL bump_daily_sales(DATE(NEW.order_date), NEW.pay_id, NEW.status, 1, NEW.total_amt);
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_update_update_daily_sales", """
+        CREATE TRIGGER `after_order_update_update_daily_sales` AFTER UPDATE ON `orders` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.order_date <=> OLD.order_date AND NEW.status <=> OLD.status
+                    AND NEW.total_amt <=> OLD.total_amt AND NEW.pay_id <=> OLD.pay_id) THEN
+                CALL bump_daily_sales(DATE(OLD.order_date), OLD.pay_id, OLD.status, -1, OLD.total_amt);
+                CALL bump_daily_sales(DATE(NEW.order_date), NEW.pay_id, NEW.status, 1, NEW.total_amt);
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_delete_update_daily_sales", """
+        CREATE TRIGGER `after_order_delete_update_daily_sales` AFTER DELETE ON `orders` FOR EACH ROW 
+        BEGIN
+            CALL bump_daily_sales(DATE(OLD.order_date), OLD.pay_id, OLD.status, -1, OLD.total_amt);
+        END
+    """)
+
+    # A payment switching method moves its orders to the other bucket
+    replace_object(cursor, "TRIGGER", "after_payment_update_update_daily_sales", """
+        CREATE TRIGGER `after_payment_update_update_daily_sales` AFTER UPDATE ON `payment` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.method <=> OLD.method) THEN
+                INSERT INTO daily_sales (sale_date, method, status, order_count, revenue_sum)
+                SELECT DATE(order_date), moved.method, COALESCE(status, ''),
+                       moved.sign * COUNT(*), moved.sign * COALESCE(SUM(total_amt), 0)
+                FROM orders
+                JOIN (SELECT OLD.method AS method, -1 AS sign
+                      UNION ALL SELECT NEW.method, 1) moved
+                WHERE pay_id = NEW.pay_id
+                GROUP BY DATE(order_date), moved.method, moved.sign, COALESCE(status, '')
+                ON DUPLICATE KEY UPDATE
+                    order_count = order_count + VALUES(order_count),
+                    revenue_sum = revenue_sum + VALUES(revenue_sum);
+            END IF;
+        END
+    """)
+
+    # Cascaded order deletes skip the orders triggers
+    replace_object(cursor, "TRIGGER", "before_user_delete_update_daily_sales", """
+        CREATE TRIGGER `before_user_delete_update_daily_sales` BEFORE DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            INSERT INTO daily_sales (sale_date, method, status, order_count, revenue_sum)
+            SELECT DATE(o.order_date), COALESCE(p.method, 'Unknown'), COALESCE(o.status, ''),
+                   -COUNT(*), -COALESCE(SUM(o.total_amt), 0)
+            FROM orders o
+            LEFT JOIN payment p ON o.pay_id = p.pay_id
+            WHERE o.user_id = OLD.user_id
+            GROUP BY DATE(o.order_date), COALESCE(p.method, 'Unknown'), COALESCE(o.status, '')
+            ON DUPLICATE KEY UPDATE
+                order_count = order_count + VALUES(order_count),
+                revenue_sum = revenue_sum + VALUES(revenue_sum);
+        END
+    """)
+
+def migration_006_menu_updated_at(cursor):
+    """Row change timestamp on menuitem for the app's catalog stock refresh"""
+    print("\nAdding menu change tracking...")
+    # Set on insert and on every update that changes the row (checkout stock
+    # decrements, admin edits); the app polls rows newer than its last look
+    add_column(cursor, "menuitem", "updated_at",
+               "timestamp(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3) ON UPDATE CURRENT_TIMESTAMP(3)")
+    add_index(cursor, "menuitem", "idx_menuitem_updated", "`updated_at`")
+
+def migration_007_stock_reservations(cursor):
+    """Time-limited stock holds for carts"""
+    print("\nCreating stock reservations...")
+    # Units in here have already been taken out of menuitem.quantity; the app
+    # returns expired holds to stock in bulk (see sweep_expired_reservations)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `stock_reservation` (
+          `res_id` bigint NOT NULL AUTO_INCREMENT,
+          `cart_id` char(32) NOT NULL,
+          `user_id` int DEFAULT NULL,
+          `item_id` int NOT NULL,
+          `quantity` int NOT NULL,
+          `expires_at` timestamp(3) NOT NULL,
+          PRIMARY KEY (`res_id`),
+          UNIQUE KEY `uq_reservation_cart_item` (`cart_id`, `item_id`),
+          KEY `idx_reservation_expires` (`expires_at`),
+          KEY `item_id` (`item_id`),
+          CONSTRAINT `stock_reservation_ibfk_1` FOREIGN KEY (`item_id`) REFERENCES `menuitem` (`item_id`) ON DELETE CASCADE,
+          CONSTRAINT `stock_reservation_chk_1` CHECK ((`quantity` > 0))
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: stock_reservation")
+
+def migration_008_order_intake(cursor):
+    """Idempotency keys for orders written from the app's async order queue"""
+    print("\nCreating order intake log...")
+    # Written in the same transaction as the order, so a replayed queue batch
+    # can tell which of its checkouts already committed
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `order_intake` (
+          `intake_key` char(32) NOT NULL,
+          `order_id` int NOT NULL,
+          `placed_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (`intake_key`),
+          KEY `order_id` (`order_id`),
+          CONSTRAINT `order_intake_ibfk_1` FOREIGN KEY (`order_id`) REFERENCES `orders` (`order_id`) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: order_intake")
+
+def migration_009_order_events(cursor):
+    """Append-only change log of orders, for delta polling"""
+    print("\nCreating order change log...")
+    # One row per change to an order a partner sees; the partner panel reads
+    # the rows after the last event_id it has applied
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `order_events` (
+          `event_id` bigint NOT NULL AUTO_INCREMENT,
+          `order_id` int NOT NULL,
+          `partner_id` int DEFAULT NULL,
+          `event_type` varchar(20) NOT NULL,
+          `created_at` timestamp(3) NOT NULL DEFAULT CURRENT_TIMESTAMP(3),
+          PRIMARY KEY (`event_id`),
+          KEY `idx_order_events_partner` (`partner_id`, `event_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: order_events")
+
+    replace_object(cursor, "TRIGGER", "after_order_insert_log_event", """
+        CREATE TRIGGER `after_order_insert_log_event` AFTER INSERT ON `orders` FOR EACH ROW 
+        BEGIN
+            INSERT INTO order_events (order_id, partner_id, event_type)
+            VALUES (NEW.order_id, NEW.partner_id, 'created');
+        END
+    """)
+
+    # A reassigned order is logged for both partners so the old one drops it
+    replace_object(cursor, "TRIGGER", "after_order_update_log_event", """
+        CREATE TRIGGER `after_order_update_log_event` AFTER UPDATE ON `orders` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.status <=> OLD.status) OR NOT (NEW.partner_id <=> OLD.partner_id)
+               OR NOT (NEW.total_amt <=> OLD.total_amt) OR NOT (NEW.pay_id <=> OLD.pay_id) THEN
+                INSERT INTO order_events (order_id, partner_id, event_type)
+                VALUES (NEW.order_id, NEW.partner_id, 'updated');
+                IF NOT (NEW.partner_id <=> OLD.partner_id) AND OLD.partner_id IS NOT NULL THEN
+                    INSERT INTO order_events (order_id, partner_id, event_type)
+                    VALUES (OLD.order_id, OLD.partner_id, 'reassigned');
+                END IF;
+            END IF;
+        END
+    """)
+
+    # Payment rows are inserted before their order exists, so only updates are logged
+    replace_object(cursor, "TRIGGER", "after_payment_update_log_event", """
+        CREATE TRIGGER `after_payment_update_log_event` AFTER UPDATE ON `payment` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.status <=> OLD.status) OR NOT (NEW.method <=> OLD.method) THEN
+                INSERT INTO order_events (order_id, partner_id, event_type)
+                SELECT order_id, partner_id, 'payment' FROM orders WHERE pay_id = NEW.pay_id;
+            END IF;
+        END
+    """)
+
+def migration_010_credentials(cursor):
+    """Hashed credentials with an indexed lookup key per role"""
+    print("\nCreating credentials...")
+    # One row per way to log in: a user has one for the email and one for the
+    # name. Users and partners get rows on their first login; names are not
+    # unique, so a login can have several candidates
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `credentials` (
+          `cred_id` int NOT NULL AUTO_INCREMENT,
+          `role` varchar(10) NOT NULL,
+          `login` varchar(150) NOT NULL,
+          `principal_id` int NOT NULL,
+          `password_hash` varchar(200) NOT NULL,
+          `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+          PRIMARY KEY (`cred_id`),
+          UNIQUE KEY `uq_credentials_login` (`role`, `login`, `principal_id`),
+          KEY `idx_credentials_principal` (`role`, `principal_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    print("✓ Created table: credentials")
+
+    # Login of accounts without credentials yet: email is unique, names need an index
+    add_index(cursor, "user", "idx_user_name_phone", "`name`, `phone`")
+
+    cursor.execute("SELECT COUNT(*) FROM credentials WHERE role = 'admin'")
+    if cursor.fetchone()[0] == 0:
+        password_hash = hash_password("admin123")
+        cursor.executemany("""
+            INSERT INTO credentials (role, login, principal_id, password_hash) VALUES ('admin', %s, 0, %s)
+        """, [("admin", password_hash), ("admin@foodapp.com", password_hash)])
+        print("✓ Seeded admin credentials")
+
+    # The phone is the password and the email/name the login, so changing
+    # any of them drops the stale credentials; the next login re-creates them
+    replace_object(cursor, "TRIGGER", "after_user_update_drop_credentials", """
+        CREATE TRIGGER `after_user_update_drop_credentials` AFTER UPDATE ON `user` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.email <=> OLD.email) OR NOT (NEW.name <=> OLD.name) OR NOT (NEW.phone <=> OLD.phone) THEN
+                DELETE FROM credentials WHERE role = 'user' AND principal_id = OLD.user_id;
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_user_delete_drop_credentials", """
+        CREATE TRIGGER `after_user_delete_drop_credentials` AFTER DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            DELETE FROM credentials WHERE role = 'user' AND principal_id = OLD.user_id;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_update_drop_credentials", """
+        CREATE TRIGGER `after_partner_update_drop_credentials` AFTER UPDATE ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.name <=> OLD.name) OR NOT (NEW.phone <=> OLD.phone) THEN
+                DELETE FROM credentials WHERE role = 'partner' AND principal_id = OLD.partner_id;
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_delete_drop_credentials", """
+        CREATE TRIGGER `after_partner_delete_drop_credentials` AFTER DELETE ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            DELETE FROM credentials WHERE role = 'partner' AND principal_id = OLD.partner_id;
+        END
+    """)
+
+def migration_011_checkout_procedure(cursor):
+    """Checkout procedure: a whole JSON cart becomes an order in one call"""
+    print("\nCreating checkout procedure...")
+    # Same steps and lock order as write_order() in dbmstest1.py, but the
+    # statements run next to the data: the client makes one round trip
+    # however many lines the cart has. Prices come from menuitem, never from
+    # the client. Returns one result set: (order_id, NULL, ...) on success,
+    # or one (NULL, item_id, name, requested, available) row per short line.
+    replace_object(cursor, "PROCEDURE", "Checkout", """
+        CREATE PROCEDURE `Checkout`(
+            IN p_user_id INT,
+            IN p_method VARCHAR(50),
+            IN p_cart JSON,
+            IN p_cart_id CHAR(32)
+        )
+        checkout: BEGIN
+            DECLARE v_rows INT;
+            DECLARE v_total DECIMAL(10,2);
+            DECLARE v_pay_id INT;
+            DECLARE v_partner_id INT;
+            DECLARE v_order_id INT;
+
+            DECLARE EXIT HANDLER FOR SQLEXCEPTION
+            BEGIN
+                ROLLBACK;
+                DROP TEMPORARY TABLE IF EXISTS checkout_lines;
+                RESIGNAL;
+            END;
+
+            -- READ COMMITTED: repricing reads menuitem rows the cart's holds
+            -- already cover without share-locking them
+            SET TRANSACTION ISOLATION LEVEL READ COMMITTED;
+            START TRANSACTION;
+
+            DROP TEMPORARY TABLE IF EXISTS checkout_lines;
+            CREATE TEMPORARY TABLE checkout_lines (
+                item_id INT NOT NULL PRIMARY KEY,
+                quantity INT NOT NULL DEFAULT 0,
+                held INT NOT NULL DEFAULT 0,
+                name VARCHAR(150),
+                price DECIMAL(10,2),
+                in_stock INT
+            ) ENGINE=InnoDB;
+
+            -- The cart's holds first (locked as in reserve_stock and the sweep)
+            IF p_cart_id IS NOT NULL THEN
+                SELECT COUNT(*) INTO v_rows FROM stock_reservation
+                WHERE cart_id = p_cart_id FOR UPDATE;
+                INSERT INTO checkout_lines (item_id, held)
+                SELECT item_id, quantity FROM stock_reservation WHERE cart_id = p_cart_id;
+            END IF;
+
+            INSERT INTO checkout_lines (item_id, quantity)
+            SELECT * FROM (
+                SELECT j.item_id, SUM(j.quantity) AS qty
+                FROM JSON_TABLE(p_cart, '$[*]' COLUMNS (
+                    item_id INT PATH '$.item_id',
+                    quantity INT PATH '$.quantity'
+                )) AS j
+                WHERE j.item_id IS NOT NULL AND j.quantity > 0
+                GROUP BY j.item_id
+            ) AS c
+            ON DUPLICATE KEY UPDATE quantity = c.qty;
+
+            SELECT COUNT(*) INTO v_rows FROM checkout_lines WHERE quantity > 0;
+            IF v_rows = 0 THEN
+                SIGNAL SQLSTATE '45000' SET MESSAGE_TEXT = 'Cart is empty';
+            END IF;
+
+            -- Lock the stock rows the holds don't cover, in item_id order
+            SELECT COUNT(*) INTO v_rows
+            FROM checkout_lines l STRAIGHT_JOIN menuitem m ON m.item_id = l.item_id
+            WHERE l.held < l.quantity
+            FOR UPDATE OF m;
+
+            UPDATE checkout_lines l JOIN menuitem m ON m.item_id = l.item_id
+            SET l.name = m.name, l.price = m.price, l.in_stock = m.quantity;
+
+            SELECT COUNT(*) INTO v_rows FROM checkout_lines
+            WHERE quantity > held AND COALESCE(in_stock, 0) + held < quantity;
+            IF v_rows > 0 THEN
+                SELECT NULL AS order_id, item_id, COALESCE(name, CONCAT('item ', item_id)) AS name,
+                       quantity AS requested, COALESCE(in_stock, 0) + held AS available
+                FROM checkout_lines
+                WHERE quantity > held AND COALESCE(in_stock, 0) + held < quantity
+                ORDER BY item_id;
+                ROLLBACK;
+                DROP TEMPORARY TABLE checkout_lines;
+                LEAVE checkout;
+            END IF;
+
+            SELECT SUM(price * quantity) INTO v_total FROM checkout_lines WHERE quantity > 0;
+
+            INSERT INTO payment (method, amount, status)
+            VALUES (p_method, v_total, 'Pending');
+            SET v_pay_id = LAST_INSERT_ID();
+
+            -- Least-loaded, then highest-rated partner; any partner if partner_load is empty
+            SELECT partner_id INTO v_partner_id FROM partner_load
+            ORDER BY active_orders, rating DESC
+            LIMIT 1;
+            IF v_partner_id IS NULL THEN
+                SELECT partner_id INTO v_partner_id FROM deliverypartner ORDER BY RAND() LIMIT 1;
+            END IF;
+
+            INSERT INTO orders (user_id, total_amt, status, pay_id, partner_id, order_date)
+            VALUES (p_user_id, v_total, 'Placed', v_pay_id, v_partner_id, NOW());
+            SET v_order_id = LAST_INSERT_ID();
+
+            INSERT INTO orderitem (order_id, item_id, quantity, price)
+            SELECT v_order_id, item_id, quantity, price
+            FROM checkout_lines WHERE quantity > 0 ORDER BY item_id;
+
+            -- Take what the holds don't cover, give back holds the cart no longer needs
+            UPDATE menuitem m JOIN checkout_lines l ON l.item_id = m.item_id
+            SET m.quantity = m.quantity + l.held - l.quantity
+            WHERE l.held <> l.quantity;
+
+            IF p_cart_id IS NOT NULL THEN
+                DELETE FROM stock_reservation WHERE cart_id = p_cart_id;
+            END IF;
+
+            COMMIT;
+            DROP TEMPORARY TABLE checkout_lines;
+
+            SELECT v_order_id AS order_id, NULL AS item_id, NULL AS name,
+                   NULL AS requested, NULL AS available;
+        END
+    """)
+
+def migration_012_order_archive(cursor):
+    """Monthly-partitioned archive of closed orders, items and payments"""
+    print("\nCreating order archive...")
+    # archive.py moves closed orders of past months here in batches, so the
+    # hot tables (and their indexes) hold only recent and open orders. A
+    # partitioned table can't have foreign keys, so the archive has none;
+    # each row carries order_date to partition on. archive.py splits
+    # p_future into one partition per month before moving that month.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `orders_archive` (
+          `order_id` int NOT NULL,
+          `order_date` datetime NOT NULL,
+          `total_amt` decimal(10,2) DEFAULT NULL,
+          `status` varchar(30) DEFAULT NULL,
+          `user_id` int DEFAULT NULL,
+          `partner_id` int DEFAULT NULL,
+          `pay_id` int DEFAULT NULL,
+          PRIMARY KEY (`order_id`, `order_date`),
+          KEY `idx_orders_archive_user` (`user_id`, `order_date`),
+          KEY `idx_orders_archive_partner` (`partner_id`, `order_date`),
+          KEY `idx_orders_archive_status` (`status`, `order_date`, `total_amt`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+        PARTITION BY RANGE COLUMNS(`order_date`) (PARTITION `p_future` VALUES LESS THAN (MAXVALUE))
+    """)
+    print("✓ Created table: orders_archive")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `orderitem_archive` (
+          `orderitem_id` int NOT NULL,
+          `order_id` int NOT NULL,
+          `item_id` int NOT NULL,
+          `quantity` int NOT NULL,
+          `price` decimal(10,2) NOT NULL,
+          `order_date` datetime NOT NULL,
+          PRIMARY KEY (`orderitem_id`, `order_date`),
+          KEY `idx_orderitem_archive_order` (`order_id`, `order_date`),
+          KEY `idx_orderitem_archive_item` (`item_id`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+        PARTITION BY RANGE COLUMNS(`order_date`) (PARTITION `p_future` VALUES LESS THAN (MAXVALUE))
+    """)
+    print("✓ Created table: orderitem_archive")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `payment_archive` (
+          `pay_id` int NOT NULL,
+          `method` varchar(50) NOT NULL,
+          `currency` varchar(10) DEFAULT NULL,
+          `amount` decimal(10,2) DEFAULT NULL,
+          `status` varchar(30) NOT NULL,
+          `order_id` int NOT NULL,
+          `order_date` datetime NOT NULL,
+          PRIMARY KEY (`pay_id`, `order_date`),
+          KEY `idx_payment_archive_order` (`order_id`, `order_date`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+        PARTITION BY RANGE COLUMNS(`order_date`) (PARTITION `p_future` VALUES LESS THAN (MAXVALUE))
+    """)
+    print("✓ Created table: payment_archive")
+
+    # Whole history for reports; conditions on the view are pushed into both branches
+    cursor.execute("""
+        CREATE OR REPLACE VIEW `orders_history` AS
+        SELECT order_id, order_date, total_amt, status, user_id, partner_id, pay_id FROM orders
+        UNION ALL
+        SELECT order_id, order_date, total_amt, status, user_id, partner_id, pay_id FROM orders_archive
+    """)
+    print("✓ Created view: orders_history")
+
+    cursor.execute("""
+        CREATE OR REPLACE VIEW `orderitem_history` AS
+        SELECT oi.order_id, oi.item_id, oi.quantity, oi.price, o.order_date, o.status
+        FROM orderitem oi JOIN orders o ON o.order_id = oi.order_id
+        UNION ALL
+        SELECT oi.order_id, oi.item_id, oi.quantity, oi.price, o.order_date, o.status
+        FROM orderitem_archive oi
+        JOIN orders_archive o ON o.order_id = oi.order_id AND o.order_date = oi.order_date
+    """)
+    print("✓ Created view: orderitem_history")
+
+    # Moving an order out of `orders` is not a delete: KPI counters and the
+    # daily_sales rollup keep counting it. archive.py sets @archiving while it moves.
+    replace_object(cursor, "TRIGGER", "after_order_delete_update_kpi", """
+        CREATE TRIGGER `after_order_delete_update_kpi` AFTER DELETE ON `orders` FOR EACH ROW
+        BEGIN
+            IF @archiving IS NULL THEN
+                UPDATE kpi_counters SET value = value - 1 WHERE name = 'total_orders';
+                IF OLD.status = 'Delivered' THEN
+                    UPDATE kpi_counters SET value = value - COALESCE(OLD.total_amt, 0)
+                    WHERE name = 'delivered_revenue';
+                END IF;
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_delete_update_daily_sales", """
+        CREATE TRIGGER `after_order_delete_update_daily_sales` AFTER DELETE ON `orders` FOR EACH ROW
+        BEGIN
+            IF @archiving IS NULL THEN
+                CALL bump_daily_sales(DATE(OLD.order_date), OLD.pay_id, OLD.status, -1, OLD.total_amt);
+            END IF;
+        END
+    """)
+
+def migration_013_partner_stats(cursor):
+    """Running per-partner delivery counters"""
+    # One row per partner, maintained by the orders triggers alongside
+    # after_order_update_update_partner_rating, so the partner dashboard and the
+    # partner performance report read a row per partner instead of their history
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `partner_stats` (
+          `partner_id` int NOT NULL,
+          `assigned_orders` int NOT NULL DEFAULT '0',
+          `delivered_orders` int NOT NULL DEFAULT '0',
+          `total_value` decimal(14,2) NOT NULL DEFAULT '0.00',
+          `last_delivery_at` datetime DEFAULT NULL,
+          PRIMARY KEY (`partner_id`),
+          CONSTRAINT `partner_stats_ibfk_1` FOREIGN KEY (`partner_id`) REFERENCES `deliverypartner` (`partner_id`) ON DELETE CASCADE ON UPDATE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    # Archived orders still count; orders_archive keeps partner ids of deleted
+    # partners, hence the join. Orders carry no delivery time, so the backfill
+    # takes the order date of the latest delivered order.
+    cursor.execute("""
+        INSERT INTO partner_stats (partner_id, assigned_orders, delivered_orders, total_value, last_delivery_at)
+        SELECT dp.partner_id, COUNT(o.partner_id), COALESCE(SUM(o.status = 'Delivered'), 0),
+               COALESCE(SUM(o.total_amt), 0), MAX(CASE WHEN o.status = 'Delivered' THEN o.order_date END)
+        FROM deliverypartner dp
+        LEFT JOIN orders_history o ON o.partner_id = dp.partner_id
+        GROUP BY dp.partner_id
+        ON DUPLICATE KEY UPDATE
+            assigned_orders = VALUES(assigned_orders),
+            delivered_orders = VALUES(delivered_orders),
+            total_value = VALUES(total_value),
+            last_delivery_at = VALUES(last_delivery_at)
+    """)
+    print("✓ Created table: partner_stats")
+
+    print("\nCreating partner stats triggers...")
+    replace_object(cursor, "PROCEDURE", "bump_partner_stats", """
+        CREATE PROCEDURE `bump_partner_stats`(
+            IN p_partner_id INT,
+            IN p_count INT,
+            IN p_status VARCHAR(30),
+            IN p_amount DECIMAL(10,2),
+            IN p_delivered_at DATETIME
+        )
+        BEGIN
+            IF p_partner_id IS NOT NULL THEN
+                INSERT INTO partner_stats (partner_id, assigned_orders, delivered_orders, total_value, last_delivery_at)
+                VALUES (p_partner_id, p_count, IF(p_status = 'Delivered', p_count, 0),
+                        p_count * COALESCE(p_amount, 0), p_delivered_at)
+                ON DUPLICATE KEY UPDATE
+                    assigned_orders = assigned_orders + VALUES(assigned_orders),
+                    delivered_orders = delivered_orders + VALUES(delivered_orders),
+                    total_value = total_value + VALUES(total_value),
+                    last_delivery_at = COALESCE(GREATEST(last_delivery_at, VALUES(last_delivery_at)),
+                                                last_delivery_at, VALUES(last_delivery_at));
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_insert_add_stats", """
+        CREATE TRIGGER `after_partner_insert_add_stats` AFTER INSERT ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            INSERT INTO partner_stats (partner_id) VALUES (NEW.partner_id);
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_insert_update_partner_stats", """
+        CREATE TRIGGER `after_order_insert_update_partner_stats` AFTER INSERT ON `orders` FOR EACH ROW 
+        BEGIN
+            CALL bump_partner_stats(NEW.partner_id, 1, NEW.status, NEW.total_amt,
+                                    IF(NEW.status = 'Delivered', NEW.order_date, NULL));
+        END
+    """)
+
+    # A delivery is stamped when the status turns Delivered, the same moment
+    # after_order_update_update_partner_rating bumps the rating
+    replace_object(cursor, "TRIGGER", "after_order_update_update_partner_stats", """
+        CREATE TRIGGER `after_order_update_update_partner_stats` AFTER UPDATE ON `orders` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.partner_id <=> OLD.partner_id AND NEW.status <=> OLD.status
+                    AND NEW.total_amt <=> OLD.total_amt) THEN
+                CALL bump_partner_stats(OLD.partner_id, -1, OLD.status, OLD.total_amt, NULL);
+                CALL bump_partner_stats(NEW.partner_id, 1, NEW.status, NEW.total_amt,
+                                        IF(NEW.status = 'Delivered' AND NOT (OLD.status <=> 'Delivered'
+                                                                             AND NEW.partner_id <=> OLD.partner_id),
+                                           NOW(), NULL));
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_delete_update_partner_stats", """
+        CREATE TRIGGER `after_order_delete_update_partner_stats` AFTER DELETE ON `orders` FOR EACH ROW 
+        BEGIN
+            IF @archiving IS NULL THEN
+                CALL bump_partner_stats(OLD.partner_id, -1, OLD.status, OLD.total_amt, NULL);
+            END IF;
+        END
+    """)
+
+    # Cascaded order deletes skip the orders triggers
+    replace_object(cursor, "TRIGGER", "before_user_delete_update_partner_stats", """
+        CREATE TRIGGER `before_user_delete_update_partner_stats` BEFORE DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            UPDATE partner_stats ps
+            JOIN (SELECT partner_id, COUNT(*) AS n, SUM(status = 'Delivered') AS delivered,
+                         COALESCE(SUM(total_amt), 0) AS value
+                  FROM orders
+                  WHERE user_id = OLD.user_id AND partner_id IS NOT NULL
+                  GROUP BY partner_id) gone ON gone.partner_id = ps.partner_id
+            SET ps.assigned_orders = ps.assigned_orders - gone.n,
+                ps.delivered_orders = ps.delivered_orders - gone.delivered,
+                ps.total_value = ps.total_value - gone.value;
+        END
+    """)
+
+def migration_014_kpi_counter_slots(cursor):
+    """Split each KPI counter into COUNTER_SLOTS rows summed at read time"""
+    # Every checkout bumps total_orders, so a single row per counter serialized
+    # all checkouts on its lock until commit. Each connection now bumps its own
+    # slot; the dashboard reads SUM(value) per name. Existing totals stay in slot 0.
+    print("\nSplitting KPI counters into slots...")
+    add_column(cursor, "kpi_counters", "slot", "tinyint unsigned NOT NULL DEFAULT '0' AFTER `name`")
+    replace_primary_key(cursor, "kpi_counters", "`name`, `slot`")
+
+    replace_object(cursor, "PROCEDURE", "bump_kpi", f"""
+        CREATE PROCEDURE `bump_kpi`(
+            IN p_name VARCHAR(50),
+            IN p_delta DECIMAL(14,2)
+        )
+        BEGIN
+            IF p_delta <> 0 THEN
+                INSERT INTO kpi_counters (name, slot, value)
+                VALUES (p_name, CONNECTION_ID() % {COUNTER_SLOTS}, p_delta)
+                ON DUPLICATE KEY UPDATE value = value + VALUES(value);
+            END IF;
+        END
+    """)
+
+    print("\nRe-creating KPI triggers...")
+    replace_object(cursor, "TRIGGER", "after_order_insert_update_kpi", """
+        CREATE TRIGGER `after_order_insert_update_kpi` AFTER INSERT ON `orders` FOR EACH ROW 
+        BEGIN
+            CALL bump_kpi('total_orders', 1);
+            IF NEW.status = 'Delivered' THEN
+                CALL bump_kpi('delivered_revenue', COALESCE(NEW.total_amt, 0));
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_order_update_update_kpi", """
+        CREATE TRIGGER `after_order_update_update_kpi` AFTER UPDATE ON `orders` FOR EACH ROW 
+        BEGIN
+            CALL bump_kpi('delivered_revenue',
+                          IF(NEW.status = 'Delivered', COALESCE(NEW.total_amt, 0), 0)
+                          - IF(OLD.status = 'Delivered', COALESCE(OLD.total_amt, 0), 0));
+        END
+    """)
+
+    # archive.py sets @archiving while it moves orders out (see migration 12)
+    replace_object(cursor, "TRIGGER", "after_order_delete_update_kpi", """
+        CREATE TRIGGER `after_order_delete_update_kpi` AFTER DELETE ON `orders` FOR EACH ROW
+        BEGIN
+            IF @archiving IS NULL THEN
+                CALL bump_kpi('total_orders', -1);
+                IF OLD.status = 'Delivered' THEN
+                    CALL bump_kpi('delivered_revenue', -COALESCE(OLD.total_amt, 0));
+                END IF;
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_user_insert_update_kpi", """
+        CREATE TRIGGER `after_user_insert_update_kpi` AFTER INSERT ON `user` FOR EACH ROW 
+        BEGIN
+            CALL bump_kpi('total_users', 1);
+        END
+    """)
+
+    # Orders removed by ON DELETE CASCADE do not fire their own triggers
+    replace_object(cursor, "TRIGGER", "before_user_delete_update_kpi", """
+        CREATE TRIGGER `before_user_delete_update_kpi` BEFORE DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            DECLARE v_orders INT;
+            DECLARE v_revenue DECIMAL(14,2);
+            SELECT COUNT(*), COALESCE(SUM(IF(status = 'Delivered', total_amt, 0)), 0)
+            INTO v_orders, v_revenue
+            FROM orders WHERE user_id = OLD.user_id;
+            CALL bump_kpi('total_users', -1);
+            CALL bump_kpi('total_orders', -v_orders);
+            CALL bump_kpi('delivered_revenue', -v_revenue);
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_restaurant_insert_update_kpi", """
+        CREATE TRIGGER `after_restaurant_insert_update_kpi` AFTER INSERT ON `restaurant` FOR EACH ROW 
+        BEGIN
+            CALL bump_kpi('total_restaurants', 1);
+            IF NEW.rating IS NOT NULL THEN
+                CALL bump_kpi('restaurant_rating_sum', NEW.rating);
+                CALL bump_kpi('rated_restaurants', 1);
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_restaurant_update_update_kpi", """
+        CREATE TRIGGER `after_restaurant_update_update_kpi` AFTER UPDATE ON `restaurant` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.rating <=> OLD.rating) THEN
+                CALL bump_kpi('restaurant_rating_sum', COALESCE(NEW.rating, 0) - COALESCE(OLD.rating, 0));
+                CALL bump_kpi('rated_restaurants', (NEW.rating IS NOT NULL) - (OLD.rating IS NOT NULL));
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_restaurant_delete_update_kpi", """
+        CREATE TRIGGER `after_restaurant_delete_update_kpi` AFTER DELETE ON `restaurant` FOR EACH ROW 
+        BEGIN
+            CALL bump_kpi('total_restaurants', -1);
+            IF OLD.rating IS NOT NULL THEN
+                CALL bump_kpi('restaurant_rating_sum', -OLD.rating);
+                CALL bump_kpi('rated_restaurants', -1);
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_insert_update_kpi", """
+        CREATE TRIGGER `after_partner_insert_update_kpi` AFTER INSERT ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            CALL bump_kpi('total_partners', 1);
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_partner_delete_update_kpi", """
+        CREATE TRIGGER `after_partner_delete_update_kpi` AFTER DELETE ON `deliverypartner` FOR EACH ROW 
+        BEGIN
+            CALL bump_kpi('total_partners', -1);
+        END
+    """)
+
+def migration_015_daily_sales_slots(cursor):
+    """Split each daily_sales bucket into COUNTER_SLOTS rows"""
+    # Every checkout of the day bumped the same (today, method, 'Placed') row,
+    # as in migration 14. The analytics already SUM the rollup, so they read
+    # the slots unchanged.
+    print("\nSplitting daily sales rollup into slots...")
+    add_column(cursor, "daily_sales", "slot", "tinyint unsigned NOT NULL DEFAULT '0' AFTER `status`")
+    replace_primary_key(cursor, "daily_sales", "`sale_date`, `method`, `status`, `slot`")
+
+    replace_object(cursor, "PROCEDURE", "bump_daily_sales", f"""
+        CREATE PROCEDURE `bump_daily_sales`(
+            IN p_date DATE,
+            IN p_pay_id INT,
+            IN p_status VARCHAR(30),
+            IN p_count INT,
+            IN p_amount DECIMAL(10,2)
+        )
+        BEGIN
+            DECLARE v_method VARCHAR(50);
+            SELECT method INTO v_method FROM payment WHERE pay_id = p_pay_id;
+            INSERT INTO daily_sales (sale_date, method, status, slot, order_count, revenue_sum)
+            VALUES (p_date, COALESCE(v_method, 'Unknown'), COALESCE(p_status, ''),
+                    CONNECTION_ID() % {COUNTER_SLOTS}, p_count, p_count * COALESCE(p_amount, 0))
+            ON DUPLICATE KEY UPDATE
+                order_count = order_count + VALUES(order_count),
+                revenue_sum = revenue_sum + VALUES(revenue_sum);
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "after_payment_update_update_daily_sales", f"""
+        CREATE TRIGGER `after_payment_update_update_daily_sales` AFTER UPDATE ON `payment` FOR EACH ROW 
+        BEGIN
+            IF NOT (NEW.method <=> OLD.method) THEN
+                INSERT INTO daily_sales (sale_date, method, status, slot, order_count, revenue_sum)
+                SELECT DATE(order_date), moved.method, COALESCE(status, ''), CONNECTION_ID() % {COUNTER_SLOTS},
+                       moved.sign * COUNT(*), moved.sign * COALESCE(SUM(total_amt), 0)
+                FROM orders
+                JOIN (SELECT OLD.method AS method, -1 AS sign
+                      UNION ALL SELECT NEW.method, 1) moved
+                WHERE pay_id = NEW.pay_id
+                GROUP BY DATE(order_date), moved.method, moved.sign, COALESCE(status, '')
+                ON DUPLICATE KEY UPDATE
+                    order_count = order_count + VALUES(order_count),
+                    revenue_sum = revenue_sum + VALUES(revenue_sum);
+            END IF;
+        END
+    """)
+
+    replace_object(cursor, "TRIGGER", "before_user_delete_update_daily_sales", f"""
+        CREATE TRIGGER `before_user_delete_update_daily_sales` BEFORE DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            INSERT INTO daily_sales (sale_date, method, status, slot, order_count, revenue_sum)
+            SELECT DATE(o.order_date), COALESCE(p.method, 'Unknown'), COALESCE(o.status, ''),
+                   CONNECTION_ID() % {COUNTER_SLOTS}, -COUNT(*), -COALESCE(SUM(o.total_amt), 0)
+            FROM orders o
+            LEFT JOIN payment p ON o.pay_id = p.pay_id
+            WHERE o.user_id = OLD.user_id
+            GROUP BY DATE(o.order_date), COALESCE(p.method, 'Unknown'), COALESCE(o.status, '')
+            ON DUPLICATE KEY UPDATE
+                order_count = order_count + VALUES(order_count),
+                revenue_sum = revenue_sum + VALUES(revenue_sum);
+        END
+    """)
+
+def migration_016_partner_stats_slots(cursor):
+    """Split each partner's stats row into COUNTER_SLOTS rows"""
+    # As in migration 14: a busy partner's row was bumped by every checkout
+    # assigned to them. Readers sum the counters and take MAX(last_delivery_at).
+    print("\nSplitting partner stats into slots...")
+    add_column(cursor, "partner_stats", "slot", "tinyint unsigned NOT NULL DEFAULT '0' AFTER `partner_id`")
+    replace_primary_key(cursor, "partner_stats", "`partner_id`, `slot`")
+
+    replace_object(cursor, "PROCEDURE", "bump_partner_stats", f"""
+        CREATE PROCEDURE `bump_partner_stats`(
+            IN p_partner_id INT,
+            IN p_count INT,
+            IN p_status VARCHAR(30),
+            IN p_amount DECIMAL(10,2),
+            IN p_delivered_at DATETIME
+        )
+        BEGIN
+            IF p_partner_id IS NOT NULL THEN
+                INSERT INTO partner_stats (partner_id, slot, assigned_orders, delivered_orders, total_value, last_delivery_at)
+                VALUES (p_partner_id, CONNECTION_ID() % {COUNTER_SLOTS}, p_count, IF(p_status = 'Delivered', p_count, 0),
+                        p_count * COALESCE(p_amount, 0), p_delivered_at)
+                ON DUPLICATE KEY UPDATE
+                    assigned_orders = assigned_orders + VALUES(assigned_orders),
+                    delivered_orders = delivered_orders + VALUES(delivered_orders),
+                    total_value = total_value + VALUES(total_value),
+                    last_delivery_at = COALESCE(GREATEST(last_delivery_at, VALUES(last_delivery_at)),
+                                                last_delivery_at, VALUES(last_delivery_at));
+            END IF;
+        END
+    """)
+
+    # Cascaded order deletes skip the orders triggers
+    replace_object(cursor, "TRIGGER", "before_user_delete_update_partner_stats", f"""
+        CREATE TRIGGER `before_user_delete_update_partner_stats` BEFORE DELETE ON `user` FOR EACH ROW 
+        BEGIN
+            INSERT INTO partner_stats (partner_id, slot, assigned_orders, delivered_orders, total_value)
+            SELECT partner_id, CONNECTION_ID() % {COUNTER_SLOTS}, -COUNT(*),
+                   -SUM(status = 'Delivered'), -COALESCE(SUM(total_amt), 0)
+            FROM orders
+            WHERE user_id = OLD.user_id AND partner_id IS NOT NULL
+            GROUP BY partner_id
+            ON DUPLICATE KEY UPDATE
+                assigned_orders = assigned_orders + VALUES(assigned_orders),
+                delivered_orders = delivered_orders + VALUES(delivered_orders),
+                total_value = total_value + VALUES(total_value);
+        END
+    """)
+
+MIGRATIONS = [
+    (1, "base schema", migration_001_base_schema),
+    (2, "kpi counters", migration_002_kpi_counters),
+    (3, "partner load", migration_003_partner_load),
+    (4, "workload indexes", migration_004_workload_indexes),
+    (5, "daily sales rollup", migration_005_daily_sales),
+    (6, "menu updated_at", migration_006_menu_updated_at),
+    (7, "stock reservations", migration_007_stock_reservations),
+    (8, "order intake log", migration_008_order_intake),
+    (9, "order change log", migration_009_order_events),
+    (10, "credentials", migration_010_credentials),
+    (11, "checkout procedure", migration_011_checkout_procedure),
+    (12, "order archive", migration_012_order_archive),
+    (13, "partner stats", migration_013_partner_stats),
+    (14, "kpi counter slots", migration_014_kpi_counter_slots),
+    (15, "daily sales slots", migration_015_daily_sales_slots),
+    (16, "partner stats slots", migration_016_partner_stats_slots)
+]
+
+def apply_migrations(connection, cursor):
+    """Apply every migration newer than the recorded schema version."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS `schema_version` (
+          `version` int NOT NULL,
+          `description` varchar(200) NOT NULL,
+          `applied_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          PRIMARY KEY (`version`)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
+    """)
+    cursor.execute("SELECT version FROM schema_version")
+    applied = {row[0] for row in cursor.fetchall()}
+
+    count = 0
+    for version, description, step in MIGRATIONS:
+        if version in applied:
+            continue
+        print(f"\n--- Migration {version}: {description} ---")
+        step(cursor)
+        cursor.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)",
+                       (version, description))
+        connection.commit()
+        count += 1
+    return count
+
+# -------------------- QUERY PLAN CHECK --------------------
+# The app's queries (from queries.py, the SQL dbmstest1.py runs) with
+# representative parameters. allow_scan lists small tables a query is expected
+# to read in full (table or index scan), named as EXPLAIN shows them (the alias
+# when the query uses one). max_rows overrides PLAN_ROWS_LIMIT (None = no limit).
+PLAN_ROWS_LIMIT = 10000     # a plan step estimating more rows than this is flagged
+# An index read in order and stopped by LIMIT (ORDER BY ... LIMIT 10) also shows
+# type index, with a small row estimate; only larger index scans are flagged
+PLAN_INDEX_SCAN_ROWS = 1000
+APP_QUERIES = {
+    "credential_lookup": {
+        "sql": CREDENTIAL_QUERY,
+        "params": ("user", "user@example.com")
+    },
+    "user_login_legacy": {
+        "sql": LEGACY_LOGIN_QUERIES["user"][0],
+        "params": LEGACY_LOGIN_QUERIES["user"][1]("user@example.com", "9999999999")
+    },
+    "partner_login_legacy": {
+        "sql": LEGACY_LOGIN_QUERIES["partner"][0],
+        "params": LEGACY_LOGIN_QUERIES["partner"][1]("Partner", "9999999999")
+    },
+    "user_principal": {
+        "sql": PRINCIPAL_QUERIES["user"][0],
+        "params": (1,)
+    },
+    "partner_orders": {
+        "sql": PARTNER_ORDERS_QUERY,
+        "params": (1,)
+    },
+    "partner_feed_head": {
+        "sql": PARTNER_FEED_HEAD_QUERY,
+        "params": ()
+    },
+    "partner_feed_events": {
+        "sql": PARTNER_FEED_EVENTS_QUERY,
+        "params": (1, 0, 501)
+    },
+    "partner_feed_orders": {
+        "sql": PARTNER_FEED_ORDERS_QUERY.format(ids="%s, %s"),
+        "params": (1, 2, 1)
+    },
+    "partner_recent_deliveries": {
+        "sql": PARTNER_RECENT_DELIVERIES_QUERY,
+        "params": (1, 1)
+    },
+    "partner_stats": {
+        "sql": PARTNER_STATS_QUERY,
+        "params": (1,)
+    },
+    "user_orders": {
+        "sql": USER_ORDERS_QUERY,
+        "params": (1, 1)
+    },
+    "user_order_count": {
+        "sql": USER_ORDER_COUNT_QUERY,
+        "params": (1, 1)
+    },
+    "user_total_spent": {
+        "sql": USER_TOTAL_SPENT_QUERY,
+        "params": (1, 1)
+    },
+    "restaurant_list": {
+        "sql": CATALOG_RESTAURANTS_QUERY,
+        "params": (),
+        "allow_scan": ("restaurant",)
+    },
+    "catalog_items": {
+        "sql": CATALOG_ITEMS_QUERY,
+        "params": (),
+        "allow_scan": ("menuitem",)
+    },
+    "catalog_stock_delta": {
+        "sql": CATALOG_STOCK_DELTA_QUERY,
+        "params": (datetime.now() - timedelta(seconds=5),)
+    },
+    "cart_hold_expiry": {
+        "sql": CART_HOLD_EXPIRY_QUERY,
+        "params": ("0" * 32,)
+    },
+    "reservation_sweep": {
+        "sql": RESERVATION_SWEEP_QUERY,
+        "params": (1000,)
+    },
+    "admin_menu_items": {
+        "sql": ADMIN_MENU_ITEMS_QUERY,
+        "params": (),
+        "allow_scan": ("m",)
+    },
+    "admin_partners": {
+        "sql": ADMIN_PARTNERS_QUERY,
+        "params": (),
+        "allow_scan": ("deliverypartner",)
+    },
+    "admin_recent_orders": {
+        "sql": ADMIN_RECENT_ORDERS_QUERY,
+        "params": ()
+    },
+    # Second page of each grid: the keyset condition is what the indexes must serve
+    "admin_orders_page": {
+        "sql": grid_page_query(**ADMIN_ORDERS_GRID, cursor=("2030-01-01", 1000000))[0],
+        "params": ("2030-01-01", "2030-01-01", 1000000, 51)
+    },
+    "admin_payments_page": {
+        "sql": grid_page_query(**ADMIN_PAYMENTS_GRID, cursor=(1000000,))[0],
+        "params": (1000000, 51)
+    },
+    "admin_orders_count": {
+        "sql": GRID_COUNT_QUERIES["orders"],
+        "params": (),
+        "allow_scan": ("orders",)
+    },
+    "admin_payments_count": {
+        "sql": GRID_COUNT_QUERIES["payments"],
+        "params": (),
+        "allow_scan": ("orders",)
+    },
+    "admin_users_page": {
+        "sql": grid_page_query(**ADMIN_USERS_GRID, cursor=(0,))[0],
+        "params": (0, 51)
+    },
+    "kpi_snapshot": {
+        "sql": KPI_QUERY,
+        "params": (),
+        "allow_scan": ("kpi_counters",)
+    },
+    "partner_assignment": {
+        "sql": PARTNER_ASSIGNMENT_QUERY,
+        "params": ()
+    },
+    "top_spending_users": {
+        "sql": TOP_SPENDING_USERS_QUERY,
+        "params": (),
+        "max_rows": None    # live report over the whole history; the snapshot export serves it at scale
+    },
+    "best_rated_restaurants": {
+        "sql": BEST_RATED_RESTAURANTS_QUERY,
+        "params": (),
+        "allow_scan": ("r",),
+        "max_rows": None    # live report over the whole history; the snapshot export serves it at scale
+    },
+    "revenue_by_payment_method": {
+        "sql": REVENUE_BY_METHOD_QUERY,
+        "params": ()
+    },
+    "partner_performance": {
+        "sql": PARTNER_PERFORMANCE_QUERY,
+        "params": (),
+        "allow_scan": ("partner_stats",)
+    },
+    "monthly_sales_trend": {
+        "sql": MONTHLY_SALES_TREND_QUERY,
+        "params": None
+    },
+    "popular_menu_items": {
+        "sql": POPULAR_MENU_ITEMS_QUERY,
+        "params": (),
+        "max_rows": None    # live report over the whole history; the snapshot export serves it at scale
+    }
+}
+
+def check_query_plans(cursor):
+    """EXPLAIN every app query and report plans it is not allowed.
+
+    Flagged: full table scans (type ALL), full index scans (type index, unless
+    a LIMIT keeps them short) and any step whose row estimate exceeds the
+    query's max_rows. Returns the number of
+    offending queries. On a nearly empty database the optimizer may
+    legitimately prefer scans, so run this against seeded data.
+    """
+    violations = 0
+    print(f"\n{'query':<30}{'plan':<10}details")
+    for name, query in APP_QUERIES.items():
+        # params=None means the SQL is sent without interpolation (it contains literal %)
+        cursor.execute("EXPLAIN " + query["sql"], query["params"])
+        cols = [d[0] for d in cursor.description]
+        # <derivedN>/<unionM,N> are temporary results; the tables read into them have their own rows
+        plan = [dict(zip(cols, row)) for row in cursor.fetchall()
+                if not (row[cols.index("table")] or "<").startswith("<")]
+        allowed = set(query.get("allow_scan", ()))
+        max_rows = query.get("max_rows", PLAN_ROWS_LIMIT)
+        problems = []
+        for step in plan:
+            if step["table"] in allowed:
+                continue
+            if step["type"] == "ALL":
+                problems.append(f"full scan of {step['table']}")
+            elif step["type"] == "index" and (step["rows"] or 0) > PLAN_INDEX_SCAN_ROWS:
+                problems.append(f"full index scan of {step['table']}:{step['key']}")
+            elif max_rows is not None and (step["rows"] or 0) > max_rows:
+                problems.append(f"{step['table']}:{step['key'] or step['type']} estimates {step['rows']} rows")
+        if problems:
+            violations += 1
+            print(f"{name:<30}{'FLAGGED':<10}{'; '.join(problems)}")
+        else:
+            keys = ", ".join(f"{step['table']}:{step['key'] or step['type']}" for step in plan)
+            print(f"{name:<30}{'OK':<10}{keys}")
+    return violations
+
+# -------------------- ENTRY POINT --------------------
+def create_foodapp_database(check_plans=False):
+    """Create the foodapp database if needed and bring its schema up to date"""
+    connection = None
     try:
         # Connect to MySQL without specifying database
-        connection = mysql.connector.connect(
-            host='localhost',
-            user='root',
-            password='placeholder'
-        )
+        connection = mysql.connector.connect(**DB_CONFIG)
         
         if  connection.is_connected():
-            cursor = connection.cursor()
+            cursor = connection.cursor(buffered=True)
             
             # Create database
-            print("Creating database 'foodapp'...")
-            cursor.execute("CREATE DATABASE IF NOT EXISTS foodapp")
-            cursor.execute("USE foodapp")
-            
-            # Create tables in correct order to handle foreign key dependencies
-            print("\nCreating tables...")
-            
-            # 1. deliverypartner table (no foreign key dependencies)
-            cursor.execute("""
-                CREATE TABLE `deliverypartner` (
-                  `partner_id` int NOT NULL AUTO_INCREMENT,
-                  `name` varchar(100) NOT NULL,
-                  `phone` varchar(20) DEFAULT NULL,
-                  `rating` decimal(2,1) DEFAULT NULL,
-                  PRIMARY KEY (`partner_id`),
-                  CONSTRAINT `deliverypartner_chk_1` CHECK ((`rating` between 0 and 5))
-                ) ENGINE=InnoDB AUTO_INCREMENT=15 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """)
-            print("✓ Created table: deliverypartner")
-            
-            # 2. payment table (no foreign key dependencies)
-            cursor.execute("""
-                CREATE TABLE `payment` (
-                  `pay_id` int NOT NULL AUTO_INCREMENT,
-                  `method` varchar(50) NOT NULL,
-                  `currency` varchar(10) DEFAULT 'INR',
-                  `amount` decimal(10,2) DEFAULT NULL,
-                  `status` varchar(30) NOT NULL,
-                  PRIMARY KEY (`pay_id`),
-                  CONSTRAINT `payment_chk_1` CHECK ((`amount` >= 0))
-                ) ENGINE=InnoDB AUTO_INCREMENT=49 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """)
-            print("✓ Created table: payment")
-            
-            # 3. user table (depends on payment)
-            cursor.execute("""
-                CREATE TABLE `user` (
-                  `user_id` int NOT NULL AUTO_INCREMENT,
-                  `name` varchar(100) NOT NULL,
-                  `email` varchar(150) NOT NULL,
-                  `address` varchar(255) DEFAULT NULL,
-                  `phone` varchar(20) DEFAULT NULL,
-                  `pay_id` int DEFAULT NULL,
-                  PRIMARY KEY (`user_id`),
-                  UNIQUE KEY `email` (`email`),
-                  KEY `pay_id` (`pay_id`),
-                  CONSTRAINT `user_ibfk_1` FOREIGN KEY (`pay_id`) REFERENCES `payment` (`pay_id`) ON DELETE SET NULL ON UPDATE CASCADE
-                ) ENGINE=InnoDB AUTO_INCREMENT=17 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """)
-            print("✓ Created table: user")
-            
-            # 4. restaurant table (depends on deliverypartner)
-            cursor.execute("""
-                CREATE TABLE `restaurant` (
-                  `rest_id` int NOT NULL AUTO_INCREMENT,
-                  `name` varchar(150) NOT NULL,
-                  `address` varchar(255) DEFAULT NULL,
-                  `rating` decimal(2,1) DEFAULT NULL,
-                  `partner_id` int DEFAULT NULL,
-                  PRIMARY KEY (`rest_id`),
-                  KEY `partner_id` (`partner_id`),
-                  CONSTRAINT `restaurant_ibfk_1` FOREIGN KEY (`partner_id`) REFERENCES `deliverypartner` (`partner_id`) ON DELETE SET NULL ON UPDATE CASCADE,
-                  CONSTRAINT `restaurant_chk_1` CHECK ((`rating` between 0 and 5))
-                ) ENGINE=InnoDB AUTO_INCREMENT=14 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """)
-            print("✓ Created table: restaurant")
-            
-            # 5. orders table (depends on user, deliverypartner, payment)
-            cursor.execute("""
-                CREATE TABLE `orders` (
-                  `order_id` int NOT NULL AUTO_INCREMENT,
-                  `order_date` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                  `total_amt` decimal(10,2) DEFAULT NULL,
-                  `status` varchar(30) DEFAULT NULL,
-                  `user_id` int DEFAULT NULL,
-                  `partner_id` int DEFAULT NULL,
-                  `pay_id` int DEFAULT NULL,
-                  PRIMARY KEY (`order_id`),
-                  KEY `user_id` (`user_id`),
-                  KEY `partner_id` (`partner_id`),
-                  KEY `pay_id` (`pay_id`),
-                  CONSTRAINT `orders_ibfk_1` FOREIGN KEY (`user_id`) REFERENCES `user` (`user_id`) ON DELETE CASCADE ON UPDATE CASCADE,
-                  CONSTRAINT `orders_ibfk_2` FOREIGN KEY (`partner_id`) REFERENCES `deliverypartner` (`partner_id`) ON DELETE SET NULL ON UPDATE CASCADE,
-                  CONSTRAINT `orders_ibfk_3` FOREIGN KEY (`pay_id`) REFERENCES `payment` (`pay_id`) ON DELETE SET NULL ON UPDATE CASCADE,
-                  CONSTRAINT `orders_chk_1` CHECK ((`total_amt` >= 0))
-                ) ENGINE=InnoDB AUTO_INCREMENT=46 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """)
-            print("✓ Created table: orders")
-            
-            # 6. menuitem table (depends on restaurant, user)
-            cursor.execute("""
-                CREATE TABLE `menuitem` (
-                  `item_id` int NOT NULL AUTO_INCREMENT,
-                  `name` varchar(150) NOT NULL,
-                  `price` decimal(10,2) NOT NULL,
-                  `quantity` int NOT NULL DEFAULT '1',
-                  `rest_id` int DEFAULT NULL,
-                  `user_id` int DEFAULT NULL,
-                  PRIMARY KEY (`item_id`),
-                  KEY `rest_id` (`rest_id`),
-                  KEY `user_id` (`user_id`),
-                  CONSTRAINT `menuitem_ibfk_1` FOREIGN KEY (`rest_id`) REFERENCES `restaurant` (`rest_id`) ON DELETE CASCADE ON UPDATE CASCADE,
-                  CONSTRAINT `menuitem_ibfk_2` FOREIGN KEY (`user_id`) REFERENCES `user` (`user_id`) ON DELETE SET NULL ON UPDATE CASCADE,
-                  CONSTRAINT `menuitem_chk_1` CHECK ((`price` > 0)),
-                  CONSTRAINT `menuitem_chk_2` CHECK ((`quantity` >= 0))
-                ) ENGINE=InnoDB AUTO_INCREMENT=15 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """)
-            print("✓ Created table: menuitem")
-            
-            # 7. orderitem table (depends on orders, menuitem)
-            cursor.execute("""
-                CREATE TABLE `orderitem` (
-                  `orderitem_id` int NOT NULL AUTO_INCREMENT,
-                  `order_id` int NOT NULL,
-                  `item_id` int NOT NULL,
-                  `quantity` int NOT NULL,
-                  `price` decimal(10,2) NOT NULL,
-                  PRIMARY KEY (`orderitem_id`),
-                  KEY `order_id` (`order_id`),
-                  KEY `item_id` (`item_id`),
-                  CONSTRAINT `orderitem_ibfk_1` FOREIGN KEY (`order_id`) REFERENCES `orders` (`order_id`) ON DELETE CASCADE,
-                  CONSTRAINT `orderitem_ibfk_2` FOREIGN KEY (`item_id`) REFERENCES `menuitem` (`item_id`) ON DELETE CASCADE
-                ) ENGINE=InnoDB AUTO_INCREMENT=12 DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_0900_ai_ci
-            """)
-            print("✓ Created table: orderitem")
-            
-            # Create view
-            print("\nCreating views...")
-            cursor.execute("""
-                CREATE ALGORITHM=UNDEFINED SQL SECURITY DEFINER VIEW `order_summary_view` AS 
-                select `o`.`order_id` AS `order_id`,`o`.`order_date` AS `order_date`,`u`.`name` AS `customer_name`,
-                `dp`.`name` AS `delivery_partner`,`r`.`name` AS `restaurant_name`,`o`.`total_amt` AS `order_amount`,
-                `p`.`method` AS `payment_method`,`p`.`status` AS `payment_status`,`o`.`status` AS `order_status` 
-                from ((((`orders` `o` left join `user` `u` on((`o`.`user_id` = `u`.`user_id`))) 
-                left join `deliverypartner` `dp` on((`o`.`partner_id` = `dp`.`partner_id`))) 
-                left join `payment` `p` on((`o`.`pay_id` = `p`.`pay_id`))) 
-                left join `restaurant` `r` on((`dp`.`partner_id` = `r`.`partner_id`)))
-            """)
-            print("✓ Created view: order_summary_view")
+            print(f"Creating database '{DB_NAME}'...")
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}")
+            cursor.execute(f"USE {DB_NAME}")
             
-            # Create stored procedures
-            print("\nCreating stored procedures...")
+            applied = apply_migrations(connection, cursor)
+            cursor.execute("SELECT MAX(version) FROM schema_version")
+            version = cursor.fetchone()[0]
             
-            # PlaceNewOrder procedure
-            cursor.execute("""
-                CREATE PROCEDURE `PlaceNewOrder`(
-                    IN p_user_id INT,
-                    IN p_total_amt DECIMAL(10,2),
-                    IN p_method VARCHAR(50)
-                )
-                BEGIN
-                    DECLARE v_pay_id INT;
-                    DECLARE v_partner_id INT;
-
-                    -- create payment
-                    INSERT INTO payment(method, amount, status)
-                    VALUES(p_method, p_total_amt, 'Pending');
-                    SET v_pay_id = LAST_INSERT_ID();
-
-                    -- assign random delivery partner
-                    SELECT partner_id INTO v_partner_id
-                    FROM deliverypartner
-                    ORDER BY RAND()
-                    LIMIT 1;
-
-                    -- insert order
-                    INSERT INTO orders(user_id, partner_id, pay_id, total_amt, status)
-                    VALUES(p_user_id, v_partner_id, v_pay_id, p_total_amt, 'Placed');
-                END
-            """)
-            print("✓ Created procedure: PlaceNewOrder")
-            
-            # UpdateOrderStatus procedure
-            cursor.execute("""
-                CREATE PROCEDURE `UpdateOrderStatus`(
-                    IN p_order_id INT,
-                    IN p_new_status VARCHAR(30),
-                    IN p_payment_status VARCHAR(30)
-                )
-                BEGIN
-                    UPDATE orders
-                    SET status = p_new_status
-                    WHERE order_id = p_order_id;
-
-                    UPDATE payment
-                    SET status = p_payment_status
-                    WHERE pay_id = (SELECT pay_id FROM orders WHERE order_id = p_order_id);
-                END
-            """)
-            print("✓ Created procedure: UpdateOrderStatus")
-            
-            # Create stored functions
-            print("\nCreating stored functions...")
-            
-            # avg_restaurant_rating function
-            cursor.execute("""
-                CREATE FUNCTION `avg_restaurant_rating`() RETURNS decimal(3,2)
-                DETERMINISTIC
-                BEGIN
-                    DECLARE avg_rating DECIMAL(3,2);
-                    SELECT COALESCE(AVG(rating), 0)
-                    INTO avg_rating
-                    FROM restaurant;
-                    RETURN avg_rating;
-                END
-            """)
-            print("✓ Created function: avg_restaurant_rating")
-            
-            # total_spent_by_user function
-            cursor.execute("""
-                CREATE FUNCTION `total_spent_by_user`(uid INT) RETURNS decimal(10,2)
-                DETERMINISTIC
-                BEGIN
-                    DECLARE total DECIMAL(10,2);
-                    SELECT COALESCE(SUM(p.amount), 0)
-                    INTO total
-                    FROM orders o
-                    JOIN payment p ON o.pay_id = p.pay_id
-                    WHERE o.user_id = uid;
-                    RETURN total;
-                END
-            """)
-            print("✓ Created function: total_spent_by_user")
-            
-            # Create triggers
-            print("\nCreating triggers...")
-            
-            # before_order_insert_create_payment trigger
-            cursor.execute("""
-                CREATE TRIGGER `before_order_insert_create_payment` BEFORE INSERT ON `orders` FOR EACH ROW 
-                BEGIN
-                    DECLARE v_pay_id INT;
-                    IF NEW.pay_id IS NULL THEN
-                        INSERT INTO payment(method, amount, status)
-                        VALUES('COD', NEW.total_amt, 'Pending');
-                        SET v_pay_id = LAST_INSERT_ID();
-                        SET NEW.pay_id = v_pay_id;
-                    END IF;
-                END
-            """)
-            print("✓ Created trigger: before_order_insert_create_payment")
-            
-            # after_order_update_update_partner_rating trigger
-            cursor.execute("""
-                CREATE TRIGGER `after_order_update_update_partner_rating` AFTER UPDATE ON `orders` FOR EACH ROW 
-                BEGIN
-                    IF NEW.status = 'Delivered' AND OLD.status <> 'Delivered' THEN
-                        UPDATE deliverypartner
-                        SET rating = LEAST(5, COALESCE(rating, 3) + 0.1)
-                        WHERE partner_id = NEW.partner_id;
-                    END IF;
-                END
-            """)
-            print("✓ Created trigger: after_order_update_update_partner_rating")
-            
-            # Commit all changes
-            connection.commit()
             print("\n" + "="*60)
-            print("SUCCESS: foodapp database created successfully!")
+            print(f"SUCCESS: {DB_NAME} database is at schema version {version}")
             print("="*60)
-            print("Created: 8 tables, 1 view, 2 procedures, 2 functions, 2 triggers")
+            print(f"Applied {applied} migration(s)")
+            
+            if check_plans:
+                return check_query_plans(cursor) == 0
+            return True
             
     except Error as e:
         print(f"Error: {e}")
+        return False
     finally:
         if connection and connection.is_connected():
             cursor.close()
@@ -286,6 +1734,10 @@ def create_foodapp_database():
             print("\nDatabase connection closed.")
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or migrate the foodapp database")
+    parser.add_argument("--check-plans", action="store_true",
+                        help="EXPLAIN the app's queries and fail on unexpected full scans or large row estimates")
+    args = parser.parse_args()
 
-    create_foodapp_database()
-
+    ok = create_foodapp_database(check_plans=args.check_plans)
+    sys.exit(0 if ok else 1)
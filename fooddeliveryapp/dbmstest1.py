@@ -10,11 +10,43 @@ Food Delivery Full App (Complete Working Version) - Streamlit
 """
 
 import streamlit as st
+import streamlit.components.v1 as components
+from streamlit.errors import StreamlitAPIException
 import mysql.connector
+from mysql.connector import errorcode
 from decimal import Decimal
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
+import math
+from collections import OrderedDict, deque
+import functools
+import json
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import threading
 import time
+import uuid
+
+from concurrent.futures import ThreadPoolExecutor
+
+from analytics import AnalyticsEngine, ExportInProgress, export_snapshot
+from auth import (AUTH_CONFIG, DUMMY_HASH, SessionCache, hash_password, issue_token, needs_rehash,
+                  verify_password)
+from queries import (ADMIN_MENU_ITEMS_QUERY, ADMIN_ORDERS_GRID, ADMIN_PARTNERS_QUERY, ADMIN_PAYMENTS_GRID,
+                     ADMIN_RECENT_ORDERS_QUERY, ADMIN_USERS_GRID, BEST_RATED_RESTAURANTS_QUERY,
+                     CART_HOLD_EXPIRY_QUERY, CATALOG_ITEMS_QUERY, CATALOG_RESTAURANTS_QUERY,
+                     CATALOG_STOCK_DELTA_QUERY, CREDENTIAL_QUERY, GRID_COUNT_QUERIES, KPI_FALLBACK_QUERY,
+                     KPI_QUERY, LEGACY_LOGIN_QUERIES, MONTHLY_SALES_TREND_QUERY, PARTNER_ASSIGNMENT_QUERY,
+                     PARTNER_FEED_EVENTS_QUERY, PARTNER_FEED_HEAD_QUERY, PARTNER_FEED_ORDERS_QUERY,
+                     PARTNER_ORDERS_QUERY, PARTNER_PERFORMANCE_QUERY, PARTNER_RECENT_DELIVERIES_QUERY,
+                     PARTNER_STATS_QUERY, POPULAR_MENU_ITEMS_QUERY, PRINCIPAL_QUERIES,
+                     RESERVATION_SWEEP_QUERY, REVENUE_BY_METHOD_QUERY, TOP_SPENDING_USERS_QUERY,
+                     USER_ORDER_COUNT_QUERY, USER_ORDERS_QUERY, USER_TOTAL_SPENT_QUERY, grid_page_query,
+                     order_by_clause)
+from search import SEARCH_CONFIG, SEARCH_WEIGHTS, SearchIndex
 
 # -------------------- PAGE CONFIG --------------------
 st.set_page_config(
@@ -32,78 +64,1631 @@ DB_CONFIG = {
     "database": "food_delivery"
 }
 
+# Connection pool sizing; the pool is shared by every Streamlit session in the process
+POOL_CONFIG = {
+    "min_size": 2,            # connections kept open even when idle
+    "max_size": 10,           # hard cap on open connections
+    "checkout_timeout": 5,    # seconds to wait for a free connection before giving up
+    "idle_timeout": 300,      # close spare connections idle longer than this (seconds)
+    "ping_after": 30          # ping connections idle longer than this before handing them out
+}
+
+# -------------------- CONNECTION ENGINE --------------------
+# Errors after which a connection can't be trusted: the server went away or the
+# socket broke, and the connection must not go back to the pool
+DISCONNECT_ERRORS = (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+
+class ConnectionEngine:
+    """Bounded, thread-safe pool of MySQL connections shared across sessions.
+
+    Connections are handed out LIFO so the warmest connection is reused first
+    and the oldest spare ones age out through idle eviction.
+    """
+
+    def __init__(self, db_config, min_size=2, max_size=10, checkout_timeout=5,
+                 idle_timeout=300, ping_after=30):
+        self.db_config = dict(db_config)
+        self.min_size = min_size
+        self.max_size = max(max_size, min_size, 1)
+        self.checkout_timeout = checkout_timeout
+        self.idle_timeout = idle_timeout
+        self.ping_after = ping_after
+        self._cond = threading.Condition()
+        self._idle = []   # (connection, last_used) pairs, most recently used last
+        self._in_use = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "reconnects": 0,
+            "evicted": 0
+        }
+        # Pre-warm the pool; a database that is down at startup is not fatal
+        for _ in range(self.min_size):
+            try:
+                self._idle.append((self._connect(), time.monotonic()))
+            except mysql.connector.Error:
+                break
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.db_config)
+        with self._cond:
+            self._stats["created"] += 1
+        return conn
+
+    def _evict_idle_locked(self):
+        """Pop spare connections idle past idle_timeout. Caller holds the lock."""
+        now = time.monotonic()
+        spare = len(self._idle) + self._in_use - self.min_size
+        evicted = []
+        while spare > 0 and self._idle and now - self._idle[0][1] > self.idle_timeout:
+            evicted.append(self._idle.pop(0)[0])
+            spare -= 1
+        self._stats["evicted"] += len(evicted)
+        return evicted
+
+    def acquire(self):
+        """Check out a live connection, waiting up to checkout_timeout for one."""
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        with self._cond:
+            evicted = self._evict_idle_locked()
+            waited = False
+            while not self._idle and self._in_use >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise mysql.connector.errors.PoolError(
+                        f"Timed out after {self.checkout_timeout}s waiting for a database connection")
+                waited = True
+                self._cond.wait(remaining)
+            entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            wait_ms = (time.monotonic() - start) * 1000
+            self._stats["checkouts"] += 1
+            self._stats["total_wait_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+            if waited:
+                self._stats["waits"] += 1
+
+        for conn in evicted:
+            self._close_quietly(conn)
+
+        try:
+            if entry is None:
+                return self._connect()
+            conn, last_used = entry
+            if time.monotonic() - last_used > self.ping_after:
+                conn = self._revive(conn)
+            return conn
+        except mysql.connector.Error:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def _revive(self, conn):
+        """Liveness check on checkout; replace the connection if the server dropped it."""
+        try:
+            conn.ping(reconnect=False)
+            return conn
+        except mysql.connector.Error:
+            self._close_quietly(conn)
+            with self._cond:
+                self._stats["reconnects"] += 1
+            return self._connect()
+
+    def release(self, conn, discard=False, error=None):
+        """Return a connection to the pool, rolling back any open transaction.
+
+        Pass the error a statement on conn failed with: a disconnect closes the
+        connection instead, since a busy pool would hand it out again before
+        ping_after ever triggers a liveness check.
+        """
+        broken = discard or isinstance(error, DISCONNECT_ERRORS)
+        if not broken:
+            try:
+                if conn.unread_result:
+                    conn.consume_results()
+                if conn.in_transaction:
+                    conn.rollback()
+            except mysql.connector.Error:
+                broken = True
+        if broken:
+            self._close_quietly(conn)
+        with self._cond:
+            self._in_use -= 1
+            if not broken:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except mysql.connector.Error:
+            pass
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["in_use"] = self._in_use
+            stats["idle"] = len(self._idle)
+            stats["size"] = self._in_use + len(self._idle)
+            stats["max_size"] = self.max_size
+        checkouts = stats["checkouts"] or 1
+        stats["avg_wait_ms"] = stats["total_wait_ms"] / checkouts
+        return stats
+
+@st.cache_resource
+def get_engine():
+    return ConnectionEngine(DB_CONFIG, **POOL_CONFIG)
+
+# -------------------- READ REPLICAS --------------------
+# Replicas of DB_CONFIG's database, each merged over DB_CONFIG; empty means every
+# read goes to the primary. FOODAPP_REPLICAS="host:port,host:port" adds more.
+REPLICA_CONFIGS = [
+    # {"host": "127.0.0.1", "port": 3307},
+]
+
+# sticky_window: seconds a session reads from the primary after a write when
+#                the servers don't use GTIDs
+# gtid_window: seconds a session's replica reads first check that the replica
+#              has applied the session's last write (GTID_SUBSET)
+# retry_after: seconds a replica that refused connections is skipped
+# connect_timeout: seconds to give up connecting to a replica (then the primary serves)
+# replica_pool: per-replica pool sizing, over POOL_CONFIG
+ROUTING_CONFIG = {
+    "sticky_window": 5,
+    "gtid_window": 60,
+    "retry_after": 30,
+    "connect_timeout": 2,
+    "cache_settle": 10,   # seconds after a write before replica reads of its tables are cached
+    "replica_pool": {"min_size": 1}
+}
+
+def replica_configs():
+    specs = list(REPLICA_CONFIGS)
+    for spec in filter(None, os.environ.get("FOODAPP_REPLICAS", "").split(",")):
+        host, _, port = spec.strip().partition(":")
+        specs.append({"host": host, "port": int(port or 3306)})
+    return [{**DB_CONFIG, "connection_timeout": ROUTING_CONFIG["connect_timeout"], **spec} for spec in specs]
+
+class ReadRouter:
+    """Round-robin over replica pools for reads the caller allows off the primary.
+
+    A replica that can't be reached is skipped for retry_after seconds; a
+    replica that hasn't applied the caller's GTID set yet is not waited for,
+    the read goes to the primary instead.
+    """
+
+    def __init__(self, configs, retry_after=30, **pool_config):
+        self.retry_after = retry_after
+        self.engines = []
+        self.names = []
+        for config in configs:
+            self.engines.append(ConnectionEngine(config, **pool_config))
+            self.names.append(f"{config['host']}:{config.get('port', 3306)}")
+        self._lock = threading.Lock()
+        self._next = 0
+        self._down = {}   # engine index -> when it last failed
+        self._stats = {"replica": 0, "primary": 0, "sticky": 0, "gtid_checks": 0,
+                       "gtid_behind": 0, "failovers": 0}
+
+    def count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def acquire(self, gtid=None):
+        """(engine, conn) on a usable replica that has applied gtid, or (None, None)."""
+        with self._lock:
+            now = time.monotonic()
+            order = [(self._next + n) % len(self.engines) for n in range(len(self.engines))]
+            order = [i for i in order if now - self._down.get(i, -self.retry_after) >= self.retry_after]
+            self._next = (self._next + 1) % max(len(self.engines), 1)
+        for i in order:
+            engine = self.engines[i]
+            try:
+                conn = engine.acquire()
+            except mysql.connector.Error:
+                with self._lock:
+                    self._down[i] = time.monotonic()
+                    self._stats["failovers"] += 1
+                continue
+            if gtid:
+                try:
+                    cur = conn.cursor()
+                    cur.execute("SELECT GTID_SUBSET(%s, @@GLOBAL.gtid_executed)", (gtid,))
+                    caught_up = cur.fetchone()[0] == 1
+                    cur.close()
+                except mysql.connector.Error:
+                    engine.release(conn, discard=True)
+                    continue
+                self.count("gtid_checks")
+                if not caught_up:
+                    engine.release(conn)
+                    self.count("gtid_behind")
+                    return None, None
+            self.count("replica")
+            return engine, conn
+        return None, None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            now = time.monotonic()
+            down = {i for i, since in self._down.items() if now - since < self.retry_after}
+        stats["replicas"] = [dict(engine.stats(), name=name, down=i in down)
+                             for i, (engine, name) in enumerate(zip(self.engines, self.names))]
+        return stats
+
+@st.cache_resource
+def get_read_router():
+    return ReadRouter(replica_configs(), ROUTING_CONFIG["retry_after"],
+                      **dict(POOL_CONFIG, **ROUTING_CONFIG["replica_pool"]))
+
+# -------------------- QUERY RESULT CACHE --------------------
+CACHE_CONFIG = {
+    "max_bytes": 64 * 1024 * 1024,   # approximate memory cap across all cached results
+    "max_entries": 5000
+}
+
+# Tables changed as a side effect of writing another table (triggers, FK actions),
+# so a write to the key must also invalidate results that read the values
+SIDE_EFFECT_TABLES = {
+    "orders": {"payment", "deliverypartner", "orderitem", "order_intake", "kpi_counters", "partner_load",
+               "partner_stats", "daily_sales", "order_events"},
+    "user": {"orders", "menuitem", "credentials", "kpi_counters", "partner_load", "partner_stats", "daily_sales"},
+    "restaurant": {"menuitem", "kpi_counters"},
+    "deliverypartner": {"orders", "restaurant", "credentials", "kpi_counters", "partner_load", "partner_stats"},
+    "payment": {"orders", "user", "daily_sales", "order_events"},
+    "menuitem": {"orderitem", "stock_reservation"}
+}
+
+# ON DELETE CASCADE children. InnoDB follows these chains (without firing the
+# children's triggers), so a delete reaches the children's children too.
+CASCADE_DELETES = {
+    "user": {"orders"},
+    "orders": {"orderitem", "order_intake"},
+    "restaurant": {"menuitem"},
+    "menuitem": {"orderitem", "stock_reservation"},
+    "deliverypartner": {"partner_load", "partner_stats"}
+}
+
+def _close_side_effects(direct, cascades):
+    """{table: direct side effects plus every table its cascaded deletes reach}."""
+    closed = {}
+    for table in direct.keys() | cascades.keys():
+        reached = set(direct.get(table, ()))
+        seen, pending = {table}, [table]
+        while pending:
+            for child in cascades.get(pending.pop(), ()):
+                reached.add(child)
+                if child not in seen:
+                    seen.add(child)
+                    pending.append(child)
+        closed[table] = reached
+    return closed
+
+# Computed once; invalidation looks tables up here
+SIDE_EFFECT_CLOSURE = _close_side_effects(SIDE_EFFECT_TABLES, CASCADE_DELETES)
+
+# Tables written by each stored procedure
+PROC_TABLES = {
+    "PlaceNewOrder": {"payment", "orders"},
+    "Checkout": {"payment", "orders", "orderitem", "menuitem", "stock_reservation"},
+    "UpdateOrderStatus": {"orders", "payment"}
+}
+
+TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN|INTO|UPDATE)\s+`?(\w+)`?", re.IGNORECASE)
+
+def tables_in(query):
+    """Table names referenced by a SQL statement (lower-cased)."""
+    return {name.lower() for name in TABLE_PATTERN.findall(query)}
+
+def with_side_effects(tables):
+    """Expand written tables with everything their triggers and FK actions touch."""
+    result = set(tables)
+    for table in tables:
+        result |= SIDE_EFFECT_CLOSURE.get(table, set())
+    return result
+
+def _estimate_size(value):
+    """Rough byte size of a cached (cols, rows) / row result."""
+    size = sys.getsizeof(value)
+    for part in value if isinstance(value, (list, tuple)) else ():
+        size += sys.getsizeof(part)
+        if isinstance(part, (list, tuple)):
+            for item in part:
+                size += sys.getsizeof(item)
+                if isinstance(item, tuple):
+                    size += sum(sys.getsizeof(v) for v in item)
+    return size
+
+class QueryCache:
+    """LRU cache of read results keyed by SQL text and parameters.
+
+    Every entry remembers the tables its query reads; writes bump a per-table
+    generation and drop the entries that depend on it. A result loaded while a
+    write to one of its tables was in flight is not stored, nor one put with
+    settle seconds when one of its tables was written less than settle ago.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_entries=5000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, expires_at, tables, size)
+        self._by_table = {}             # table -> set of keys
+        self._generation = {}           # table -> write counter
+        self._written_at = {}           # table -> when it was last invalidated
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0,
+                       "expired": 0, "invalidations": 0, "unsettled": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            if entry[1] < time.monotonic():
+                self._drop_locked(key)
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[0]
+
+    def begin(self, query):
+        """Snapshot table generations before a load; pass the token to put()."""
+        tables = tables_in(query)
+        with self._lock:
+            return tables, {t: self._generation.get(t, 0) for t in tables}
+
+    def put(self, key, value, ttl, token, settle=0):
+        tables, generations = token
+        size = _estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if any(self._generation.get(t, 0) != g for t, g in generations.items()):
+                return
+            if settle:
+                since = time.monotonic() - settle
+                if any(self._written_at.get(t, since) > since for t in tables):
+                    self._stats["unsettled"] += 1
+                    return
+            if key in self._entries:
+                self._drop_locked(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tables, size)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._stats["stores"] += 1
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                self._drop_locked(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def invalidate(self, tables):
+        with self._lock:
+            now = time.monotonic()
+            for table in with_side_effects(tables):
+                self._generation[table] = self._generation.get(table, 0) + 1
+                self._written_at[table] = now
+                for key in list(self._by_table.get(table, ())):
+                    self._drop_locked(key)
+                    self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            for table in list(self._by_table):
+                self._generation[table] = self._generation.get(table, 0) + 1
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def _drop_locked(self, key):
+        value, _, tables, size = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys:
+                keys.discard(key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+@st.cache_resource
+def get_query_cache():
+    return QueryCache(**CACHE_CONFIG)
+
+def invalidate_tables(*tables):
+    get_query_cache().invalidate(tables)
+    if "menuitem" in with_side_effects(tables):
+        get_catalog().expire_stock()
+
+# -------------------- QUERY INSTRUMENTATION --------------------
+QUERY_LOG_CONFIG = {
+    "buffer_size": 5000,     # most recent statements kept in memory
+    "slow_ms": 200,          # SELECTs slower than this get an EXPLAIN sample
+    "explain_every": 300,    # seconds between EXPLAIN samples of the same statement
+    "log_file": os.environ.get("FOODAPP_QUERY_LOG")   # optional JSON-lines log
+}
+
+# show_* helpers that render part of a page; the page is the caller above them
+PAGE_HELPERS = {"show_paginated_grid"}
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+IN_LIST_PATTERN = re.compile(r"IN \((?:%s, )*%s\)", re.IGNORECASE)
+
+def normalize_sql(query):
+    """One-line statement shape used to group executions."""
+    shape = WHITESPACE_PATTERN.sub(" ", query).strip()
+    return IN_LIST_PATTERN.sub("IN (...)", shape)
+
+def calling_page():
+    """Name of the innermost show_* page on the call stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        name = frame.f_code.co_name
+        if name.startswith("show_") and name not in PAGE_HELPERS:
+            return name
+        frame = frame.f_back
+    return None
+
+class QueryLog:
+    """Bounded ring buffer of executed statements with per-statement rollups."""
+
+    def __init__(self, buffer_size=5000, slow_ms=200, explain_every=300, log_file=None):
+        self.slow_ms = slow_ms
+        self.explain_every = explain_every
+        self._records = deque(maxlen=buffer_size)
+        self._explains = {}   # statement shape -> (sampled_at, plan rows, elapsed_ms)
+        self._runs = deque(maxlen=buffer_size)   # (name, elapsed_ms, statements) per script/fragment run
+        self._local = threading.local()          # statements issued so far by this thread
+        self._lock = threading.Lock()
+        self._log = open(log_file, "a", encoding="utf-8") if log_file else None
+
+    def wants_explain(self, shape, elapsed_ms):
+        if elapsed_ms < self.slow_ms or not shape.upper().startswith("SELECT"):
+            return False
+        with self._lock:
+            sample = self._explains.get(shape)
+        return sample is None or time.time() - sample[0] > self.explain_every
+
+    def add_explain(self, shape, plan, elapsed_ms):
+        with self._lock:
+            self._explains[shape] = (time.time(), plan, elapsed_ms)
+
+    def record(self, kind, shape, elapsed_ms, rows, page, error=None):
+        entry = {
+            "at": time.time(),
+            "kind": kind,
+            "sql": shape,
+            "ms": round(elapsed_ms, 3),
+            "rows": rows,
+            "page": page,
+            "error": str(error) if error else None
+        }
+        self._local.statements = getattr(self._local, "statements", 0) + 1
+        with self._lock:
+            self._records.append(entry)
+            if self._log:
+                self._log.write(json.dumps(entry) + "\n")
+                self._log.flush()
+
+    def summary(self, page=None):
+        """Per-statement totals: calls, total/mean/p95/max ms, avg rows, errors, pages."""
+        with self._lock:
+            records = [r for r in self._records if page is None or r["page"] == page]
+            explains = dict(self._explains)
+        groups = {}
+        for r in records:
+            groups.setdefault(r["sql"], []).append(r)
+        summary = []
+        for shape, runs in groups.items():
+            times = sorted(r["ms"] for r in runs)
+            summary.append({
+                "sql": shape,
+                "kind": runs[-1]["kind"],
+                "calls": len(runs),
+                "total_ms": sum(times),
+                "mean_ms": sum(times) / len(times),
+                "p95_ms": times[min(len(times) - 1, int(0.95 * len(times)))],
+                "max_ms": times[-1],
+                "avg_rows": sum(r["rows"] or 0 for r in runs) / len(runs),
+                "errors": sum(1 for r in runs if r["error"]),
+                "pages": ", ".join(sorted({r["page"] or "-" for r in runs})),
+                "explain": explains.get(shape)
+            })
+        return summary
+
+    def start_run(self):
+        return time.perf_counter(), getattr(self._local, "statements", 0)
+
+    def end_run(self, name, token):
+        started, statements = token
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._runs.append((name, elapsed_ms, getattr(self._local, "statements", 0) - statements))
+
+    def run_summary(self):
+        """Per page/fragment: runs, mean/p95 server ms and statements per run."""
+        with self._lock:
+            runs = list(self._runs)
+        groups = {}
+        for name, elapsed_ms, statements in runs:
+            groups.setdefault(name, []).append((elapsed_ms, statements))
+        summary = []
+        for name, group in groups.items():
+            times = sorted(ms for ms, _ in group)
+            summary.append({
+                "run": name,
+                "runs": len(group),
+                "mean_ms": sum(times) / len(times),
+                "p95_ms": times[min(len(times) - 1, int(0.95 * len(times)))],
+                "queries_per_run": sum(n for _, n in group) / len(group)
+            })
+        return summary
+
+    def pages(self):
+        with self._lock:
+            return sorted({r["page"] for r in self._records if r["page"]})
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+            self._explains.clear()
+            self._runs.clear()
+
+@st.cache_resource
+def get_query_log():
+    return QueryLog(**QUERY_LOG_CONFIG)
+
+def record_query(kind, query, params, started, rows, conn=None, error=None):
+    """Log one statement; slow SELECTs also get an EXPLAIN sample on conn."""
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    log = get_query_log()
+    shape = normalize_sql(query)
+    log.record(kind, shape, elapsed_ms, rows, calling_page(), error)
+    if conn is not None and error is None and log.wants_explain(shape, elapsed_ms):
+        cur = conn.cursor()
+        try:
+            cur.execute("EXPLAIN " + query, params or ())
+            cols = [d[0] for d in cur.description]
+            log.add_explain(shape, [dict(zip(cols, row)) for row in cur.fetchall()], elapsed_ms)
+        except mysql.connector.Error:
+            pass
+        finally:
+            cur.close()
+
+def timed_run(name):
+    """Record server time and statement count of each run of a page or fragment."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def run(*args, **kwargs):
+            log = get_query_log()
+            token = log.start_run()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                log.end_run(name, token)
+        return run
+    return decorate
+
 # -------------------- DB HELPERS --------------------
 def get_db():
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        return get_engine().acquire()
     except mysql.connector.Error as e:
         st.error(f"DB Connection Error: {str(e)}")
         return None
 
-def fetch_all(query, params=None):
-    conn = get_db()
+def release_db(conn, error=None):
+    get_engine().release(conn, error=error)
+
+def read_token():
+    """This session's last write, while it still decides where reads go."""
+    token = st.session_state.get("read_token")
+    if token is None:
+        return None
+    window = ROUTING_CONFIG["gtid_window"] if token["gtid"] else ROUTING_CONFIG["sticky_window"]
+    if time.monotonic() - token["at"] >= window:
+        st.session_state.pop("read_token", None)
+        return None
+    return token
+
+def note_write(conn=None):
+    """Record a commit so this session's next reads see it (read-your-writes).
+
+    With conn, the primary's executed GTID set is kept and replicas serve the
+    session once they have applied it; without GTIDs (or conn), the session
+    reads from the primary for sticky_window seconds.
+    """
+    if not get_read_router().engines:
+        return
+    gtid = None
+    if conn is not None:
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT @@GLOBAL.gtid_executed")
+            gtid = cur.fetchone()[0] or None
+            cur.close()
+        except mysql.connector.Error:
+            pass
+    st.session_state.read_token = {"gtid": gtid, "at": time.monotonic()}
+
+def acquire_read():
+    """(engine, conn) for a read: a replica when this session may use one, else the primary."""
+    router = get_read_router()
+    if router.engines:
+        token = read_token()
+        if token is not None and not token["gtid"]:
+            router.count("sticky")
+        else:
+            engine, conn = router.acquire(token["gtid"] if token else None)
+            if conn is not None:
+                return engine, conn
+        router.count("primary")
+    engine = get_engine()
+    return engine, engine.acquire()
+
+def get_read_db():
+    """acquire_read for the helpers: (engine, conn), or (None, None) after showing the error."""
+    try:
+        return acquire_read()
+    except mysql.connector.Error as e:
+        st.error(f"DB Connection Error: {str(e)}")
+        return None, None
+
+def cache_settle(engine):
+    """settle for QueryCache.put: a replica may still lag behind a recent write, the primary can't."""
+    return 0 if engine is get_engine() else ROUTING_CONFIG["cache_settle"]
+
+def fetch_all(query, params=None, ttl=None):
+    """Run a read query; pass ttl (seconds) to serve repeats from the result cache."""
+    # A session inside its read-your-writes window reads past the cache
+    cache = get_query_cache() if ttl and read_token() is None else None
+    if cache:
+        key = ("all", query, tuple(params or ()))
+        hit, value = cache.get(key)
+        if hit:
+            return value
+        token = cache.begin(query)
+    
+    engine, conn = get_read_db()
     if not conn: 
         return [], []
     cur = conn.cursor()
+    started = time.perf_counter()
+    error = None
     try:
         cur.execute(query, params or ())
         cols = [d[0] for d in cur.description] if cur.description else []
         rows = cur.fetchall()
+        record_query("fetch_all", query, params, started, len(rows), conn)
+        if cache:
+            cache.put(key, (cols, rows), ttl, token, cache_settle(engine))
         return cols, rows
     except mysql.connector.Error as e:
+        error = e
+        record_query("fetch_all", query, params, started, 0, error=e)
         st.error(f"Query Error: {str(e)}")
         return [], []
     finally:
         cur.close()
-        conn.close()
+        engine.release(conn, error=error)
 
 def execute(query, params=None):
     conn = get_db()
     if not conn:
         return False
     cur = conn.cursor()
+    started = time.perf_counter()
+    error = None
     try:
         cur.execute(query, params or ())
         conn.commit()
+        record_query("execute", query, params, started, cur.rowcount)
+        invalidate_tables(*tables_in(query))
+        note_write(conn)
         return True
     except mysql.connector.Error as e:
+        error = e
+        record_query("execute", query, params, started, 0, error=e)
         st.error(f"DB Error: {str(e)}")
         return False
     finally:
         cur.close()
-        conn.close()
+        release_db(conn, error)
 
 def call_proc(proc_name, args=None):
     conn = get_db()
     if not conn:
         return None
     cur = conn.cursor()
+    started = time.perf_counter()
+    error = None
     try:
         cur.callproc(proc_name, args or ())
         conn.commit()
+        record_query("call_proc", f"CALL {proc_name}", None, started, cur.rowcount)
+        invalidate_tables(*PROC_TABLES.get(proc_name, ()))
+        note_write(conn)
         return True
     except mysql.connector.Error as e:
+        error = e
+        record_query("call_proc", f"CALL {proc_name}", None, started, 0, error=e)
         st.error(f"Procedure Error: {str(e)}")
         return None
     finally:
         cur.close()
-        conn.close()
+        release_db(conn, error)
 
-def fetch_one(query, params=None):
-    conn = get_db()
+def fetch_one(query, params=None, ttl=None):
+    """Run a read query and return its first row; ttl works as in fetch_all."""
+    # A session inside its read-your-writes window reads past the cache
+    cache = get_query_cache() if ttl and read_token() is None else None
+    if cache:
+        key = ("one", query, tuple(params or ()))
+        hit, value = cache.get(key)
+        if hit:
+            return value
+        token = cache.begin(query)
+    
+    engine, conn = get_read_db()
     if not conn:
         return None
-    cur = conn.cursor()
+    cur = conn.cursor(buffered=True)
+    started = time.perf_counter()
+    error = None
     try:
         cur.execute(query, params or ())
         row = cur.fetchone()
+        record_query("fetch_one", query, params, started, cur.rowcount, conn)
+        if cache:
+            cache.put(key, row, ttl, token, cache_settle(engine))
         return row
     except mysql.connector.Error as e:
+        error = e
+        record_query("fetch_one", query, params, started, 0, error=e)
         st.error(f"Query Error: {str(e)}")
         return None
     finally:
         cur.close()
-        conn.close()
+        engine.release(conn, error=error)
+
+# -------------------- STREAMING READS --------------------
+# Rows pulled from the server per chunk; memory stays at one chunk however long the result
+STREAM_CHUNK_ROWS = 5000
+
+def stream_rows(query, params=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Yield (cols, rows) chunks from an unbuffered cursor.
+
+    Rows are read off the socket as they are consumed instead of being
+    materialized with fetchall. An empty result yields one empty chunk so
+    callers still get the columns. The pooled connection is held until the
+    generator is exhausted or closed; errors propagate to the caller.
+    """
+    engine, conn = acquire_read()
+    cur = conn.cursor()
+    started = time.perf_counter()
+    total, finished = 0, False
+    try:
+        cur.execute(query, params or ())
+        cols = [d[0] for d in cur.description]
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows and total:
+                break
+            total += len(rows)
+            yield cols, rows
+            if not rows:
+                break
+        finished = True
+        record_query("stream", query, params, started, total)
+    except mysql.connector.Error as e:
+        record_query("stream", query, params, started, total, error=e)
+        raise
+    finally:
+        # An abandoned stream would have to drain the rest of the result first;
+        # dropping the connection is cheaper
+        try:
+            cur.close()
+        except mysql.connector.Error:
+            finished = False
+        engine.release(conn, discard=not finished)
+
+def stream_frames(query, params=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """stream_rows as one DataFrame per chunk."""
+    for cols, rows in stream_rows(query, params, chunk_rows):
+        yield pd.DataFrame(rows, columns=cols)
+
+def export_csv(query, params=None, chunk_rows=STREAM_CHUNK_ROWS):
+    """Stream a query into a CSV temp file on disk; returns the file rewound to the start."""
+    out = tempfile.TemporaryFile()
+    header = True
+    for df in stream_frames(query, params, chunk_rows):
+        df.to_csv(out, header=header, index=False)
+        header = False
+    out.seek(0)
+    return out
+
+# -------------------- KPI SNAPSHOT --------------------
+def fetch_kpi_snapshot():
+    """Return every dashboard metric from one statement.
+
+    kpi_counters is kept current by triggers, so this reads a handful of
+    primary-key rows no matter how large orders grows. Each counter is split
+    into slots so concurrent checkouts don't contend on one row; they are
+    summed here.
+    """
+    cols, rows = fetch_all(KPI_QUERY, ttl=10)
+    counters = {name: value for name, value in rows}
+    if not counters:
+        cols, rows = fetch_all(KPI_FALLBACK_QUERY, ttl=10)
+        counters = dict(zip(cols, rows[0])) if rows else {}
+    
+    rated = counters.get('rated_restaurants') or 0
+    rating_sum = counters.get('restaurant_rating_sum') or 0
+    return {
+        'total_orders': int(counters.get('total_orders') or 0),
+        'total_users': int(counters.get('total_users') or 0),
+        'total_restaurants': int(counters.get('total_restaurants') or 0),
+        'total_partners': int(counters.get('total_partners') or 0),
+        'revenue': float(counters.get('delivered_revenue') or 0),
+        'avg_rating': float(rating_sum) / float(rated) if rated else 0.0
+    }
+
+# -------------------- MENU CATALOG --------------------
+CATALOG_CONFIG = {
+    "stock_refresh": 3,     # seconds between stock delta polls
+    "stock_overlap": 5,     # seconds re-read behind the newest change seen (late commits)
+    "max_age": 900          # full reload at least this often (e.g. edits from another process)
+}
+
+
+class Catalog:
+    """Restaurants and menu items shared by every session.
+
+    The snapshot is loaded once per version; admin edits bump the version and
+    the next reader reloads it. Stock changes on every checkout, so instead it
+    is refreshed from the menuitem rows whose updated_at moved since the last
+    poll. The search index is kept in step with both, re-indexing only the
+    restaurants and items whose text changed.
+    """
+
+    def __init__(self, stock_refresh=3, stock_overlap=5, max_age=900):
+        self.stock_refresh = stock_refresh
+        self.stock_overlap = timedelta(seconds=stock_overlap)
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self.version = 0
+        self._loaded_version = None
+        self._loaded_at = 0.0
+        self._stock_checked_at = 0.0
+        self._watermark = None          # newest updated_at seen (server time)
+        self._restaurants = []          # (rest_id, name, address, rating), best rated first
+        self._by_rest_id = {}           # rest_id -> restaurant tuple
+        self._items = {}                # item_id -> item dict
+        self._menus = {}                # rest_id -> [item_id, ...]
+        self._search = SearchIndex(**SEARCH_CONFIG)
+        self._stats = {"reloads": 0, "stock_polls": 0, "stock_rows": 0, "reindexed": 0}
+
+    def bump(self):
+        """Mark the snapshot stale after a restaurant or menu edit."""
+        with self._lock:
+            self.version += 1
+
+    def expire_stock(self):
+        """Poll stock on the next read instead of waiting for stock_refresh."""
+        self._stock_checked_at = 0.0
+
+    def _ensure_fresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded_version != self.version or now - self._loaded_at > self.max_age:
+                self._load_locked(now)
+            elif now - self._stock_checked_at > self.stock_refresh:
+                self._refresh_stock_locked(now)
+
+    def _load_locked(self, now):
+        version = self.version
+        rest_cols, restaurants = fetch_all(CATALOG_RESTAURANTS_QUERY)
+        item_cols, items = fetch_all(CATALOG_ITEMS_QUERY)
+        if not rest_cols or not item_cols:
+            return   # keep serving the previous snapshot; fetch_all reported the error
+        self._restaurants = [tuple(r) for r in restaurants]
+        self._by_rest_id = {r[0]: r for r in self._restaurants}
+        self._items = {}
+        self._menus = {}
+        self._watermark = None
+        for rest_id, name, address, _ in self._restaurants:
+            self._index_locked(("restaurant", rest_id), [(name, SEARCH_WEIGHTS["restaurant_name"]),
+                                                         (address, SEARCH_WEIGHTS["address"])])
+        for row in items:
+            self._apply_item_locked(row)
+            self._menus.setdefault(row[4], []).append(row[0])
+        live = {("restaurant", r[0]) for r in self._restaurants} | {("item", item_id) for item_id in self._items}
+        for key in self._search.keys() - live:
+            self._search.remove(key)
+        self._loaded_version = version
+        self._loaded_at = self._stock_checked_at = now
+        self._stats["reloads"] += 1
+
+    def _refresh_stock_locked(self, now):
+        since = self._watermark - self.stock_overlap if self._watermark else datetime(1970, 1, 2)
+        cols, rows = fetch_all(CATALOG_STOCK_DELTA_QUERY, (since,))
+        self._stock_checked_at = now
+        if not cols:
+            return
+        self._stats["stock_polls"] += 1
+        self._stats["stock_rows"] += len(rows)
+        for row in rows:
+            item = self._items.get(row[0])
+            if item is None or item['rest_id'] != row[4]:
+                # New item or moved to another restaurant: the menus need rebuilding
+                self._load_locked(now)
+                return
+            self._apply_item_locked(row)
+
+    def _apply_item_locked(self, row):
+        item_id, name, price, quantity, rest_id, updated_at = row
+        self._items[item_id] = {'item_id': item_id, 'name': name, 'price': price,
+                                'quantity': quantity, 'rest_id': rest_id}
+        restaurant = self._by_rest_id.get(rest_id)
+        self._index_locked(("item", item_id), [(name, SEARCH_WEIGHTS["item_name"]),
+                                               (restaurant[1] if restaurant else "", SEARCH_WEIGHTS["item_restaurant"])])
+        if updated_at and (self._watermark is None or updated_at > self._watermark):
+            self._watermark = updated_at
+
+    def _index_locked(self, key, fields):
+        if self._search.put(key, fields):
+            self._stats["reindexed"] += 1
+
+    def restaurants(self):
+        self._ensure_fresh()
+        return list(self._restaurants)
+
+    def search(self, query, limit=20, in_stock_only=True):
+        """Ranked restaurants and menu items (copies) matching query, best first."""
+        self._ensure_fresh()
+        results = []
+        with self._lock:
+            for score, (kind, key_id) in self._search.search(query, limit * 2):
+                if kind == "restaurant":
+                    restaurant = self._by_rest_id.get(key_id)
+                    if restaurant:
+                        rest_id, name, address, rating = restaurant
+                        results.append({'kind': kind, 'rest_id': rest_id, 'name': name,
+                                        'address': address, 'rating': rating, 'score': score})
+                else:
+                    item = self._items.get(key_id)
+                    if item and (not in_stock_only or (item['quantity'] or 0) > 0):
+                        restaurant = self._by_rest_id.get(item['rest_id'])
+                        results.append(dict(item, kind=kind, score=score,
+                                            restaurant=restaurant[1] if restaurant else None))
+                if len(results) == limit:
+                    break
+        return results
+
+    def restaurant(self, rest_id):
+        self._ensure_fresh()
+        return self._by_rest_id.get(rest_id)
+
+    def menu(self, rest_id, in_stock_only=True):
+        """Items of one restaurant (copies), in item_id order."""
+        self._ensure_fresh()
+        items = [dict(self._items[item_id]) for item_id in self._menus.get(rest_id, ())
+                 if item_id in self._items]
+        return [item for item in items if (item['quantity'] or 0) > 0] if in_stock_only else items
+
+    def item(self, item_id):
+        self._ensure_fresh()
+        item = self._items.get(item_id)
+        return dict(item) if item else None
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(version=self.version, restaurants=len(self._restaurants),
+                         items=len(self._items), watermark=self._watermark,
+                         **{f"search_{name}": value for name, value in self._search.stats().items()})
+        return stats
+
+@st.cache_resource
+def get_catalog():
+    return Catalog(**CATALOG_CONFIG)
+
+# -------------------- STOCK RESERVATIONS --------------------
+# Adding to the cart moves units out of menuitem.quantity into a
+# stock_reservation row that expires unless the cart is touched again.
+# menuitem.quantity is therefore what is left for everyone else.
+RESERVATION_CONFIG = {
+    "ttl": 600,              # seconds a cart holds its items after the last change
+    "sweep_every": 30,       # seconds between sweeps of expired holds (per process)
+    "sweep_batch": 1000,     # holds returned to stock per sweep transaction
+    "deadlock_retries": 3    # times reserve_stock retries after losing a deadlock
+}
+
+def _restore_stock(cur, holds):
+    """Return held units to stock and drop the holds; holds are locked (res_id, item_id, quantity) rows."""
+    if not holds:
+        return
+    units = {}
+    for _, item_id, quantity in holds:
+        units[item_id] = units.get(item_id, 0) + quantity
+    item_ids = sorted(units)
+    cases = " ".join(["WHEN %s THEN %s"] * len(item_ids))
+    cur.execute(f"""
+        UPDATE menuitem
+        SET quantity = quantity + CASE item_id {cases} END
+        WHERE item_id IN ({", ".join(["%s"] * len(item_ids))})
+    """, [value for item_id in item_ids for value in (item_id, units[item_id])] + item_ids)
+    res_ids = [hold[0] for hold in holds]
+    cur.execute(f"DELETE FROM stock_reservation WHERE res_id IN ({', '.join(['%s'] * len(res_ids))})", res_ids)
+
+def reserve_stock(conn, cart_id, user_id, item_id, quantity=1, ttl=None):
+    """Hold quantity more units of an item for a cart; returns False when not enough is left.
+
+    Stock is taken before the hold is written: the UPDATE locks the menuitem
+    row exclusively up front. Writing the hold first would take a shared lock
+    on it for the foreign key check, and two carts reserving the same item
+    would then deadlock upgrading those locks. Checkout and the sweep lock a
+    cart's holds before its stock, so a checkout of this same cart can still
+    deadlock with it; the loser here is retried up to deadlock_retries times.
+    Every change extends the whole cart.
+    """
+    ttl = ttl or RESERVATION_CONFIG["ttl"]
+    retries = RESERVATION_CONFIG["deadlock_retries"]
+    for attempt in range(retries + 1):
+        cur = conn.cursor()
+        try:
+            conn.start_transaction()
+            cur.execute("UPDATE menuitem SET quantity = quantity - %s WHERE item_id=%s AND quantity >= %s",
+                        (quantity, item_id, quantity))
+            if cur.rowcount != 1:
+                conn.rollback()
+                return False
+            cur.execute("""
+                INSERT INTO stock_reservation (cart_id, user_id, item_id, quantity, expires_at)
+                VALUES (%s, %s, %s, %s, NOW(3) + INTERVAL %s SECOND)
+                ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity)
+            """, (cart_id, user_id, item_id, quantity, ttl))
+            cur.execute("UPDATE stock_reservation SET expires_at = NOW(3) + INTERVAL %s SECOND WHERE cart_id=%s",
+                        (ttl, cart_id))
+            conn.commit()
+            invalidate_tables("stock_reservation", "menuitem")
+            return True
+        except Exception as e:
+            conn.rollback()
+            if getattr(e, "errno", None) != errorcode.ER_LOCK_DEADLOCK or attempt == retries:
+                raise
+        finally:
+            cur.close()
+
+def release_stock(conn, cart_id, item_id=None, quantity=None):
+    """Give back quantity units of one item (all of it when None), or the whole cart when item_id is None."""
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        if item_id is None:
+            cur.execute("""
+                SELECT res_id, item_id, quantity FROM stock_reservation
+                WHERE cart_id=%s ORDER BY item_id FOR UPDATE
+            """, (cart_id,))
+        else:
+            cur.execute("""
+                SELECT res_id, item_id, quantity FROM stock_reservation
+                WHERE cart_id=%s AND item_id=%s FOR UPDATE
+            """, (cart_id, item_id))
+        holds = cur.fetchall()
+        if holds and quantity is not None and quantity < holds[0][2]:
+            res_id = holds[0][0]
+            cur.execute("UPDATE stock_reservation SET quantity = quantity - %s WHERE res_id=%s", (quantity, res_id))
+            cur.execute("UPDATE menuitem SET quantity = quantity + %s WHERE item_id=%s", (quantity, item_id))
+        else:
+            _restore_stock(cur, holds)
+        conn.commit()
+        invalidate_tables("stock_reservation", "menuitem")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+def sweep_expired_reservations(conn, batch=None):
+    """Return expired holds to stock in batches; returns the number of holds swept.
+
+    SKIP LOCKED leaves holds that a checkout is converting right now alone.
+    """
+    batch = batch or RESERVATION_CONFIG["sweep_batch"]
+    swept = 0
+    cur = conn.cursor()
+    try:
+        while True:
+            conn.start_transaction()
+            cur.execute(RESERVATION_SWEEP_QUERY, (batch,))
+            holds = cur.fetchall()
+            _restore_stock(cur, holds)
+            conn.commit()
+            swept += len(holds)
+            if len(holds) < batch:
+                break
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    if swept:
+        invalidate_tables("stock_reservation", "menuitem")
+    return swept
+
+@st.cache_resource
+def get_sweep_state():
+    return {"lock": threading.Lock(), "last": 0.0}
+
+def sweep_reservations_if_due():
+    """Run the expired-hold sweep from at most one session per sweep_every seconds."""
+    state = get_sweep_state()
+    if time.monotonic() - state["last"] < RESERVATION_CONFIG["sweep_every"]:
+        return
+    if not state["lock"].acquire(blocking=False):
+        return
+    try:
+        state["last"] = time.monotonic()
+        conn = get_db()
+        if not conn:
+            return
+        error = None
+        try:
+            sweep_expired_reservations(conn)
+        except mysql.connector.Error as e:
+            error = e   # the next sweep picks the holds up again
+        finally:
+            release_db(conn, error)
+    finally:
+        state["lock"].release()
+
+# -------------------- ORDER PLACEMENT --------------------
+class InsufficientStock(Exception):
+    """Raised when one or more cart lines ask for more than is in stock."""
+
+    def __init__(self, shortfalls):
+        self.shortfalls = shortfalls   # [(item_id, name, requested, available), ...]
+        details = ", ".join(f"{name} (requested {requested}, only {available} left)"
+                            for _, name, requested, available in shortfalls)
+        super().__init__(f"Not enough quantity available for {details}")
+
+# Errors that fail a whole order batch rather than one order in it: a deadlock
+# has already rolled back the transaction (savepoints included) and a lock wait
+# timeout is worth retrying, which the intake queue does for the whole batch
+BATCH_RETRY_ERRNOS = {errorcode.ER_LOCK_DEADLOCK, errorcode.ER_LOCK_WAIT_TIMEOUT}
+
+def fails_batch(error):
+    """True when error must roll back the whole batch instead of one order's savepoint."""
+    return isinstance(error, DISCONNECT_ERRORS) or getattr(error, "errno", None) in BATCH_RETRY_ERRNOS
+
+def assign_partner(cur):
+    """Pick the delivery partner for a new order (None when there are no partners)."""
+    cur.execute(PARTNER_ASSIGNMENT_QUERY)
+    row = cur.fetchone()
+    if row is None:
+        # partner_load not populated yet (older schema): fall back to any partner
+        cur.execute("SELECT partner_id FROM deliverypartner ORDER BY RAND() LIMIT 1")
+        row = cur.fetchone()
+    return row[0] if row else None
+
+def write_order(cur, user_id, cart, payment_method, cart_id=None):
+    """Write one order inside the caller's transaction; returns the new order_id.
+
+    With a cart_id, units the cart already holds in stock_reservation are
+    converted into order lines: only the cart's own hold rows are locked, so
+    a fully held cart never waits on a hot menuitem row. Anything not held
+    (an expired hold, a cart built without reservations) is locked with one
+    SELECT ... FOR UPDATE in item_id order, so concurrent checkouts always
+    lock in the same order and cannot deadlock on each other. Order lines go
+    in with one multi-row INSERT and stock is settled with one set-based
+    UPDATE. Raises InsufficientStock listing every short item.
+    """
+    lines = {}
+    for item in cart:
+        line = lines.setdefault(item['item_id'], {'name': item['name'], 'price': item['price'], 'quantity': 0})
+        line['quantity'] += item['quantity']
+    item_ids = sorted(lines)
+    total_amount = sum(line['price'] * line['quantity'] for line in lines.values())
+    
+    # The cart's holds (locked first, as in release_stock and the sweep)
+    held = {}
+    if cart_id:
+        cur.execute("""
+            SELECT item_id, quantity FROM stock_reservation
+            WHERE cart_id=%s ORDER BY item_id FOR UPDATE
+        """, (cart_id,))
+        held = dict(cur.fetchall())
+    
+    # Lock the stock rows the holds don't cover, in a consistent order, and check them up front
+    unheld_ids = [item_id for item_id in item_ids if held.get(item_id, 0) < lines[item_id]['quantity']]
+    in_stock = {}
+    if unheld_ids:
+        cur.execute(f"""
+            SELECT item_id, quantity FROM menuitem
+            WHERE item_id IN ({", ".join(["%s"] * len(unheld_ids))})
+            ORDER BY item_id
+            FOR UPDATE
+        """, unheld_ids)
+        in_stock = dict(cur.fetchall())
+    shortfalls = [(item_id, lines[item_id]['name'], lines[item_id]['quantity'],
+                   in_stock.get(item_id, 0) + held.get(item_id, 0))
+                  for item_id in unheld_ids
+                  if in_stock.get(item_id, 0) + held.get(item_id, 0) < lines[item_id]['quantity']]
+    if shortfalls:
+        raise InsufficientStock(shortfalls)
+    
+    # Create payment
+    cur.execute("INSERT INTO payment (method, amount, status) VALUES (%s, %s, %s)",
+               (payment_method, total_amount, 'Pending'))
+    pay_id = cur.lastrowid
+    
+    partner_id = assign_partner(cur)
+    
+    # Create order
+    cur.execute("""
+        INSERT INTO orders (user_id, total_amt, status, pay_id, partner_id, order_date)
+        VALUES (%s, %s, %s, %s, %s, NOW())
+    """, (user_id, total_amount, 'Placed', pay_id, partner_id))
+    order_id = cur.lastrowid
+    
+    # All order lines in one multi-row INSERT
+    cur.executemany("""
+        INSERT INTO orderitem (order_id, item_id, quantity, price)
+        VALUES (%s, %s, %s, %s)
+    """, [(order_id, item_id, lines[item_id]['quantity'], lines[item_id]['price']) for item_id in item_ids])
+    
+    # Settle stock in one set-based UPDATE: take what the holds don't cover
+    # (locked and checked above), give back holds the cart no longer needs
+    adjust = {item_id: held.get(item_id, 0) - lines.get(item_id, {}).get('quantity', 0)
+              for item_id in set(held) | set(item_ids)}
+    adjust_ids = sorted(item_id for item_id, delta in adjust.items() if delta)
+    if adjust_ids:
+        cases = " ".join(["WHEN %s THEN %s"] * len(adjust_ids))
+        case_params = [value for item_id in adjust_ids for value in (item_id, adjust[item_id])]
+        cur.execute(f"""
+            UPDATE menuitem
+            SET quantity = quantity + CASE item_id {cases} END
+            WHERE item_id IN ({", ".join(["%s"] * len(adjust_ids))})
+        """, case_params + adjust_ids)
+        if cur.rowcount != len(adjust_ids):
+            raise mysql.connector.errors.DatabaseError("Stock changed during checkout")
+    if held:
+        cur.execute("DELETE FROM stock_reservation WHERE cart_id=%s", (cart_id,))
+    return order_id
+
+def checkout_call(conn, user_id, cart, payment_method, cart_id=None):
+    """Place an order with one CALL Checkout(...): the whole cart goes as JSON.
+
+    The procedure reprices, locks, checks and settles stock server-side with
+    the same lock order as write_order, and manages its own transaction, so
+    conn must not be inside one. Returns the new order_id or raises
+    InsufficientStock; a CALL that returns no rows raises DatabaseError.
+    """
+    lines = json.dumps([{"item_id": item['item_id'], "quantity": item['quantity']} for item in cart])
+    cur = conn.cursor()
+    try:
+        cur.execute("CALL Checkout(%s, %s, %s, %s)", (user_id, payment_method, lines, cart_id))
+        rows = cur.fetchall()
+        while cur.nextset():
+            pass
+    finally:
+        cur.close()
+    if not rows:
+        raise mysql.connector.errors.DatabaseError("Checkout procedure returned no result")
+    if rows[0][0] is None:
+        raise InsufficientStock([(item_id, name, requested, available)
+                                 for _, item_id, name, requested, available in rows])
+    invalidate_tables(*PROC_TABLES["Checkout"])
+    return rows[0][0]
+
+def place_order(conn, user_id, cart, payment_method, cart_id=None, server_side=True):
+    """Create payment, order and order items for a cart in one transaction.
+
+    Returns the new order_id, raises InsufficientStock listing every short
+    item, and rolls back on any error. By default this is one round trip to
+    the Checkout procedure; server_side=False runs write_order from here
+    instead (several statements, each a round trip).
+    """
+    if server_side:
+        return checkout_call(conn, user_id, cart, payment_method, cart_id)
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        order_id = write_order(cur, user_id, cart, payment_method, cart_id)
+        conn.commit()
+        invalidate_tables("payment", "orders", "orderitem", "menuitem", "stock_reservation")
+        return order_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+def place_order_batch(conn, entries):
+    """Write a batch of queued checkouts with a single commit (group commit).
+
+    entries are dicts with intake_key, user_id, cart, payment_method and
+    cart_id. Every hold row and then every stock row the holds don't cover is
+    locked up front, in a fixed order, so concurrent batches cannot deadlock
+    on each other. Each order runs under its own savepoint: a short cart, or
+    one the server rejects (a deleted user, a bad value), is rolled back alone
+    and its holds go back to stock; deadlocks, lock wait timeouts and lost
+    connections (fails_batch) still roll back and raise. An intake_key already
+    in order_intake (a batch replayed after a crash) is not written twice.
+    Returns {intake_key: (order_id, None) or (None, error message)}.
+    """
+    keys = [entry['intake_key'] for entry in entries]
+    results = {}
+    cur = conn.cursor()
+    try:
+        conn.start_transaction()
+        cur.execute(f"SELECT intake_key, order_id FROM order_intake WHERE intake_key IN ({', '.join(['%s'] * len(keys))})",
+                    keys)
+        for intake_key, order_id in cur.fetchall():
+            results[intake_key] = (order_id, None)
+        pending = [entry for entry in entries if entry['intake_key'] not in results]
+        
+        held = {}
+        cart_ids = sorted({entry['cart_id'] for entry in pending if entry.get('cart_id')})
+        if cart_ids:
+            cur.execute(f"""
+                SELECT cart_id, item_id, quantity FROM stock_reservation
+                WHERE cart_id IN ({", ".join(["%s"] * len(cart_ids))})
+                ORDER BY cart_id, item_id
+                FOR UPDATE
+            """, cart_ids)
+            for cart_id, item_id, quantity in cur.fetchall():
+                held.setdefault(cart_id, {})[item_id] = quantity
+        unheld = set()
+        for entry in pending:
+            wanted = {}
+            for item in entry['cart']:
+                wanted[item['item_id']] = wanted.get(item['item_id'], 0) + item['quantity']
+            cart_held = held.get(entry.get('cart_id'), {})
+            unheld |= {item_id for item_id, quantity in wanted.items() if cart_held.get(item_id, 0) < quantity}
+        if unheld:
+            cur.execute(f"""
+                SELECT item_id FROM menuitem
+                WHERE item_id IN ({", ".join(["%s"] * len(unheld))})
+                ORDER BY item_id
+                FOR UPDATE
+            """, sorted(unheld))
+            cur.fetchall()
+        
+        for n, entry in enumerate(pending):
+            cur.execute(f"SAVEPOINT order_{n}")
+            try:
+                order_id = write_order(cur, entry['user_id'], entry['cart'], entry['payment_method'],
+                                       entry.get('cart_id'))
+                cur.execute("INSERT INTO order_intake (intake_key, order_id) VALUES (%s, %s)",
+                            (entry['intake_key'], order_id))
+            except (InsufficientStock, mysql.connector.Error) as e:
+                if fails_batch(e):
+                    raise
+                cur.execute(f"ROLLBACK TO SAVEPOINT order_{n}")
+                if entry.get('cart_id'):
+                    cur.execute("SELECT res_id, item_id, quantity FROM stock_reservation WHERE cart_id=%s",
+                                (entry['cart_id'],))
+                    _restore_stock(cur, cur.fetchall())
+                results[entry['intake_key']] = (None, str(e))
+                continue
+            cur.execute(f"RELEASE SAVEPOINT order_{n}")
+            results[entry['intake_key']] = (order_id, None)
+        
+        conn.commit()
+        invalidate_tables("payment", "orders", "orderitem", "menuitem", "stock_reservation")
+        return results
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+
+# -------------------- ORDER INTAKE QUEUE --------------------
+# Optional asynchronous checkout: FOODAPP_ASYNC_ORDERS=1 makes show_checkout
+# append to a local SQLite queue and return at once; worker threads drain it
+# into MySQL in batches.
+ORDER_QUEUE_CONFIG = {
+    "enabled": os.environ.get("FOODAPP_ASYNC_ORDERS") == "1",
+    "path": os.environ.get("FOODAPP_ORDER_QUEUE", "order_queue.sqlite3"),
+    "workers": 2,            # threads writing batches to MySQL
+    "batch_size": 50,        # checkouts per MySQL commit
+    "linger_ms": 20,         # how long a worker waits for a batch to fill up
+    "max_attempts": 5        # transient MySQL failures before a checkout is marked failed
+}
+
+class OrderQueue:
+    """Durable local queue of checkouts drained into MySQL by worker threads.
+
+    enqueue() returns once the checkout is committed to the SQLite file (WAL,
+    synchronous=FULL), so an accepted order survives a crash. Workers claim
+    batches and write them with place_order_batch. Anything still claimed when
+    the process died is queued again on start-up; the order_intake row written
+    with each order makes replaying a batch that did commit harmless.
+    """
+
+    def __init__(self, engine, path="order_queue.sqlite3", workers=2, batch_size=50,
+                 linger_ms=20, max_attempts=5):
+        self.engine = engine
+        self.path = path
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._stats = {"batches": 0, "placed": 0, "failed": 0, "retried_batches": 0,
+                       "batch_ms_total": 0.0, "batch_rows_total": 0}
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS intake (
+                intake_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                intake_key TEXT NOT NULL UNIQUE,
+                user_id INTEGER NOT NULL,
+                cart_id TEXT,
+                payment_method TEXT NOT NULL,
+                cart TEXT NOT NULL,
+                total_amt REAL NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                claim TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                order_id INTEGER,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_intake_status ON intake (status, intake_id);
+            CREATE INDEX IF NOT EXISTS idx_intake_user ON intake (user_id, intake_id);
+        """)
+        with self._lock:
+            # Claimed by a worker of a process that is gone: replay
+            self._db.execute("UPDATE intake SET status='queued', claim=NULL WHERE status='processing'")
+        for n in range(workers):
+            threading.Thread(target=self._work, name=f"order-queue-{n}", daemon=True).start()
+
+    def enqueue(self, user_id, cart, payment_method, cart_id=None):
+        """Durably accept a checkout; returns its intake_id."""
+        total_amount = sum(item['price'] * item['quantity'] for item in cart)
+        now = time.time()
+        with self._lock:
+            cur = self._db.execute("""
+                INSERT INTO intake (intake_key, user_id, cart_id, payment_method, cart, total_amt,
+                                    created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (uuid.uuid4().hex, user_id, cart_id, payment_method, json.dumps(cart), total_amount, now, now))
+            intake_id = cur.lastrowid
+        with self._wakeup:
+            self._wakeup.notify()
+        return intake_id
+
+    def _claim(self, limit):
+        claim = uuid.uuid4().hex
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                self._db.execute("""
+                    UPDATE intake SET status='processing', claim=?, attempts=attempts+1, updated_at=?
+                    WHERE intake_id IN (SELECT intake_id FROM intake WHERE status='queued'
+                                        ORDER BY intake_id LIMIT ?)
+                """, (claim, time.time(), limit))
+                rows = self._db.execute("""
+                    SELECT intake_id, intake_key, user_id, cart_id, payment_method, cart, attempts
+                    FROM intake WHERE claim=? ORDER BY intake_id
+                """, (claim,)).fetchall()
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+        return rows
+
+    def _finish(self, updates):
+        """updates: [(status, order_id, error, intake_id), ...] written in one transaction."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.executemany("""
+                UPDATE intake SET status=?, order_id=?, error=?, claim=NULL, updated_at=?
+                WHERE intake_id=?
+            """, [(status, order_id, error, now, intake_id) for status, order_id, error, intake_id in updates])
+            self._db.execute("COMMIT")
+
+    def _work(self):
+        while True:
+            try:
+                rows = self._claim(self.batch_size)
+                if not rows:
+                    with self._wakeup:
+                        self._wakeup.wait(timeout=1.0)
+                    continue
+                if len(rows) < self.batch_size and self.linger:
+                    time.sleep(self.linger)
+                    rows += self._claim(self.batch_size - len(rows))
+                self._write_batch(rows)
+            except sqlite3.Error:
+                # Queue file busy or unwritable; claimed rows are replayed on the next start
+                time.sleep(1.0)
+
+    def _write_batch(self, rows):
+        entries = [{'intake_key': key, 'user_id': user_id, 'cart_id': cart_id,
+                    'payment_method': method, 'cart': json.loads(cart)}
+                   for _, key, user_id, cart_id, method, cart, _ in rows]
+        started = time.perf_counter()
+        conn = error = None
+        try:
+            conn = self.engine.acquire()
+            results = place_order_batch(conn, entries)
+        except Exception as e:
+            error = e
+            # Nothing was committed: retry the batch, giving up on rows that keep failing
+            self._finish([("failed", None, str(e), intake_id) if attempts >= self.max_attempts
+                          else ("queued", None, str(e), intake_id)
+                          for intake_id, _, _, _, _, _, attempts in rows])
+            with self._lock:
+                self._stats["retried_batches"] += 1
+                self._stats["failed"] += sum(1 for row in rows if row[6] >= self.max_attempts)
+            time.sleep(min(0.05 * 2 ** min(row[6] for row in rows), 5))
+            return
+        finally:
+            if conn is not None:
+                self.engine.release(conn, error=error)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        updates = []
+        for intake_id, key, *_ in rows:
+            order_id, error = results[key]
+            updates.append(("placed" if order_id else "failed", order_id, error, intake_id))
+        self._finish(updates)
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["batch_rows_total"] += len(rows)
+            self._stats["batch_ms_total"] += elapsed_ms
+            self._stats["placed"] += sum(1 for update in updates if update[0] == "placed")
+            self._stats["failed"] += sum(1 for update in updates if update[0] == "failed")
+
+    def recent(self, user_id, limit=10):
+        """The user's latest checkouts still queued, or recently placed/failed."""
+        with self._lock:
+            return self._db.execute("""
+                SELECT intake_id, created_at, total_amt, payment_method, status, order_id, error
+                FROM intake WHERE user_id=? AND (status != 'placed' OR updated_at > ?)
+                ORDER BY intake_id DESC LIMIT ?
+            """, (user_id, time.time() - 600, limit)).fetchall()
+
+    def stats(self):
+        with self._lock:
+            depth = dict(self._db.execute("SELECT status, COUNT(*) FROM intake GROUP BY status").fetchall())
+            stats = dict(self._stats)
+        stats["queued"] = depth.get("queued", 0) + depth.get("processing", 0)
+        stats["avg_batch"] = stats["batch_rows_total"] / stats["batches"] if stats["batches"] else 0.0
+        stats["avg_batch_ms"] = stats["batch_ms_total"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
+
+@st.cache_resource
+def get_order_queue():
+    """The process-wide order queue, or None when async checkout is off."""
+    config = dict(ORDER_QUEUE_CONFIG)
+    if not config.pop("enabled"):
+        return None
+    return OrderQueue(get_engine(), **config)
 
 # -------------------- CREATE MISSING TABLES --------------------
 def create_missing_tables():
@@ -113,6 +1698,7 @@ def create_missing_tables():
         return False
     
     cur = conn.cursor()
+    error = None
     try:
         cur.execute("""
             CREATE TABLE IF NOT EXISTS orderitem (
@@ -128,11 +1714,223 @@ def create_missing_tables():
         conn.commit()
         return True
     except mysql.connector.Error as e:
+        error = e
         st.error(f"Error creating table: {e}")
         return False
     finally:
         cur.close()
-        conn.close()
+        release_db(conn, error)
+
+# -------------------- AUTHENTICATION --------------------
+# Threads that hash and verify passwords; the script thread only waits on them
+AUTH_WORKERS = 4
+
+# Start page after signing in, and the user_data key holding the principal id
+ROLE_HOME = {"admin": "admin_dashboard", "partner": "partner_orders", "user": "user_restaurants"}
+PRINCIPAL_KEYS = {"admin": None, "partner": "partner_id", "user": "user_id"}
+SESSION_COOKIE = "foodapp_session"
+
+@st.cache_resource
+def get_auth_executor():
+    return ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="auth")
+
+@st.cache_resource
+def get_session_cache():
+    return SessionCache(max_age=AUTH_CONFIG["principal_ttl"])
+
+def run_hash(fn, *args):
+    """Run a hashing call on the auth pool (PBKDF2 releases the GIL)."""
+    return get_auth_executor().submit(fn, *args).result()
+
+def load_principal(role, principal_id):
+    """user_data of a signed-in principal, by primary key."""
+    if role == "admin":
+        return {"name": "Admin"}
+    query, columns = PRINCIPAL_QUERIES[role]
+    row = fetch_one(query, (principal_id,))
+    return dict(zip(columns, row)) if row else None
+
+def store_credentials(role, principal_id, logins, password):
+    password_hash = run_hash(hash_password, password)
+    logins = [login for login in dict.fromkeys(logins) if login]
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(logins))
+    return execute(f"""
+        INSERT INTO credentials (role, login, principal_id, password_hash) VALUES {values}
+        ON DUPLICATE KEY UPDATE password_hash = VALUES(password_hash)
+    """, [value for login in logins for value in (role, login, principal_id, password_hash)])
+
+def authenticate(role, login, password):
+    """user_data for a valid login, else None.
+
+    Credentials are looked up by (role, login) and verified on the auth pool.
+    Accounts that have none yet fall back to the legacy phone check once.
+    """
+    _, candidates = fetch_all(CREDENTIAL_QUERY, (role, login))
+    for principal_id, password_hash in candidates:
+        if run_hash(verify_password, password, password_hash):
+            user_data = load_principal(role, principal_id)
+            if user_data and needs_rehash(password_hash):
+                store_credentials(role, principal_id, [login], password)
+            return user_data
+    if not candidates:
+        # Unknown logins cost as much as wrong passwords
+        run_hash(verify_password, password, DUMMY_HASH)
+    
+    if role not in LEGACY_LOGIN_QUERIES:
+        return None
+    query, params = LEGACY_LOGIN_QUERIES[role]
+    row = fetch_one(query, params(login, password))
+    if not row:
+        return None
+    user_data = dict(zip(PRINCIPAL_QUERIES[role][1], row))
+    logins = [user_data.get("email"), user_data["name"]]
+    store_credentials(role, row[0], logins, password)
+    return user_data
+
+def start_session(role, user_data, token):
+    st.session_state.logged_in = True
+    st.session_state.user_role = role
+    st.session_state.user_data = user_data
+    st.session_state.page = ROLE_HOME[role]
+    st.session_state.session_token = token
+
+def sign_in(role, user_data):
+    """Start a session and hand the browser a signed token for later page loads."""
+    key = PRINCIPAL_KEYS[role]
+    principal_id = user_data[key] if key else 0
+    get_session_cache().put(role, principal_id, user_data)
+    start_session(role, user_data, issue_token(role, principal_id))
+
+def restore_session():
+    """Sign a fresh browser session back in from its session cookie.
+
+    The token signature is checked in memory; only a principal missing from
+    the session cache (e.g. after a restart) or cached for longer than
+    principal_ttl costs one primary-key read; a deleted account is not restored.
+    """
+    # Once per browser session: the cookies are those sent when the page loaded
+    if st.session_state.get("cookie_checked"):
+        return
+    st.session_state.cookie_checked = True
+    st.query_params.pop("session", None)   # tokens used to ride in the URL
+    token = st.context.cookies.get(SESSION_COOKIE)
+    if st.session_state.logged_in or not token:
+        return
+    cache = get_session_cache()
+    claims, user_data = cache.resolve(token)
+    if claims and user_data is None:
+        user_data = load_principal(claims["r"], claims["p"])
+        if user_data:
+            cache.put(claims["r"], claims["p"], user_data)
+    if claims and user_data:
+        start_session(claims["r"], user_data, token)
+
+def sync_session_cookie():
+    """Write the browser cookie when this session's token changed; call at the end of a run.
+
+    The token rides in a cookie rather than the URL, so it stays out of browser
+    history, access logs and shared links. Streamlit can only read cookies, so
+    a zero-height component script writes it; it is written only from a run
+    that completes, because st.rerun() would drop it before it reached the browser.
+    """
+    token = st.session_state.get("session_token")
+    if token == st.session_state.get("cookie_token", st.context.cookies.get(SESSION_COOKIE)):
+        return
+    value, max_age = (token, AUTH_CONFIG["token_ttl"]) if token else ("", 0)
+    components.html(f"""<script>
+        window.parent.document.cookie = "{SESSION_COOKIE}={value}; path=/; max-age={max_age}; SameSite=Strict"
+            + (window.parent.location.protocol === "https:" ? "; Secure" : "");
+    </script>""", height=0)
+    st.session_state.cookie_token = token
+
+def sign_out():
+    """Revoke this session's token and return to the login screen."""
+    token = st.session_state.pop("session_token", None)
+    if token:
+        get_session_cache().revoke(token)
+    st.session_state.logged_in = False
+    st.session_state.user_role = None
+    st.session_state.user_data = {}
+    st.session_state.page = "login"
+
+# -------------------- CART --------------------
+class Cart:
+    """A session's cart: lines keyed by item_id plus a running total and unit count.
+
+    Lookups, adds and removes are O(1) and keep total/count current, so menu
+    rows and the sidebar never rescan the cart. Prices are kept in paise so
+    the running total doesn't drift. Pickles as [[item_id, name, paise, qty], ...].
+    """
+
+    __slots__ = ("_lines", "_total_paise", "count")
+
+    def __init__(self, state=None):
+        self._lines = {}          # item_id -> [name, price in paise, quantity], in order added
+        self._total_paise = 0
+        self.count = 0
+        for item_id, name, paise, quantity in state or ():
+            self._put(item_id, name, paise, quantity)
+
+    def _put(self, item_id, name, paise, quantity):
+        line = self._lines.get(item_id)
+        if line is None:
+            line = self._lines[item_id] = [name, paise, 0]
+        line[2] += quantity
+        self._total_paise += paise * quantity
+        self.count += quantity
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __bool__(self):
+        return bool(self._lines)
+
+    def __contains__(self, item_id):
+        return item_id in self._lines
+
+    @property
+    def total(self):
+        return self._total_paise / 100
+
+    def quantity(self, item_id):
+        line = self._lines.get(item_id)
+        return line[2] if line else 0
+
+    def add(self, item_id, name, price, quantity=1):
+        self._put(item_id, name, round(float(price) * 100), quantity)
+
+    def remove(self, item_id, quantity=None):
+        """Take quantity units of an item out (the whole line when None or when it runs out)."""
+        line = self._lines.get(item_id)
+        if line is None:
+            return
+        if quantity is None or quantity >= line[2]:
+            quantity = line[2]
+            del self._lines[item_id]
+        else:
+            line[2] -= quantity
+        self._total_paise -= line[1] * quantity
+        self.count -= quantity
+
+    def clear(self):
+        self._lines.clear()
+        self._total_paise = 0
+        self.count = 0
+
+    def items(self):
+        """(item_id, name, price, quantity) per line, in the order they were added."""
+        return [(item_id, name, paise / 100, quantity) for item_id, (name, paise, quantity) in self._lines.items()]
+
+    def lines(self):
+        """The cart as the list of line dicts that place_order and the order queue take."""
+        return [{'item_id': item_id, 'name': name, 'price': price, 'quantity': quantity}
+                for item_id, name, price, quantity in self.items()]
+
+    def __getstate__(self):
+        return [[item_id, name, paise, quantity] for item_id, (name, paise, quantity) in self._lines.items()]
+
+    def __setstate__(self, state):
+        self.__init__(state)
 
 # -------------------- SESSION STATE MANAGEMENT --------------------
 def init_session_state():
@@ -143,7 +1941,9 @@ def init_session_state():
     if 'user_data' not in st.session_state:
         st.session_state.user_data = {}
     if 'cart' not in st.session_state:
-        st.session_state.cart = []
+        st.session_state.cart = Cart()
+    if 'cart_id' not in st.session_state:
+        st.session_state.cart_id = uuid.uuid4().hex   # owner of this session's stock holds
     if 'current_restaurant' not in st.session_state:
         st.session_state.current_restaurant = None
     if 'page' not in st.session_state:
@@ -159,6 +1959,94 @@ def init_session_state():
     if 'edit_menuitem_id' not in st.session_state:
         st.session_state.edit_menuitem_id = None
 
+def notify(message, icon="✅"):
+    """Queue a toast; it is shown on the next run, so it survives st.rerun()."""
+    st.session_state.setdefault('toasts', []).append((message, icon))
+
+def show_toasts():
+    for message, icon in st.session_state.pop('toasts', []):
+        st.toast(message, icon=icon)
+
+def rerun_fragment():
+    """Rerun only the calling fragment; the whole app if it is rendering as part of a full run."""
+    try:
+        st.rerun(scope="fragment")
+    except StreamlitAPIException:
+        st.rerun()
+
+# -------------------- PAGINATED GRIDS --------------------
+GRID_PAGE_SIZE = 50
+
+def grid_row_count(grid, ttl=30):
+    row = fetch_one(GRID_COUNT_QUERIES[grid], ttl=ttl)
+    return row[0] if row else 0
+
+def like_prefix(text):
+    """LIKE pattern matching values that start with text (index-friendly)."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+def show_paginated_grid(key, select_sql, from_sql, sort_keys, filters=(), total_rows=None,
+                        descending=True, page_size=GRID_PAGE_SIZE, export_name=None):
+    """Render one page of a query as a dataframe with Prev/Next keyset navigation.
+
+    sort_keys is a list of (sql_expr, result_column) pairs, most significant
+    first, ending in a unique column so the ordering is total. filters is a
+    list of (sql_condition, params) pushed into the WHERE clause. When
+    total_rows is None the filtered row count is computed (and cached).
+    export_name adds a CSV download of every filtered row, streamed on click.
+    """
+    conditions = [condition for condition, _ in filters]
+    params = [param for _, condition_params in filters for param in condition_params]
+    where_all = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
+    # Filters changed -> back to the first page
+    state = st.session_state.setdefault(f"{key}_grid", {"signature": None, "cursors": [None]})
+    signature = (tuple(conditions), tuple(params))
+    if state["signature"] != signature:
+        state["signature"] = signature
+        state["cursors"] = [None]
+    
+    page_sql, page_params = grid_page_query(select_sql, from_sql, sort_keys, conditions, params,
+                                            state["cursors"][-1], descending)
+    cols, rows = fetch_all(page_sql, page_params + (page_size + 1,))
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+    
+    if total_rows is None:
+        row = fetch_one(f"SELECT COUNT(*) {from_sql} {where_all}", tuple(params), ttl=30)
+        total_rows = row[0] if row else 0
+    page_count = max(1, math.ceil(total_rows / page_size))
+    page_no = len(state["cursors"])
+    
+    if rows:
+        df = pd.DataFrame(rows, columns=cols)
+        st.dataframe(df, use_container_width=True)
+    else:
+        st.info("No records found")
+    
+    col1, col2, col3 = st.columns([1, 3, 1])
+    with col1:
+        if st.button("◀ Prev", key=f"{key}_prev", disabled=page_no == 1):
+            state["cursors"].pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {page_no} of {page_count} · {total_rows} records")
+    with col3:
+        if st.button("Next ▶", key=f"{key}_next", disabled=not has_next):
+            positions = [cols.index(column) for _, column in sort_keys]
+            state["cursors"].append(tuple(rows[-1][pos] for pos in positions))
+            st.rerun()
+    
+    if export_name and rows:
+        # Runs on click in a separate thread: rows go cursor -> temp file, never a full DataFrame
+        export_sql = f"{select_sql} {from_sql} {where_all} ORDER BY {order_by_clause(sort_keys, descending)}"
+        st.download_button(f"⬇️ Download CSV ({total_rows} rows)",
+                           data=lambda: export_csv(export_sql, tuple(params)),
+                           file_name=f"{export_name}.csv", mime="text/csv",
+                           key=f"{key}_csv", on_click="ignore")
+    
+    return cols, rows
+
 # -------------------- STYLING --------------------
 def apply_custom_styles():
     st.markdown("""
@@ -219,50 +2107,16 @@ def show_login_screen():
             else:
                 role_key = "user"
             
-            if role_key == "admin":
-                if (username == "admin" and password == "admin123") or username == "admin@foodapp.com":
-                    st.session_state.logged_in = True
-                    st.session_state.user_role = "admin"
-                    st.session_state.user_data = {"name": "Admin"}
-                    st.session_state.page = "admin_dashboard"
-                    st.rerun()
-                else:
-                    st.error("Invalid admin credentials")
-            
+            user_data = authenticate(role_key, username, password)
+            if user_data:
+                sign_in(role_key, user_data)
+                st.rerun()
+            elif role_key == "admin":
+                st.error("Invalid admin credentials")
             elif role_key == "partner":
-                # FIXED: delivery partner login correct
-                row = fetch_one("SELECT partner_id, name, phone FROM deliverypartner WHERE name=%s AND phone=%s", 
-                              (username, password))
-                if row:
-                    st.session_state.logged_in = True
-                    st.session_state.user_role = "partner"
-                    st.session_state.user_data = {
-                        "partner_id": row[0], 
-                        "name": row[1], 
-                        "phone": row[2]
-                    }
-                    st.session_state.page = "partner_orders"
-                    st.rerun()
-                else:
-                    st.error("Delivery partner not found. Use partner name as username and phone as password.")
-            
-            else:  # user
-                row = fetch_one("SELECT user_id, name, email, phone, address FROM user WHERE (email=%s OR name=%s) AND phone=%s", 
-                              (username, username, password))
-                if row:
-                    st.session_state.logged_in = True
-                    st.session_state.user_role = "user"
-                    st.session_state.user_data = {
-                        "user_id": row[0], 
-                        "name": row[1], 
-                        "email": row[2], 
-                        "phone": row[3],
-                        "address": row[4]
-                    }
-                    st.session_state.page = "user_restaurants"
-                    st.rerun()
-                else:
-                    st.error("User not found or wrong phone")
+                st.error("Delivery partner not found. Use partner name as username and phone as password.")
+            else:
+                st.error("User not found or wrong phone")
     
     st.markdown("---")
     st.markdown("### 📝 Don't have an account?")
@@ -295,8 +2149,7 @@ def show_login_screen():
                 # Insert new user
                 if execute("INSERT INTO user (name, email, phone, address) VALUES (%s, %s, %s, %s)",
                           (name, email, phone, address or None)):
-                    st.success("Account created successfully! You can now login.")
-                    time.sleep(2)
+                    notify("Account created successfully! You can now login.")
                     st.rerun()
                 else:
                     st.error("Failed to create account")
@@ -314,10 +2167,8 @@ def show_partner_panel():
     st.sidebar.markdown(f"### 🚚 {st.session_state.user_data['name']}")
     
     if st.sidebar.button("🚪 Logout"):
-        st.session_state.logged_in = False
-        st.session_state.user_role = None
-        st.session_state.user_data = {}
-        st.session_state.page = "login"
+        sign_out()
+        st.session_state.pop("partner_feed", None)
         st.rerun()
     
     # Partner navigation
@@ -334,126 +2185,191 @@ def show_partner_panel():
     elif st.session_state.page == "partner_stats":
         show_partner_stats()
 
+# poll_every: auto-refresh interval in seconds
+# max_events: past this many new events a full reload is cheaper than the delta
+# event_overlap: change-log ids re-read below the feed's position, for order
+#                transactions that committed after a later event id was applied
+# max_idle: a feed not polled for this many seconds is reloaded, since
+#           archive.py prunes old change-log rows (keep its retention longer)
+PARTNER_FEED_CONFIG = {"poll_every": 10, "max_events": 500, "event_overlap": 200, "max_idle": 3600}
+
+STATUS_RANK = {'Placed': 1, 'Out for Delivery': 2, 'Delivered': 3}
+
+def load_partner_feed(partner_id):
+    """Full load of a partner's orders into the session feed."""
+    # Read the log head first: events racing the load are re-applied, never lost
+    head = fetch_one(PARTNER_FEED_HEAD_QUERY)
+    cols, rows = fetch_all(PARTNER_ORDERS_QUERY, (partner_id,))
+    if head is None or not cols:
+        return None
+    st.session_state.partner_feed = {
+        "partner_id": partner_id,
+        "last_event_id": head[0],
+        "polled_at": time.monotonic(),
+        "orders": {row[0]: row for row in rows}
+    }
+    return st.session_state.partner_feed
+
+def poll_partner_feed():
+    """Apply order_events after the feed's last event id; returns the number of orders changed."""
+    partner_id = st.session_state.user_data['partner_id']
+    feed = st.session_state.get("partner_feed")
+    if (not feed or feed["partner_id"] != partner_id
+            or time.monotonic() - feed.get("polled_at", 0) > PARTNER_FEED_CONFIG["max_idle"]):
+        feed = load_partner_feed(partner_id)
+        return len(feed["orders"]) if feed else 0
+    
+    limit = PARTNER_FEED_CONFIG["max_events"]
+    cols, events = fetch_all(PARTNER_FEED_EVENTS_QUERY, (
+        partner_id, max(0, feed["last_event_id"] - PARTNER_FEED_CONFIG["event_overlap"]), limit + 1
+    ))
+    if cols:
+        feed["polled_at"] = time.monotonic()
+    if not events:
+        return 0
+    if len(events) > limit:
+        load_partner_feed(partner_id)
+        return len(events)
+    
+    order_ids = sorted({order_id for _, order_id in events})
+    placeholders = ", ".join(["%s"] * len(order_ids))
+    cols, rows = fetch_all(
+        PARTNER_FEED_ORDERS_QUERY.format(ids=placeholders),
+        (*order_ids, partner_id)
+    )
+    if not cols:
+        return 0
+    
+    # An order missing from the re-read was reassigned away (or deleted)
+    fresh = {row[0]: row for row in rows}
+    changed = 0
+    for order_id in order_ids:
+        row = fresh.get(order_id)
+        if feed["orders"].get(order_id) != row:
+            changed += 1
+            if row:
+                feed["orders"][order_id] = row
+            else:
+                feed["orders"].pop(order_id, None)
+    feed["last_event_id"] = max(feed["last_event_id"], events[-1][0])
+    return changed
+
+def sorted_partner_orders(orders):
+    """Active orders first, newest first within each status."""
+    rows = sorted(orders.values(), key=lambda row: row[8], reverse=True)
+    return sorted(rows, key=lambda row: STATUS_RANK.get(row[4], 4))
+
+@st.fragment(run_every=PARTNER_FEED_CONFIG["poll_every"])
+def partner_feed_poller():
+    """Polls the change log on a timer; reruns the page only when an order changed."""
+    if poll_partner_feed():
+        st.rerun()
+    st.caption(f"Last checked {datetime.now().strftime('%H:%M:%S')}")
+
 def show_partner_orders():
     st.title("📦 My Assigned Orders")
     
-    # Refresh button
-    if st.button("🔄 Refresh"):
-        st.rerun()
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        refresh = st.button("🔄 Refresh")
+    with col2:
+        auto = st.toggle("Auto-refresh", key="partner_feed_auto",
+                         help=f"Check for changes every {PARTNER_FEED_CONFIG['poll_every']}s")
     
-    # Get orders assigned to this partner
-    cols, rows = fetch_all("""
-        SELECT o.order_id, u.name as customer, u.address, o.total_amt, o.status, 
-               p.status as payment_status, p.pay_id, p.method as payment_method
-        FROM orders o 
-        JOIN user u ON o.user_id = u.user_id
-        LEFT JOIN payment p ON o.pay_id = p.pay_id
-        WHERE o.partner_id = %s
-        ORDER BY 
-            CASE 
-                WHEN o.status = 'Placed' THEN 1
-                WHEN o.status = 'Out for Delivery' THEN 2
-                WHEN o.status = 'Delivered' THEN 3
-                ELSE 4
-            END,
-            o.order_date DESC
-    """, (st.session_state.user_data['partner_id'],))
+    feed = st.session_state.get("partner_feed")
+    if refresh or not feed or feed["partner_id"] != st.session_state.user_data['partner_id']:
+        poll_partner_feed()
+    if auto:
+        partner_feed_poller()
     
-    if not rows:
+    feed = st.session_state.get("partner_feed")
+    if not feed or not feed["orders"]:
         st.info("No orders assigned to you")
         return
     
-    for order in rows:
-        order_id, customer, address, total_amt, status, payment_status, pay_id, payment_method = order
+    for order in sorted_partner_orders(feed["orders"]):
+        show_partner_order_row(order[0])
+
+@st.fragment
+@timed_run("fragment: partner order row")
+def show_partner_order_row(order_id):
+    """One order card; its buttons rerun only this card and pull only the feed's delta."""
+    show_toasts()
+    order = st.session_state.partner_feed["orders"].get(order_id)
+    if not order:
+        return
+    order_id, customer, address, total_amt, status, payment_status, pay_id, payment_method, _ = order
+    
+    def done(message):
+        poll_partner_feed()
+        notify(message)
+        rerun_fragment()
+    
+    with st.container():
+        col1, col2 = st.columns([3, 1])
         
-        with st.container():
-            col1, col2 = st.columns([3, 1])
+        with col1:
+            st.subheader(f"Order #{order_id}")
+            st.write(f"**Customer:** {customer}")
+            st.write(f"**Address:** {address}")
+            st.write(f"**Amount:** ₹{total_amt:.2f}")
             
-            with col1:
-                st.subheader(f"Order #{order_id}")
-                st.write(f"**Customer:** {customer}")
-                st.write(f"**Address:** {address}")
-                st.write(f"**Amount:** ₹{total_amt:.2f}")
-                
-                status_color = "🟢" if status == 'Delivered' else "🟡" if status == 'Out for Delivery' else "🔵"
-                st.write(f"**Status:** {status_color} {status}")
-                
-                payment_color = "🟢" if payment_status == 'Paid' else "🔴"
-                st.write(f"**Payment:** {payment_color} {payment_status} ({payment_method})")
+            status_color = "🟢" if status == 'Delivered' else "🟡" if status == 'Out for Delivery' else "🔵"
+            st.write(f"**Status:** {status_color} {status}")
             
-            with col2:
-                if status == 'Placed':
-                    if st.button(f"🚚 Start Delivery", key=f"start_{order_id}"):
-                        if call_proc("UpdateOrderStatus", [order_id, 'Out for Delivery', 'Pending']):
-                            st.success(f"Started delivery for order #{order_id}")
-                            time.sleep(2)
-                            st.rerun()
+            payment_color = "🟢" if payment_status == 'Paid' else "🔴"
+            st.write(f"**Payment:** {payment_color} {payment_status} ({payment_method})")
+        
+        with col2:
+            if status == 'Placed':
+                if st.button(f"🚚 Start Delivery", key=f"start_{order_id}"):
+                    if call_proc("UpdateOrderStatus", [order_id, 'Out for Delivery', 'Pending']):
+                        done(f"Started delivery for order #{order_id}")
+                    else:
+                        st.error("Failed to update order status")
+            
+            elif status == 'Out for Delivery':
+                if payment_method == 'COD' and payment_status == 'Pending':
+                    if st.button(f"💰 Collect COD", key=f"cod_{order_id}"):
+                        if execute("UPDATE payment SET status='Paid' WHERE pay_id=%s", (pay_id,)):
+                            done(f"COD payment collected for order #{order_id}")
                         else:
-                            st.error("Failed to update order status")
+                            st.error("Failed to update payment status")
                 
-                elif status == 'Out for Delivery':
-                    if payment_method == 'COD' and payment_status == 'Pending':
-                        if st.button(f"💰 Collect COD", key=f"cod_{order_id}"):
-                            if execute("UPDATE payment SET status='Paid' WHERE pay_id=%s", (pay_id,)):
-                                st.success(f"COD payment collected for order #{order_id}")
-                                time.sleep(2)
-                                st.rerun()
-                            else:
-                                st.error("Failed to update payment status")
-                    
-                    if st.button(f"✅ Mark Delivered", key=f"deliver_{order_id}"):
-                        payment_status = 'Paid' if payment_method != 'COD' else 'Pending'
-                        if call_proc("UpdateOrderStatus", [order_id, 'Delivered', payment_status]):
-                            st.success(f"Order #{order_id} marked as delivered!")
-                            time.sleep(2)
-                            st.rerun()
-                        else:
-                            st.error("Failed to update order status")
-            
-            st.markdown("---")
+                if st.button(f"✅ Mark Delivered", key=f"deliver_{order_id}"):
+                    payment_status = 'Paid' if payment_method != 'COD' else 'Pending'
+                    if call_proc("UpdateOrderStatus", [order_id, 'Delivered', payment_status]):
+                        done(f"Order #{order_id} marked as delivered!")
+                    else:
+                        st.error("Failed to update order status")
+        
+        st.markdown("---")
 
 def show_partner_stats():
     st.title("📊 My Delivery Statistics")
     
     partner_id = st.session_state.user_data['partner_id']
     
-    # Get partner statistics
-    cols, rows = fetch_all("""
-        SELECT 
-            COUNT(o.order_id) as total_deliveries,
-            SUM(CASE WHEN o.status = 'Delivered' THEN 1 ELSE 0 END) as successful_deliveries,
-            AVG(o.total_amt) as avg_order_value,
-            SUM(o.total_amt) as total_delivery_value
-        FROM deliverypartner dp
-        LEFT JOIN orders o ON dp.partner_id = o.partner_id
-        WHERE dp.partner_id = %s
-        GROUP BY dp.partner_id
-    """, (partner_id,))
+    cols, rows = fetch_all(PARTNER_STATS_QUERY, (partner_id,))
     
-    if rows:
-        total_deliveries, successful, avg_value, total_value = rows[0]
-        
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Total Deliveries", total_deliveries or 0)
-        with col2:
-            st.metric("Successful Deliveries", successful or 0)
-        with col3:
-            st.metric("Avg Order Value", f"₹{avg_value or 0:.2f}")
-        with col4:
-            st.metric("Total Value", f"₹{total_value or 0:.2f}")
+    total_deliveries, successful, avg_value, total_value, last_delivery = rows[0] if rows else (0, 0, 0, 0, None)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Total Deliveries", total_deliveries or 0)
+    with col2:
+        st.metric("Successful Deliveries", successful or 0)
+    with col3:
+        st.metric("Avg Order Value", f"₹{avg_value or 0:.2f}")
+    with col4:
+        st.metric("Total Value", f"₹{total_value or 0:.2f}")
+    if last_delivery:
+        st.caption(f"Last delivery: {last_delivery}")
     
     # Recent deliveries
     st.subheader("Recent Deliveries")
-    cols, rows = fetch_all("""
-        SELECT o.order_id, u.name as customer, o.total_amt, o.status, o.order_date
-        FROM orders o 
-        JOIN user u ON o.user_id = u.user_id
-        WHERE o.partner_id = %s
-        ORDER BY o.order_date DESC
-        LIMIT 10
-    """, (partner_id,))
+    cols, rows = fetch_all(PARTNER_RECENT_DELIVERIES_QUERY, (partner_id, partner_id))
     
     if rows:
         df = pd.DataFrame(rows, columns=cols)
@@ -466,10 +2382,7 @@ def show_admin_panel():
     st.sidebar.markdown("### 👨‍💼 Admin Dashboard")
     
     if st.sidebar.button("🚪 Logout"):
-        st.session_state.logged_in = False
-        st.session_state.user_role = None
-        st.session_state.user_data = {}
-        st.session_state.page = "login"
+        sign_out()
         st.rerun()
     
     # Admin navigation
@@ -481,7 +2394,8 @@ def show_admin_panel():
         "🚚 Partners": "admin_partners",
         "💳 Payments": "admin_payments",
         "👥 Users": "admin_users",
-        "🔍 Analytics": "admin_analytics"
+        "🔍 Analytics": "admin_analytics",
+        "⚡ Performance": "admin_performance"
     }
     
     selected_page = st.sidebar.radio("Admin Menu", list(admin_pages.keys()))
@@ -504,17 +2418,20 @@ def show_admin_panel():
         show_admin_users()
     elif st.session_state.page == "admin_analytics":
         show_admin_analytics()
+    elif st.session_state.page == "admin_performance":
+        show_admin_performance()
 
 def show_admin_dashboard():
     st.title("📊 Admin Dashboard")
     
-    # Get stats
-    total_orders = fetch_one("SELECT COUNT(*) FROM orders")[0] or 0
-    total_users = fetch_one("SELECT COUNT(*) FROM user")[0] or 0
-    total_restaurants = fetch_one("SELECT COUNT(*) FROM restaurant")[0] or 0
-    total_partners = fetch_one("SELECT COUNT(*) FROM deliverypartner")[0] or 0
-    revenue = fetch_one("SELECT COALESCE(SUM(total_amt), 0) FROM orders WHERE status='Delivered'")[0] or 0
-    avg_rating = fetch_one("SELECT avg_restaurant_rating()")[0] or 0
+    # Get stats (single round trip)
+    kpi = fetch_kpi_snapshot()
+    total_orders = kpi['total_orders']
+    total_users = kpi['total_users']
+    total_restaurants = kpi['total_restaurants']
+    total_partners = kpi['total_partners']
+    revenue = kpi['revenue']
+    avg_rating = kpi['avg_rating']
     
     # Display metrics
     col1, col2, col3 = st.columns(3)
@@ -535,64 +2452,101 @@ def show_admin_dashboard():
     
     # Recent orders
     st.subheader("Recent Orders")
-    cols, rows = fetch_all("""
-        SELECT o.order_id, u.name as customer, o.total_amt, o.status, o.order_date
-        FROM orders o 
-        JOIN user u ON o.user_id = u.user_id
-        ORDER BY o.order_date DESC 
-        LIMIT 10
-    """)
+    cols, rows = fetch_all(ADMIN_RECENT_ORDERS_QUERY)
     
     if rows:
         df = pd.DataFrame(rows, columns=cols)
         st.dataframe(df, use_container_width=True)
 
+ORDER_STATUSES = ["Placed", "Out for Delivery", "Delivered", "Cancelled"]
+
+@st.fragment
+@timed_run("fragment: order status form")
+def show_order_status_form():
+    """Look an order up by id and change its status without rerunning the order grid."""
+    show_toasts()
+    # Status update looks the order up by id instead of listing every order
+    st.subheader("Update Order Status")
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        order_id = st.number_input("Order ID", min_value=1, step=1, value=None)
+    
+    current = fetch_one("SELECT status FROM orders WHERE order_id=%s", (order_id,)) if order_id else None
+    
+    with col2:
+        new_status = st.selectbox("New Status", ORDER_STATUSES)
+        if order_id and current:
+            st.caption(f"Current status: {current[0]}")
+        elif order_id:
+            st.caption("Order not found")
+    
+    with col3:
+        if st.button("Update Status", disabled=not current):
+            payment_status = 'Paid' if new_status == 'Delivered' else 'Pending'
+            if call_proc("UpdateOrderStatus", [order_id, new_status, payment_status]):
+                notify(f"Order {order_id} status updated to {new_status}")
+                rerun_fragment()
+            else:
+                st.error("Failed to update order status")
+
 def show_admin_orders():
     st.title("📦 Order Management")
     
     if st.button("🔄 Refresh"):
         st.rerun()
     
-    cols, rows = fetch_all("""
-        SELECT o.order_id, u.name as customer, o.total_amt, o.status, 
-               o.order_date, dp.name as delivery_partner, p.status as payment_status
-        FROM orders o 
-        LEFT JOIN user u ON o.user_id = u.user_id
-        LEFT JOIN deliverypartner dp ON o.partner_id = dp.partner_id
-        LEFT JOIN payment p ON o.pay_id = p.pay_id
-        ORDER BY o.order_date DESC
-    """)
+    show_order_status_form()
+    
+    st.subheader("Orders")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        status_filter = st.selectbox("Status", ["All"] + ORDER_STATUSES)
+    with col2:
+        date_range = st.date_input("Order date range", value=())
+    with col3:
+        customer = st.text_input("Customer (id, email or name prefix)").strip()
+    
+    filters = []
+    if status_filter != "All":
+        filters.append(("o.status = %s", (status_filter,)))
+    if len(date_range) == 2:
+        start, end = date_range
+        filters.append(("o.order_date >= %s AND o.order_date < %s", (start, end + timedelta(days=1))))
+    if customer:
+        if customer.isdigit():
+            filters.append(("o.user_id = %s", (int(customer),)))
+        elif "@" in customer:
+            filters.append(("u.email = %s", (customer,)))
+        else:
+            filters.append(("u.name LIKE %s", (like_prefix(customer),)))
+    
+    show_paginated_grid(
+        "admin_orders",
+        **ADMIN_ORDERS_GRID,
+        filters=filters,
+        total_rows=None if filters else grid_row_count("orders"),
+        export_name="orders"
+    )
+
+def show_admin_restaurants():
+    st.title("🏪 Restaurant Management")
+    
+    show_add_restaurant_form()
+    
+    cols, rows = fetch_all("SELECT rest_id, name, address, rating FROM restaurant ORDER BY rest_id", ttl=60)
     
     if rows:
         df = pd.DataFrame(rows, columns=cols)
-        
-        # Add status update functionality
-        st.subheader("Update Order Status")
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            order_id = st.selectbox("Select Order", df['order_id'].tolist())
-        
-        with col2:
-            new_status = st.selectbox("New Status", ["Placed", "Out for Delivery", "Delivered", "Cancelled"])
-        
-        with col3:
-            if st.button("Update Status"):
-                payment_status = 'Paid' if new_status == 'Delivered' else 'Pending'
-                if call_proc("UpdateOrderStatus", [order_id, new_status, payment_status]):
-                    st.success(f"Order {order_id} status updated to {new_status}")
-                    time.sleep(2)
-                    st.rerun()
-                else:
-                    st.error("Failed to update order status")
-        
         st.dataframe(df, use_container_width=True)
+        show_edit_restaurant_form(df)
     else:
-        st.info("No orders found")
+        st.info("No restaurants found")
 
-def show_admin_restaurants():
-    st.title("🏪 Restaurant Management")
-    
+@st.fragment
+@timed_run("fragment: add restaurant form")
+def show_add_restaurant_form():
+    show_toasts()
     col1, col2 = st.columns([3, 1])
     
     with col2:
@@ -611,48 +2565,58 @@ def show_admin_restaurants():
                     if name:
                         execute("INSERT INTO restaurant (name, address, rating) VALUES (%s, %s, %s)",
                                (name, address, rating))
-                        st.success("Restaurant added successfully")
+                        get_catalog().bump()
+                        notify("Restaurant added successfully")
                         st.session_state.show_add_restaurant = False
-                        time.sleep(2)
-                        st.rerun()
+                        st.rerun()   # the whole page: the list below gains a row
                     else:
                         st.error("Name is required")
             with col2:
                 if st.form_submit_button("❌ Cancel"):
                     st.session_state.show_add_restaurant = False
-                    st.rerun()
+                    rerun_fragment()
+
+@st.fragment
+@timed_run("fragment: edit restaurant form")
+def show_edit_restaurant_form(df):
+    show_toasts()
+    st.subheader("Edit Restaurant")
+    edit_rest_id = st.selectbox("Select Restaurant to Edit", df['rest_id'].tolist())
+    
+    if edit_rest_id:
+        rest_data = df[df['rest_id'] == edit_rest_id].iloc[0]
+        
+        with st.form("edit_restaurant_form"):
+            edit_name = st.text_input("Name", value=rest_data['name'])
+            edit_address = st.text_area("Address", value=rest_data['address'] or "")
+            edit_rating = st.number_input("Rating", value=float(rest_data['rating'] or 4.0), 
+                                        min_value=0.0, max_value=5.0, step=0.1)
+            
+            if st.form_submit_button("💾 Update Restaurant"):
+                execute("UPDATE restaurant SET name=%s, address=%s, rating=%s WHERE rest_id=%s",
+                       (edit_name, edit_address, edit_rating, edit_rest_id))
+                get_catalog().bump()
+                notify("Restaurant updated successfully")
+                st.rerun()   # the whole page: the list above shows the edit
+
+def show_admin_menuitems():
+    st.title("🍽️ Menu Items Management")
+    
+    show_add_menuitem_form()
     
-    cols, rows = fetch_all("SELECT rest_id, name, address, rating FROM restaurant ORDER BY rest_id")
+    cols, rows = fetch_all(ADMIN_MENU_ITEMS_QUERY, ttl=30)
     
     if rows:
         df = pd.DataFrame(rows, columns=cols)
         st.dataframe(df, use_container_width=True)
-        
-        # Edit functionality
-        st.subheader("Edit Restaurant")
-        edit_rest_id = st.selectbox("Select Restaurant to Edit", df['rest_id'].tolist())
-        
-        if edit_rest_id:
-            rest_data = df[df['rest_id'] == edit_rest_id].iloc[0]
-            
-            with st.form("edit_restaurant_form"):
-                edit_name = st.text_input("Name", value=rest_data['name'])
-                edit_address = st.text_area("Address", value=rest_data['address'] or "")
-                edit_rating = st.number_input("Rating", value=float(rest_data['rating'] or 4.0), 
-                                            min_value=0.0, max_value=5.0, step=0.1)
-                
-                if st.form_submit_button("💾 Update Restaurant"):
-                    execute("UPDATE restaurant SET name=%s, address=%s, rating=%s WHERE rest_id=%s",
-                           (edit_name, edit_address, edit_rating, edit_rest_id))
-                    st.success("Restaurant updated successfully")
-                    time.sleep(2)
-                    st.rerun()
+        show_edit_menuitem_form(rows)
     else:
-        st.info("No restaurants found")
+        st.info("No menu items found")
 
-def show_admin_menuitems():
-    st.title("🍽️ Menu Items Management")
-    
+@st.fragment
+@timed_run("fragment: add menu item form")
+def show_add_menuitem_form():
+    show_toasts()
     col1, col2 = st.columns([3, 1])
     
     with col2:
@@ -661,7 +2625,7 @@ def show_admin_menuitems():
     
     if st.session_state.get('show_add_menuitem', False):
         # Get restaurants for dropdown
-        _, restaurants = fetch_all("SELECT rest_id, name FROM restaurant ORDER BY name")
+        _, restaurants = fetch_all("SELECT rest_id, name FROM restaurant ORDER BY name", ttl=60)
         
         with st.form("add_menuitem_form"):
             name = st.text_input("Item Name")
@@ -683,10 +2647,10 @@ def show_admin_menuitems():
                         if rest_id:
                             execute("INSERT INTO menuitem (name, price, quantity, rest_id) VALUES (%s, %s, %s, %s)",
                                    (name, price, quantity, rest_id))
-                            st.success("Menu item added successfully")
+                            get_catalog().bump()
+                            notify("Menu item added successfully")
                             st.session_state.show_add_menuitem = False
-                            time.sleep(2)
-                            st.rerun()
+                            st.rerun()   # the whole page: the list below gains a row
                         else:
                             st.error("Invalid restaurant selected")
                     else:
@@ -694,66 +2658,58 @@ def show_admin_menuitems():
             with col2:
                 if st.form_submit_button("❌ Cancel"):
                     st.session_state.show_add_menuitem = False
-                    st.rerun()
-    
-    cols, rows = fetch_all("""
-        SELECT m.item_id, m.name, m.price, m.quantity, r.name as restaurant, r.rest_id
-        FROM menuitem m 
-        JOIN restaurant r ON m.rest_id = r.rest_id 
-        ORDER BY m.item_id
-    """)
-    
-    if rows:
-        df = pd.DataFrame(rows, columns=cols)
-        st.dataframe(df, use_container_width=True)
-        
-        # FIXED: PROPER MENU ITEM EDITING
-        st.subheader("Edit Menu Item")
-        
-        # Create a mapping of item_id to row data for easier access
-        menu_items_dict = {row[0]: row for row in rows}
-        item_ids = list(menu_items_dict.keys())
+                    rerun_fragment()
+
+@st.fragment
+@timed_run("fragment: edit menu item form")
+def show_edit_menuitem_form(rows):
+    show_toasts()
+    # FIXED: PROPER MENU ITEM EDITING
+    st.subheader("Edit Menu Item")
+    
+    # Create a mapping of item_id to row data for easier access
+    menu_items_dict = {row[0]: row for row in rows}
+    item_ids = list(menu_items_dict.keys())
+    
+    if item_ids:
+        selected_item_id = st.selectbox("Select Menu Item to Edit", item_ids, format_func=lambda x: f"{menu_items_dict[x][1]} - ₹{menu_items_dict[x][2]}")
         
-        if item_ids:
-            selected_item_id = st.selectbox("Select Menu Item to Edit", item_ids, format_func=lambda x: f"{menu_items_dict[x][1]} - ₹{menu_items_dict[x][2]}")
+        if selected_item_id:
+            item_data = menu_items_dict[selected_item_id]
+            _, restaurants = fetch_all("SELECT rest_id, name FROM restaurant ORDER BY name", ttl=60)
+            restaurant_options = {r[1]: r[0] for r in restaurants}
             
-            if selected_item_id:
-                item_data = menu_items_dict[selected_item_id]
-                _, restaurants = fetch_all("SELECT rest_id, name FROM restaurant ORDER BY name")
-                restaurant_options = {r[1]: r[0] for r in restaurants}
+            with st.form("edit_menuitem_form"):
+                col1, col2 = st.columns(2)
                 
-                with st.form("edit_menuitem_form"):
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        edit_name = st.text_input("Item Name", value=item_data[1])
-                        edit_price = st.number_input("Price", min_value=0.0, step=0.5, value=float(item_data[2]))
-                    
-                    with col2:
-                        edit_quantity = st.number_input("Quantity", min_value=0, value=int(item_data[3]))
-                        # Find current restaurant name
-                        current_rest_name = item_data[4]
-                        edit_restaurant = st.selectbox("Restaurant", 
-                                                     options=list(restaurant_options.keys()),
-                                                     index=list(restaurant_options.keys()).index(current_rest_name) if current_rest_name in restaurant_options else 0)
-                    
-                    if st.form_submit_button("💾 Update Menu Item"):
-                        rest_id = restaurant_options[edit_restaurant]
-                        if execute("UPDATE menuitem SET name=%s, price=%s, quantity=%s, rest_id=%s WHERE item_id=%s",
-                                 (edit_name, edit_price, edit_quantity, rest_id, selected_item_id)):
-                            st.success("Menu item updated successfully")
-                            time.sleep(2)
-                            st.rerun()
-                        else:
-                            st.error("Failed to update menu item")
-        else:
-            st.info("No menu items available for editing")
+                with col1:
+                    edit_name = st.text_input("Item Name", value=item_data[1])
+                    edit_price = st.number_input("Price", min_value=0.0, step=0.5, value=float(item_data[2]))
+                
+                with col2:
+                    edit_quantity = st.number_input("Quantity", min_value=0, value=int(item_data[3]))
+                    # Find current restaurant name
+                    current_rest_name = item_data[4]
+                    edit_restaurant = st.selectbox("Restaurant", 
+                                                 options=list(restaurant_options.keys()),
+                                                 index=list(restaurant_options.keys()).index(current_rest_name) if current_rest_name in restaurant_options else 0)
+                
+                if st.form_submit_button("💾 Update Menu Item"):
+                    rest_id = restaurant_options[edit_restaurant]
+                    if execute("UPDATE menuitem SET name=%s, price=%s, quantity=%s, rest_id=%s WHERE item_id=%s",
+                             (edit_name, edit_price, edit_quantity, rest_id, selected_item_id)):
+                        get_catalog().bump()
+                        notify("Menu item updated successfully")
+                        st.rerun()   # the whole page: the list above shows the edit
+                    else:
+                        st.error("Failed to update menu item")
     else:
-        st.info("No menu items found")
+        st.info("No menu items available for editing")
 
-def show_admin_partners():
-    st.title("🚚 Delivery Partners")
-    
+@st.fragment
+@timed_run("fragment: add partner form")
+def show_add_partner_form():
+    show_toasts()
     if st.button("➕ Add Partner"):
         st.session_state.show_add_partner = True
     
@@ -767,14 +2723,18 @@ def show_admin_partners():
                 if name and phone:
                     execute("INSERT INTO deliverypartner (name, phone, rating) VALUES (%s, %s, %s)",
                            (name, phone, rating))
-                    st.success("Delivery partner added successfully")
+                    notify("Delivery partner added successfully")
                     st.session_state.show_add_partner = False
-                    time.sleep(2)
-                    st.rerun()
+                    st.rerun()   # the whole page: the list below gains a row
                 else:
                     st.error("Name and phone are required")
+
+def show_admin_partners():
+    st.title("🚚 Delivery Partners")
+    
+    show_add_partner_form()
     
-    cols, rows = fetch_all("SELECT partner_id, name, phone, rating FROM deliverypartner ORDER BY partner_id")
+    cols, rows = fetch_all(ADMIN_PARTNERS_QUERY, ttl=60)
     
     if rows:
         df = pd.DataFrame(rows, columns=cols)
@@ -785,30 +2745,118 @@ def show_admin_partners():
 def show_admin_payments():
     st.title("💳 Payment Management")
     
-    cols, rows = fetch_all("""
-        SELECT p.pay_id, p.method, p.amount, p.status, u.name as customer
-        FROM payment p 
-        JOIN orders o ON p.pay_id = o.pay_id
-        JOIN user u ON o.user_id = u.user_id
-        ORDER BY p.pay_id DESC
-    """)
-    
-    if rows:
-        df = pd.DataFrame(rows, columns=cols)
-        st.dataframe(df, use_container_width=True)
-    else:
-        st.info("No payments found")
+    col1, col2 = st.columns(2)
+    with col1:
+        status_filter = st.selectbox("Payment Status", ["All", "Pending", "Paid"])
+    with col2:
+        method_filter = st.selectbox("Method", ["All", "UPI", "Card", "COD"])
+    
+    filters = []
+    if status_filter != "All":
+        filters.append(("p.status = %s", (status_filter,)))
+    if method_filter != "All":
+        filters.append(("p.method = %s", (method_filter,)))
+    
+    show_paginated_grid(
+        "admin_payments",
+        **ADMIN_PAYMENTS_GRID,
+        filters=filters,
+        total_rows=None if filters else grid_row_count("payments"),
+        export_name="payments"
+    )
 
 def show_admin_users():
     st.title("👥 User Management")
     
-    cols, rows = fetch_all("SELECT user_id, name, email, phone, address FROM user ORDER BY user_id")
+    search = st.text_input("Search (email or name prefix)").strip()
     
-    if rows:
-        df = pd.DataFrame(rows, columns=cols)
+    filters = []
+    if search:
+        if "@" in search:
+            filters.append(("email = %s", (search,)))
+        else:
+            filters.append(("name LIKE %s", (like_prefix(search),)))
+    
+    show_paginated_grid(
+        "admin_users",
+        **ADMIN_USERS_GRID,
+        filters=filters,
+        total_rows=None if filters else fetch_kpi_snapshot()['total_users'],
+        export_name="users"
+    )
+
+# Analytics reports tolerate a little staleness; writes still invalidate them immediately
+ANALYTICS_TTL = 120
+
+# Snapshot engine method behind each report
+SNAPSHOT_REPORTS = {
+    "📈 Top Spending Users": "top_spenders",
+    "🏆 Best Rated Restaurants": "best_rated_restaurants",
+    "💰 Revenue by Payment Method": "revenue_by_method",
+    "🚚 Partner Performance": "partner_performance",
+    "📊 Monthly Sales Trend": "monthly_trend",
+    "🍽️ Popular Menu Items": "popular_items"
+}
+
+@st.cache_resource
+def get_analytics_engine():
+    """Process-wide Parquet snapshot reader, shared by every admin session."""
+    return AnalyticsEngine()
+
+class SnapshotExporter:
+    """Runs Export Now on a background thread, one export at a time per process.
+
+    The export gets its own connection (a replica's when there are any), not
+    a pooled one, so a long export never holds a slot that sessions wait on.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.last_state = None
+        self.last_error = None
+
+    def running(self):
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start an export; False when this process is already running one."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._thread = threading.Thread(target=self._run, name="snapshot-export", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run(self):
+        try:
+            conn = mysql.connector.connect(**(replica_configs() or [DB_CONFIG])[0])
+            try:
+                self.last_state, self.last_error = export_snapshot(conn), None
+            finally:
+                conn.close()
+        except ExportInProgress as e:
+            self.last_error = str(e)
+        except Exception as e:
+            # No Streamlit context on this thread: the page shows the error
+            self.last_error = f"Export Error: {e}"
+
+@st.cache_resource
+def get_snapshot_exporter():
+    return SnapshotExporter()
+
+def show_snapshot_report(selected_analytic):
+    """Serve a report from the Parquet snapshot; the database is not queried."""
+    engine = get_analytics_engine()
+    state = engine.refresh()
+    st.caption(f"Snapshot batch {state['batch']} exported {state['exported_at']} "
+               f"(orders up to #{state['order_id']})")
+    df = getattr(engine, SNAPSHOT_REPORTS[selected_analytic])()
+    if not df.empty:
         st.dataframe(df, use_container_width=True)
     else:
-        st.info("No users found")
+        st.info("No data available")
 
 def show_admin_analytics():
     st.title("🔍 Analytics & Reports")
@@ -824,18 +2872,30 @@ def show_admin_analytics():
     
     selected_analytic = st.selectbox("Select Report", analytics_options)
     
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        source = st.radio("Source", ["Snapshot", "Live database"], horizontal=True,
+                          help="The snapshot is a Parquet export; run `python analytics.py export` on a schedule")
+    exporter = get_snapshot_exporter()
+    with col2:
+        if st.button("📤 Export Now", disabled=exporter.running()):
+            if exporter.start():
+                notify("Snapshot export started in the background", icon="📤")
+            st.rerun()
+    if exporter.running():
+        st.info("⏳ Exporting the snapshot in the background; reports switch to the new batch when it lands")
+    elif exporter.last_error:
+        st.warning(exporter.last_error)
+    
+    if source == "Snapshot":
+        if get_analytics_engine().available():
+            show_snapshot_report(selected_analytic)
+        else:
+            st.info("No snapshot yet: press Export Now or run `python analytics.py export`")
+        return
+    
     if selected_analytic == "📈 Top Spending Users":
-        cols, rows = fetch_all("""
-            SELECT u.user_id, u.name, u.email, 
-                   SUM(o.total_amt) as total_spent,
-                   COUNT(o.order_id) as total_orders
-            FROM user u 
-            JOIN orders o ON u.user_id = o.user_id 
-            WHERE o.status = 'Delivered'
-            GROUP BY u.user_id, u.name, u.email 
-            ORDER BY total_spent DESC 
-            LIMIT 10
-        """)
+        cols, rows = fetch_all(TOP_SPENDING_USERS_QUERY, ttl=ANALYTICS_TTL)
         if rows:
             df = pd.DataFrame(rows, columns=cols)
             st.dataframe(df, use_container_width=True)
@@ -843,17 +2903,7 @@ def show_admin_analytics():
             st.info("No data available")
     
     elif selected_analytic == "🏆 Best Rated Restaurants":
-        cols, rows = fetch_all("""
-            SELECT r.rest_id, r.name, r.rating, COUNT(DISTINCT o.order_id) as total_orders
-            FROM restaurant r
-            LEFT JOIN menuitem m ON r.rest_id = m.rest_id
-            LEFT JOIN orderitem oi ON m.item_id = oi.item_id
-            LEFT JOIN orders o ON oi.order_id = o.order_id
-            WHERE r.rating IS NOT NULL
-            GROUP BY r.rest_id, r.name, r.rating
-            ORDER BY r.rating DESC
-            LIMIT 10
-        """)
+        cols, rows = fetch_all(BEST_RATED_RESTAURANTS_QUERY, ttl=ANALYTICS_TTL)
         if rows:
             df = pd.DataFrame(rows, columns=cols)
             st.dataframe(df, use_container_width=True)
@@ -861,18 +2911,7 @@ def show_admin_analytics():
             st.info("No data available")
     
     elif selected_analytic == "💰 Revenue by Payment Method":
-        cols, rows = fetch_all("""
-            SELECT 
-                p.method as payment_method,
-                COUNT(DISTINCT o.order_id) as total_orders,
-                SUM(o.total_amt) as total_revenue,
-                AVG(o.total_amt) as avg_order_value
-            FROM payment p
-            JOIN orders o ON p.pay_id = o.pay_id
-            WHERE o.status = 'Delivered'
-            GROUP BY p.method
-            ORDER BY total_revenue DESC
-        """)
+        cols, rows = fetch_all(REVENUE_BY_METHOD_QUERY, ttl=ANALYTICS_TTL)
         if rows:
             df = pd.DataFrame(rows, columns=cols)
             st.dataframe(df, use_container_width=True)
@@ -880,20 +2919,7 @@ def show_admin_analytics():
             st.info("No data available")
     
     elif selected_analytic == "🚚 Partner Performance":
-        cols, rows = fetch_all("""
-            SELECT 
-                dp.partner_id,
-                dp.name as partner_name,
-                dp.rating,
-                COUNT(o.order_id) as total_deliveries,
-                SUM(CASE WHEN o.status = 'Delivered' THEN 1 ELSE 0 END) as successful_deliveries,
-                AVG(o.total_amt) as avg_order_value
-            FROM deliverypartner dp
-            LEFT JOIN orders o ON dp.partner_id = o.partner_id
-            WHERE o.status IS NOT NULL
-            GROUP BY dp.partner_id, dp.name, dp.rating
-            ORDER BY successful_deliveries DESC, dp.rating DESC
-        """)
+        cols, rows = fetch_all(PARTNER_PERFORMANCE_QUERY, ttl=ANALYTICS_TTL)
         if rows:
             df = pd.DataFrame(rows, columns=cols)
             st.dataframe(df, use_container_width=True)
@@ -901,17 +2927,7 @@ def show_admin_analytics():
             st.info("No data available")
     
     elif selected_analytic == "📊 Monthly Sales Trend":
-        cols, rows = fetch_all("""
-            SELECT 
-                DATE_FORMAT(o.order_date, '%Y-%m') as month,
-                COUNT(o.order_id) as total_orders,
-                SUM(o.total_amt) as total_revenue,
-                AVG(o.total_amt) as avg_order_value
-            FROM orders o
-            WHERE o.order_date >= DATE_SUB(NOW(), INTERVAL 6 MONTH)
-            GROUP BY DATE_FORMAT(o.order_date, '%Y-%m')
-            ORDER BY month DESC
-        """)
+        cols, rows = fetch_all(MONTHLY_SALES_TREND_QUERY, ttl=ANALYTICS_TTL)
         if rows:
             df = pd.DataFrame(rows, columns=cols)
             st.dataframe(df, use_container_width=True)
@@ -919,47 +2935,197 @@ def show_admin_analytics():
             st.info("No data available")
     
     elif selected_analytic == "🍽️ Popular Menu Items":
-        cols, rows = fetch_all("""
-            SELECT 
-                m.item_id,
-                m.name as item_name,
-                r.name as restaurant,
-                SUM(oi.quantity) as total_ordered,
-                SUM(oi.quantity * oi.price) as total_revenue
-            FROM menuitem m
-            JOIN restaurant r ON m.rest_id = r.rest_id
-            JOIN orderitem oi ON m.item_id = oi.item_id
-            JOIN orders o ON oi.order_id = o.order_id
-            WHERE o.status = 'Delivered'
-            GROUP BY m.item_id, m.name, r.name
-            ORDER BY total_ordered DESC
-            LIMIT 15
-        """)
+        cols, rows = fetch_all(POPULAR_MENU_ITEMS_QUERY, ttl=ANALYTICS_TTL)
         if rows:
             df = pd.DataFrame(rows, columns=cols)
             st.dataframe(df, use_container_width=True)
         else:
             st.info("No data available")
 
+def show_admin_performance():
+    st.title("⚡ Performance")
+    
+    log = get_query_log()
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        page_filter = st.selectbox("Page", ["All pages"] + log.pages())
+    with col2:
+        if st.button("🧹 Reset Stats"):
+            log.clear()
+            st.rerun()
+    
+    runs = log.run_summary()
+    if runs:
+        st.subheader("Server Time per Interaction")
+        st.caption("Full page runs vs fragment reruns: mean/p95 script time and statements per run")
+        df = pd.DataFrame(sorted(runs, key=lambda r: r["runs"], reverse=True),
+                          columns=["run", "runs", "mean_ms", "p95_ms", "queries_per_run"])
+        st.dataframe(df, use_container_width=True)
+    
+    summary = log.summary(None if page_filter == "All pages" else page_filter)
+    if not summary:
+        st.info("No queries recorded yet")
+    else:
+        columns = ["sql", "kind", "calls", "total_ms", "mean_ms", "p95_ms", "max_ms", "avg_rows", "errors", "pages"]
+        
+        st.subheader("Top Queries by Total Time")
+        df = pd.DataFrame(sorted(summary, key=lambda q: q["total_ms"], reverse=True)[:15], columns=columns)
+        st.dataframe(df, use_container_width=True)
+        
+        st.subheader("Top Queries by p95 Latency")
+        df = pd.DataFrame(sorted(summary, key=lambda q: q["p95_ms"], reverse=True)[:15], columns=columns)
+        st.dataframe(df, use_container_width=True)
+        
+        slow = [q for q in summary if q["explain"]]
+        if slow:
+            st.subheader(f"Slow Query Plans (> {log.slow_ms} ms)")
+            for q in sorted(slow, key=lambda q: q["explain"][2], reverse=True):
+                _, plan, elapsed_ms = q["explain"]
+                with st.expander(f"{elapsed_ms:.0f} ms · {q['sql'][:120]}"):
+                    st.code(q["sql"], language="sql")
+                    st.dataframe(pd.DataFrame(plan), use_container_width=True)
+    
+    with st.expander("🔌 Connection Pool"):
+        pool = get_engine().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("In Use", f"{pool['in_use']} / {pool['max_size']}")
+        with col2:
+            st.metric("Idle", pool['idle'])
+        with col3:
+            st.metric("Avg Wait", f"{pool['avg_wait_ms']:.1f} ms")
+        with col4:
+            st.metric("Timeouts", pool['timeouts'])
+        st.caption(f"Checkouts: {pool['checkouts']} | Created: {pool['created']} | "
+                   f"Reconnects: {pool['reconnects']} | Evicted: {pool['evicted']} | "
+                   f"Max wait: {pool['max_wait_ms']:.1f} ms")
+
+    router = get_read_router().stats()
+    if router["replicas"]:
+        with st.expander("🪞 Read Replicas"):
+            routed = router["replica"] + router["primary"]
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Reads on Replicas", f"{router['replica'] / routed:.0%}" if routed else "—")
+            with col2:
+                st.metric("Sticky Reads", router['sticky'])
+            with col3:
+                st.metric("Replica Behind", f"{router['gtid_behind']} / {router['gtid_checks']}")
+            with col4:
+                st.metric("Failovers", router['failovers'])
+            st.dataframe(pd.DataFrame([{"replica": r["name"], "down": r["down"], "in_use": r["in_use"],
+                                        "idle": r["idle"], "avg_wait_ms": round(r["avg_wait_ms"], 1),
+                                        "timeouts": r["timeouts"]} for r in router["replicas"]]),
+                         use_container_width=True)
+            st.caption("Replica Behind: GTID checks where the replica had not yet applied the "
+                       "session's last write, so the read went to the primary")
+
+    with st.expander("🗄️ Query Cache"):
+        cache = get_query_cache().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Hit Ratio", f"{cache['hit_ratio']:.0%}")
+        with col2:
+            st.metric("Queries Saved", cache['hits'])
+        with col3:
+            st.metric("Entries", cache['entries'])
+        with col4:
+            st.metric("Memory", f"{cache['bytes'] / 1024:.0f} KB")
+        st.caption(f"Misses: {cache['misses']} | Invalidations: {cache['invalidations']} | "
+                   f"Expired: {cache['expired']} | Evictions: {cache['evictions']} | "
+                   f"Unsettled: {cache['unsettled']}")
+    
+    with st.expander("📚 Menu Catalog"):
+        catalog = get_catalog().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Version", catalog['version'])
+        with col2:
+            st.metric("Restaurants", catalog['restaurants'])
+        with col3:
+            st.metric("Items", catalog['items'])
+        with col4:
+            st.metric("Reloads", catalog['reloads'])
+        st.caption(f"Stock polls: {catalog['stock_polls']} | Rows refreshed: {catalog['stock_rows']} | "
+                   f"Newest change: {catalog['watermark'] or 'N/A'}")
+        st.caption(f"Search index: {catalog['search_documents']} documents | {catalog['search_tokens']} tokens | "
+                   f"{catalog['search_trigrams']} trigrams | Re-indexed: {catalog['reindexed']}")
+    
+    with st.expander("🔑 Sessions"):
+        sessions = get_session_cache().stats()
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Signed In", sessions['principals'])
+        with col2:
+            st.metric("Restored from Cache", sessions['hits'])
+        with col3:
+            st.metric("Restored from DB", sessions['misses'])
+        with col4:
+            st.metric("Rejected Tokens", sessions['rejected'])
+        st.caption(f"Revoked tokens held: {sessions['revoked']}")
+    
+    queue = get_order_queue()
+    if queue:
+        with st.expander("📥 Order Queue"):
+            intake = queue.stats()
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Waiting", intake['queued'])
+            with col2:
+                st.metric("Placed", intake['placed'])
+            with col3:
+                st.metric("Avg Batch", f"{intake['avg_batch']:.1f}")
+            with col4:
+                st.metric("Avg Commit", f"{intake['avg_batch_ms']:.0f} ms")
+            st.caption(f"Batches: {intake['batches']} | Failed: {intake['failed']} | "
+                       f"Retried batches: {intake['retried_batches']}")
+
 # -------------------- USER PANEL --------------------
+def hold_cart_item(item_id, quantity=1):
+    """Reserve stock for a cart change; False when the units can't be held."""
+    conn = get_db()
+    if not conn:
+        return False
+    error = None
+    try:
+        return reserve_stock(conn, st.session_state.cart_id, st.session_state.user_data.get('user_id'),
+                             item_id, quantity)
+    except mysql.connector.Error as e:
+        error = e
+        st.error(f"DB Error: {str(e)}")
+        return False
+    finally:
+        release_db(conn, error)
+
+def release_cart_item(item_id=None, quantity=None):
+    """Give held stock back (one item, or the whole cart when item_id is None)."""
+    conn = get_db()
+    if not conn:
+        return
+    error = None
+    try:
+        release_stock(conn, st.session_state.cart_id, item_id, quantity)
+    except mysql.connector.Error as e:
+        error = e
+        st.error(f"DB Error: {str(e)}")
+    finally:
+        release_db(conn, error)
+
 def show_user_panel():
     st.sidebar.markdown(f"### 👤 {st.session_state.user_data['name']}")
     
     if st.sidebar.button("🚪 Logout"):
-        st.session_state.logged_in = False
-        st.session_state.user_role = None
-        st.session_state.user_data = {}
-        st.session_state.cart = []
-        st.session_state.page = "login"
+        if st.session_state.cart:
+            release_cart_item()
+        sign_out()
+        st.session_state.cart = Cart()
         st.rerun()
     
-    # FIXED: Proper cart count calculation
-    cart_count = sum(item['quantity'] for item in st.session_state.cart)
-    st.sidebar.markdown(f"🛒 Cart Items: **{cart_count}**")
+    cart = st.session_state.cart
+    st.sidebar.markdown(f"🛒 Cart Items: **{cart.count}**")
     
-    if cart_count > 0:
-        total_amount = sum(item['price'] * item['quantity'] for item in st.session_state.cart)
-        st.sidebar.markdown(f"Total: **₹{total_amount:.2f}**")
+    if cart.count > 0:
+        st.sidebar.markdown(f"Total: **₹{cart.total:.2f}**")
         if st.sidebar.button("🛒 View Cart"):
             st.session_state.page = "user_cart"
             st.rerun()
@@ -987,7 +3153,12 @@ def show_user_panel():
 def show_user_restaurants():
     st.title("🍽️ Restaurants Near You")
     
-    cols, rows = fetch_all("SELECT rest_id, name, address, rating FROM restaurant ORDER BY rating DESC")
+    query = st.text_input("🔍 Search restaurants and dishes", placeholder="e.g. paneer, pizza, biryani").strip()
+    if query:
+        show_search_results(query)
+        return
+    
+    rows = get_catalog().restaurants()
     
     if not rows:
         st.info("No restaurants available")
@@ -1013,15 +3184,46 @@ def show_user_restaurants():
                     st.session_state.page = "restaurant_menu"
                     st.rerun()
 
+def show_search_results(query):
+    """Catalog search hits: restaurants link to their menu, dishes can go straight to the cart."""
+    results = get_catalog().search(query)
+    if not results:
+        st.info(f"Nothing matches \"{query}\"")
+        return
+    
+    restaurants = [hit for hit in results if hit['kind'] == "restaurant"]
+    items = [hit for hit in results if hit['kind'] == "item"]
+    
+    if restaurants:
+        st.subheader("Restaurants")
+        for hit in restaurants:
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(f"**{hit['name']}** · ⭐ {hit['rating'] or 'N/A'}")
+                if hit['address']:
+                    st.caption(f"📍 {hit['address']}")
+            with col2:
+                if st.button("View Menu", key=f"search_menu_{hit['rest_id']}"):
+                    st.session_state.current_restaurant = hit['rest_id']
+                    st.session_state.page = "restaurant_menu"
+                    st.rerun()
+    
+    if items:
+        st.subheader("Dishes")
+        for hit in items:
+            st.caption(f"from {hit['restaurant'] or 'Unknown restaurant'}")
+            show_menu_item_row(hit['item_id'])
+
 def show_restaurant_menu():
     rest_id = st.session_state.current_restaurant
-    rest_data = fetch_one("SELECT name FROM restaurant WHERE rest_id=%s", (rest_id,))
+    catalog = get_catalog()
+    rest_data = catalog.restaurant(rest_id)
     
     if not rest_data:
         st.error("Restaurant not found")
         return
     
-    rest_name = rest_data[0]
+    rest_name = rest_data[1]
     
     st.title(f"🍽️ {rest_name}")
     
@@ -1030,69 +3232,57 @@ def show_restaurant_menu():
         st.session_state.page = "user_restaurants"
         st.rerun()
     
-    cols, rows = fetch_all("""
-        SELECT item_id, name, price, quantity 
-        FROM menuitem WHERE rest_id=%s AND quantity > 0
-    """, (rest_id,))
+    rows = catalog.menu(rest_id)
     
     if not rows:
         st.info("No menu items available")
         return
     
     for item in rows:
-        item_id, name, price, quantity = item
-        
-        col1, col2, col3 = st.columns([3, 1, 1])
-        
-        with col1:
-            st.subheader(name)
-            st.write(f"₹{price} | Available: {quantity}")
-        
-        with col2:
-            # Check if item is already in cart
-            current_qty = 0
-            for cart_item in st.session_state.cart:
-                if cart_item['item_id'] == item_id:
-                    current_qty = cart_item['quantity']
-                    break
-            
-            if current_qty > 0:
-                st.write(f"In cart: {current_qty}")
-        
-        with col3:
-            if st.button("➕ Add to Cart", key=f"add_{item_id}"):
-                # Check if item already in cart
-                item_found = False
-                for cart_item in st.session_state.cart:
-                    if cart_item['item_id'] == item_id:
-                        if cart_item['quantity'] + 1 <= quantity:
-                            cart_item['quantity'] += 1
-                            item_found = True
-                        else:
-                            st.error(f"Cannot add more {name}. Only {quantity} available.")
-                        break
-                
-                if not item_found:
-                    if quantity >= 1:
-                        st.session_state.cart.append({
-                            'item_id': item_id,
-                            'name': name,
-                            'price': float(price),
-                            'quantity': 1,
-                            'available_quantity': quantity
-                        })
-                    else:
-                        st.error(f"{name} is out of stock")
-                
-                st.success(f"Added {name} to cart")
-                time.sleep(1)
-                st.rerun()
-        
-        st.markdown("---")
+        show_menu_item_row(item['item_id'])
+
+@st.fragment
+@timed_run("fragment: menu item row")
+def show_menu_item_row(item_id):
+    """One menu line; Add to Cart reruns only this line (stock comes from the shared catalog)."""
+    show_toasts()
+    item = get_catalog().item(item_id)
+    if not item:
+        return
+    name, price, quantity = item['name'], item['price'], item['quantity']
+    
+    col1, col2, col3 = st.columns([3, 1, 1])
+    
+    with col1:
+        st.subheader(name)
+        st.write(f"₹{price} | Available: {quantity}")
+    
+    with col2:
+        current_qty = st.session_state.cart.quantity(item_id)
+        if current_qty > 0:
+            st.write(f"In cart: {current_qty}")
+    
+    with col3:
+        if st.button("➕ Add to Cart", key=f"add_{item_id}"):
+            # Hold the unit first; the cart only shows what is actually reserved
+            if hold_cart_item(item_id):
+                st.session_state.cart.add(item_id, name, price)
+                notify(f"Added {name} to cart", icon="🛒")
+                rerun_fragment()
+            else:
+                st.error(f"{name} is out of stock")
+    
+    st.markdown("---")
 
 def show_user_cart():
     st.title("🛒 Your Cart")
-    
+    show_cart_lines()
+
+@st.fragment
+@timed_run("fragment: cart lines")
+def show_cart_lines():
+    """Cart lines and total; quantity buttons rerun only this part of the page."""
+    show_toasts()
     if not st.session_state.cart:
         st.info("Your cart is empty")
         if st.button("Browse Restaurants"):
@@ -1100,46 +3290,49 @@ def show_user_cart():
             st.rerun()
         return
     
-    total_amount = 0
-    
-    for i, item in enumerate(st.session_state.cart):
+    cart = st.session_state.cart
+    for item_id, name, price, quantity in cart.items():
         col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
         
         with col1:
-            st.write(f"**{item['name']}**")
-            st.write(f"₹{item['price']} each")
+            st.write(f"**{name}**")
+            st.write(f"₹{price} each")
         
         with col2:
-            st.write(f"Qty: {item['quantity']}")
+            st.write(f"Qty: {quantity}")
         
         with col3:
-            item_total = item['price'] * item['quantity']
-            st.write(f"**₹{item_total:.2f}**")
-            total_amount += item_total
+            st.write(f"**₹{price * quantity:.2f}**")
         
         with col4:
             col4a, col4b, col4c = st.columns(3)
             with col4a:
-                if st.button("−", key=f"dec_{i}"):
-                    if item['quantity'] > 1:
-                        item['quantity'] -= 1
-                    else:
-                        st.session_state.cart.pop(i)
-                    st.rerun()
+                if st.button("−", key=f"dec_{item_id}"):
+                    release_cart_item(item_id, 1)
+                    cart.remove(item_id, 1)
+                    rerun_fragment()
             with col4b:
-                if st.button("+", key=f"inc_{i}"):
-                    if item['quantity'] + 1 <= item['available_quantity']:
-                        item['quantity'] += 1
-                        st.rerun()
+                if st.button("+", key=f"inc_{item_id}"):
+                    if hold_cart_item(item_id):
+                        cart.add(item_id, name, price)
+                        rerun_fragment()
                     else:
-                        st.error(f"Cannot add more {item['name']}")
+                        st.error(f"Cannot add more {name}")
             with col4c:
-                if st.button("🗑️", key=f"del_{i}"):
-                    st.session_state.cart.pop(i)
-                    st.rerun()
+                if st.button("🗑️", key=f"del_{item_id}"):
+                    release_cart_item(item_id)
+                    cart.remove(item_id)
+                    notify(f"Removed {name}", icon="🗑️")
+                    rerun_fragment()
     
     st.markdown("---")
-    st.subheader(f"Total: ₹{total_amount:.2f}")
+    st.subheader(f"Total: ₹{cart.total:.2f}")
+    
+    hold = fetch_one(CART_HOLD_EXPIRY_QUERY, (st.session_state.cart_id,))
+    if hold and hold[0]:
+        st.caption(f"⏳ Your items are held until {hold[0]:%H:%M}")
+    else:
+        st.caption("⏳ Your hold has expired; stock will be re-checked at checkout")
     
     if st.button("💳 Proceed to Checkout"):
         st.session_state.page = "checkout"
@@ -1155,88 +3348,73 @@ def show_checkout():
             st.rerun()
         return
     
-    total_amount = sum(item['price'] * item['quantity'] for item in st.session_state.cart)
-    
-    st.write(f"**Total Amount: ₹{total_amount:.2f}**")
+    st.write(f"**Total Amount: ₹{st.session_state.cart.total:.2f}**")
     
     with st.form("checkout_form"):
         payment_method = st.selectbox("Payment Method", ["UPI", "Card", "COD"])
         
         if st.form_submit_button("✅ Place Order"):
+            queue = get_order_queue()
+            if queue:
+                # Async intake: durably queued now, written to MySQL by the queue workers
+                try:
+                    intake_id = queue.enqueue(st.session_state.user_data['user_id'], st.session_state.cart.lines(),
+                                              payment_method, cart_id=st.session_state.cart_id)
+                except sqlite3.Error as e:
+                    st.error(f"Failed to place order: {str(e)}")
+                    return
+                notify(f"Order received (ref #{intake_id}). It will appear in My Orders in a moment.")
+                note_write()
+                st.session_state.cart = Cart()
+                st.session_state.cart_id = uuid.uuid4().hex
+                st.session_state.page = "user_orders"
+                st.rerun()
+            
             conn = get_db()
             if not conn:
                 st.error("Database connection failed")
                 return
             
-            cur = conn.cursor()
+            error = None
             try:
-                # Start transaction
-                conn.start_transaction()
-                
-                # Create payment
-                cur.execute("INSERT INTO payment (method, amount, status) VALUES (%s, %s, %s)",
-                           (payment_method, total_amount, 'Pending'))
-                pay_id = cur.lastrowid
-                
-                # Get a delivery partner
-                cur.execute("SELECT partner_id FROM deliverypartner ORDER BY RAND() LIMIT 1")
-                partner_result = cur.fetchone()
-                partner_id = partner_result[0] if partner_result else None
-                
-                # Create order
-                cur.execute("""
-                    INSERT INTO orders (user_id, total_amt, status, pay_id, partner_id, order_date)
-                    VALUES (%s, %s, %s, %s, %s, NOW())
-                """, (st.session_state.user_data['user_id'], total_amount, 'Placed', pay_id, partner_id))
-                order_id = cur.lastrowid
-                
-                # Add order items and update quantities
-                for item in st.session_state.cart:
-                    cur.execute("""
-                        INSERT INTO orderitem (order_id, item_id, quantity, price)
-                        VALUES (%s, %s, %s, %s)
-                    """, (order_id, item['item_id'], item['quantity'], item['price']))
-                    
-                    cur.execute("""
-                        UPDATE menuitem 
-                        SET quantity = quantity - %s 
-                        WHERE item_id = %s AND quantity >= %s
-                    """, (item['quantity'], item['item_id'], item['quantity']))
-                    
-                    if cur.rowcount == 0:
-                        raise Exception(f"Not enough quantity available for {item['name']}")
-                
-                # Commit transaction
-                conn.commit()
+                order_id = place_order(conn, st.session_state.user_data['user_id'],
+                                       st.session_state.cart.lines(), payment_method,
+                                       cart_id=st.session_state.cart_id)
+                note_write(conn)
                 
                 payment_note = "Payment will be collected when your order is delivered." if payment_method == 'COD' else "Payment is pending and will be processed upon delivery."
-                st.success(f"Order placed successfully! Order ID: {order_id}\n{payment_note}")
+                notify(f"Order placed successfully! Order ID: {order_id}. {payment_note}", icon="🎉")
                 
                 # Clear cart
-                st.session_state.cart = []
-                time.sleep(3)
+                st.session_state.cart = Cart()
+                st.session_state.cart_id = uuid.uuid4().hex
                 st.session_state.page = "user_orders"
                 st.rerun()
                 
             except Exception as e:
-                conn.rollback()
+                error = e
                 st.error(f"Failed to place order: {str(e)}")
             finally:
-                cur.close()
-                conn.close()
+                release_db(conn, error)
 
 def show_user_orders():
     st.title("📋 My Orders")
     
-    cols, rows = fetch_all("""
-        SELECT o.order_id, o.order_date, o.total_amt, o.status, 
-               dp.name as delivery_partner, p.status as payment_status, p.method as payment_method
-        FROM orders o 
-        LEFT JOIN deliverypartner dp ON o.partner_id = dp.partner_id
-        LEFT JOIN payment p ON o.pay_id = p.pay_id
-        WHERE o.user_id=%s 
-        ORDER BY o.order_date DESC
-    """, (st.session_state.user_data['user_id'],))
+    queue = get_order_queue()
+    if queue:
+        recent = queue.recent(st.session_state.user_data['user_id'])
+        if recent:
+            st.subheader("Recent Checkouts")
+            df = pd.DataFrame(recent, columns=["ref", "received", "amount", "payment_method",
+                                               "status", "order_id", "note"])
+            df["received"] = pd.to_datetime(df["received"], unit="s")
+            st.dataframe(df, use_container_width=True)
+            if any(row[4] in ("queued", "processing") for row in recent):
+                if st.button("🔄 Refresh"):
+                    st.rerun()
+    
+    user_id = st.session_state.user_data['user_id']
+    cols, rows = fetch_all(USER_ORDERS_QUERY, (user_id, user_id))
     
     if not rows:
         st.info("No orders found")
@@ -1262,16 +3440,9 @@ def show_user_profile():
     with col2:
         st.subheader("Order Statistics")
         # FIXED: Only count paid/delivered orders for total spent
-        total_orders = fetch_one("SELECT COUNT(*) FROM orders WHERE user_id=%s", 
-                                (user['user_id'],))[0] or 0
+        total_orders = fetch_one(USER_ORDER_COUNT_QUERY, (user['user_id'], user['user_id']))[0] or 0
         
-        # Calculate total spent only from delivered orders with paid payments
-        total_spent_row = fetch_one("""
-            SELECT COALESCE(SUM(o.total_amt), 0) 
-            FROM orders o 
-            JOIN payment p ON o.pay_id = p.pay_id
-            WHERE o.user_id=%s AND o.status='Delivered' AND p.status='Paid'
-        """, (user['user_id'],))
+        total_spent_row = fetch_one(USER_TOTAL_SPENT_QUERY, (user['user_id'], user['user_id']))
         
         total_spent = total_spent_row[0] if total_spent_row else 0
         
@@ -1282,9 +3453,21 @@ def show_user_profile():
 def main():
     # Initialize session state
     init_session_state()
+    restore_session()
     
+    # Time the whole run; fragment reruns are timed separately (see timed_run)
+    log = get_query_log()
+    token = log.start_run()
+    try:
+        route()
+    finally:
+        log.end_run(f"page: {st.session_state.page}", token)
+    sync_session_cookie()
+
+def route():
     # Apply custom styles
     apply_custom_styles()
+    show_toasts()
     
     # Create missing tables
     if not st.session_state.get('tables_created', False):
@@ -1300,6 +3483,7 @@ def main():
         elif st.session_state.user_role == "partner":
             show_partner_panel()
         elif st.session_state.user_role == "user":
+            sweep_reservations_if_due()
             if st.session_state.page == "restaurant_menu":
                 show_restaurant_menu()
             elif st.session_state.page == "user_cart":
@@ -0,0 +1,331 @@
+"""
+FoodDelight checkout load generator
+- Drives the app's own place_order() transaction from a thread or process pool
+- Configurable concurrency, cart sizes and hot-item skew
+- Reports orders/sec, latency percentiles, deadlocks and rollbacks; carts
+  and attempts are counted apart, so deadlock retries don't inflate either
+- Verifies afterwards that stock never went negative and nothing was oversold
+
+    python loadgen.py --concurrency 50 --checkouts 5000 --hot-items 5 --hot-share 0.8
+    python loadgen.py --restock 100 --checkouts 2000     # limited stock: oversell check
+    python loadgen.py --restock 100 --checkouts 2000 --reserve   # carts hold stock as lines are added
+    python loadgen.py --checkouts 5000 --batch-size 50           # group commit, as the order queue does
+    python loadgen.py --max-lines 20 --client-side               # statement-per-step checkout, for comparison
+
+Orders placed by the run are committed. Run it against a benchmark database
+(see benchmark.py seed), not production data.
+"""
+
+import argparse
+import json
+import logging
+import random
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+import streamlit.logger
+
+from benchmark import DB_CONFIG, latency_summary
+
+# dbmstest1 is a Streamlit script; outside `streamlit run` it only warns about the missing runtime
+streamlit.logger.set_log_level(logging.ERROR)
+from dbmstest1 import (InsufficientStock, place_order, place_order_batch,  # noqa: E402
+                       release_stock, reserve_stock)
+
+def connect(config):
+    return mysql.connector.connect(**config)
+
+def load_catalog(cur, rest_id=None):
+    """Menu items (optionally one restaurant's) and user ids to build carts from."""
+    if rest_id:
+        cur.execute("SELECT item_id, name, price FROM menuitem WHERE rest_id=%s ORDER BY item_id", (rest_id,))
+    else:
+        cur.execute("SELECT item_id, name, price FROM menuitem ORDER BY item_id")
+    items = cur.fetchall()
+    cur.execute("SELECT user_id FROM user ORDER BY user_id LIMIT 10000")
+    users = [row[0] for row in cur.fetchall()]
+    return items, users
+
+def build_cart(rng, items, hot_items, hot_share, min_lines, max_lines):
+    """Random cart; each line lands on one of the first hot_items items with probability hot_share."""
+    hot, cold = items[:hot_items], items[hot_items:] or items
+    cart = {}
+    for _ in range(rng.randint(min_lines, max_lines)):
+        item_id, name, price = rng.choice(hot if hot and rng.random() < hot_share else cold)
+        line = cart.setdefault(item_id, {'item_id': item_id, 'name': name, 'price': float(price), 'quantity': 0})
+        line['quantity'] += rng.randint(1, 2)
+    return list(cart.values())
+
+def reserve_cart(conn, cart, cart_id, user_id, holds):
+    """Hold each line as the app's Add to Cart does; lines that can't be held are dropped."""
+    kept = []
+    for line in cart:
+        try:
+            ok = reserve_stock(conn, cart_id, user_id, line['item_id'], line['quantity'])
+        except Error:
+            ok = False
+            holds["conflicts"] += 1
+        holds["lines_held" if ok else "lines_refused"] += 1
+        if ok:
+            kept.append(line)
+    return kept
+
+def error_outcome(e):
+    if e.errno == errorcode.ER_LOCK_DEADLOCK:
+        return "deadlock"
+    if e.errno == errorcode.ER_LOCK_WAIT_TIMEOUT:
+        return "lock_timeout"
+    return "error"
+
+def checkout_one(conn, entry, retries, server_side=True):
+    """place_order() for one cart; returns [(outcome, ms), ...] per attempt."""
+    results = []
+    for _ in range(retries + 1):
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            place_order(conn, entry['user_id'], entry['cart'], entry['payment_method'], cart_id=entry['cart_id'],
+                        server_side=server_side)
+        except InsufficientStock:
+            outcome = "insufficient_stock"
+        except Error as e:
+            outcome = error_outcome(e)
+        results.append((outcome, (time.perf_counter() - start) * 1000))
+        if outcome not in ("deadlock", "lock_timeout"):
+            break
+    if entry['cart_id'] and outcome != "ok":
+        release_stock(conn, entry['cart_id'])
+    return results
+
+def checkout_batch(conn, entries, retries):
+    """place_order_batch() for several carts (one commit); returns each cart's attempts.
+
+    Every cart sees the batch latency, and a retried batch is a new attempt for each of its carts.
+    """
+    results = [[] for _ in entries]
+    for _ in range(retries + 1):
+        start = time.perf_counter()
+        try:
+            placed = place_order_batch(conn, entries)
+        except Error as e:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            outcome = error_outcome(e)
+            for attempts in results:
+                attempts.append((outcome, elapsed_ms))
+            if outcome in ("deadlock", "lock_timeout"):
+                continue
+            break
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        for attempts, entry in zip(results, entries):
+            attempts.append(("ok" if placed[entry['intake_key']][0] else "insufficient_stock", elapsed_ms))
+        return results
+    for entry in entries:
+        if entry['cart_id']:
+            release_stock(conn, entry['cart_id'])
+    return results
+
+def run_worker(config, plan, worker_id):
+    """Run this worker's share of checkouts sequentially on one connection; returns each cart's attempts."""
+    rng = random.Random(plan["seed"] + worker_id)
+    conn = connect(config)
+    results = []
+    holds = {"lines_held": 0, "lines_refused": 0, "conflicts": 0, "empty_carts": 0}
+    batch = []
+    try:
+        for _ in range(plan["checkouts"]):
+            cart = build_cart(rng, plan["items"], plan["hot_items"], plan["hot_share"],
+                              plan["min_lines"], plan["max_lines"])
+            entry = {'intake_key': uuid.uuid4().hex, 'user_id': rng.choice(plan["users"]), 'cart': cart,
+                     'payment_method': rng.choice(["UPI", "Card", "COD"]), 'cart_id': None}
+            if plan["reserve"]:
+                entry['cart_id'] = uuid.uuid4().hex
+                entry['cart'] = reserve_cart(conn, cart, entry['cart_id'], entry['user_id'], holds)
+                if not entry['cart']:
+                    holds["empty_carts"] += 1
+                    continue
+            if plan["batch_size"] > 1:
+                batch.append(entry)
+                if len(batch) >= plan["batch_size"]:
+                    results += checkout_batch(conn, batch, plan["retries"])
+                    batch = []
+            else:
+                results.append(checkout_one(conn, entry, plan["retries"], plan["server_side"]))
+        if batch:
+            results += checkout_batch(conn, batch, plan["retries"])
+    finally:
+        conn.close()
+    return results, holds
+
+def stock_snapshot(cur, item_ids):
+    """Stock per item, counting units held by carts (they are out of menuitem.quantity)."""
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    cur.execute(f"""
+        SELECT m.item_id, m.quantity + COALESCE(SUM(r.quantity), 0)
+        FROM menuitem m LEFT JOIN stock_reservation r ON r.item_id = m.item_id
+        WHERE m.item_id IN ({placeholders})
+        GROUP BY m.item_id, m.quantity
+    """, item_ids)
+    return {item_id: int(quantity) for item_id, quantity in cur.fetchall()}
+
+def verify_stock(cur, item_ids, before, first_order_id):
+    """Every unit sold by the run must have come out of stock, and stock must stay >= 0."""
+    after = stock_snapshot(cur, item_ids)
+    placeholders = ", ".join(["%s"] * len(item_ids))
+    cur.execute(f"""
+        SELECT oi.item_id, SUM(oi.quantity) FROM orderitem oi
+        WHERE oi.order_id >= %s AND oi.item_id IN ({placeholders})
+        GROUP BY oi.item_id
+    """, [first_order_id] + item_ids)
+    sold = {item_id: int(qty) for item_id, qty in cur.fetchall()}
+    violations = []
+    for item_id in item_ids:
+        if after[item_id] < 0:
+            violations.append(f"item {item_id}: negative stock {after[item_id]}")
+        if sold.get(item_id, 0) > before[item_id]:
+            violations.append(f"item {item_id}: sold {sold[item_id]} of {before[item_id]} in stock")
+        if before[item_id] - sold.get(item_id, 0) != after[item_id]:
+            violations.append(f"item {item_id}: stock {before[item_id]} - sold {sold.get(item_id, 0)} "
+                              f"!= remaining {after[item_id]}")
+    return violations, sum(sold.values())
+
+def run(args):
+    config = dict(DB_CONFIG)
+    for key in ("host", "user", "password", "database"):
+        if getattr(args, key):
+            config[key] = getattr(args, key)
+
+    conn = connect(config)
+    cur = conn.cursor(buffered=True)
+    items, users = load_catalog(cur, args.rest_id)
+    if not items or not users:
+        print("Need menu items and users; seed the database first (benchmark.py seed)")
+        return None
+    items = items[:args.items] if args.items else items
+    item_ids = [item[0] for item in items]
+    if args.restock is not None:
+        placeholders = ", ".join(["%s"] * len(item_ids))
+        cur.execute(f"UPDATE menuitem SET quantity=%s WHERE item_id IN ({placeholders})", [args.restock] + item_ids)
+        conn.commit()
+    before = stock_snapshot(cur, item_ids)
+    cur.execute("SELECT COALESCE(MAX(order_id), 0) + 1 FROM orders")
+    first_order_id = cur.fetchone()[0]
+
+    per_worker, extra = divmod(args.checkouts, args.concurrency)
+    plans = [{
+        "seed": args.seed, "items": items, "users": users, "hot_items": args.hot_items,
+        "hot_share": args.hot_share, "min_lines": args.min_lines, "max_lines": args.max_lines,
+        "retries": args.retries, "reserve": args.reserve, "batch_size": args.batch_size,
+        "server_side": not args.client_side,
+        "checkouts": per_worker + (1 if w < extra else 0)
+    } for w in range(args.concurrency)]
+
+    pool_class = ProcessPoolExecutor if args.processes else ThreadPoolExecutor
+    print(f"Running {args.checkouts} checkouts with {args.concurrency} "
+          f"{'processes' if args.processes else 'threads'} over {len(items)} items...")
+    started = time.perf_counter()
+    with pool_class(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_worker, config, plan, w) for w, plan in enumerate(plans)]
+        worker_results = [f.result() for f in futures]
+    wall = time.perf_counter() - started
+    carts = [attempts for worker, _ in worker_results for attempts in worker]
+    results = [attempt for attempts in carts for attempt in attempts]
+    holds = {}
+    for _, worker_holds in worker_results:
+        for key, value in worker_holds.items():
+            holds[key] = holds.get(key, 0) + value
+
+    # outcomes: the final outcome of each cart; attempt_outcomes: every try, retries included
+    counts, attempt_counts = {}, {}
+    for attempts in carts:
+        counts[attempts[-1][0]] = counts.get(attempts[-1][0], 0) + 1
+    for outcome, _ in results:
+        attempt_counts[outcome] = attempt_counts.get(outcome, 0) + 1
+    ok_latencies = [ms for outcome, ms in results if outcome == "ok"]
+    all_latencies = [ms for _, ms in results]
+    # time a shopper waited for a placed order, failed tries before it included
+    checkout_latencies = [sum(ms for _, ms in attempts) for attempts in carts if attempts[-1][0] == "ok"]
+    violations, units_sold = verify_stock(cur, item_ids, before, first_order_id)
+    cur.close()
+    conn.close()
+
+    report = {
+        "checkouts": len(carts),
+        "attempts": len(results),
+        "wall_s": wall,
+        "orders_per_s": counts.get("ok", 0) / wall if wall else 0.0,
+        "outcomes": counts,
+        "attempt_outcomes": attempt_counts,
+        "failed_checkouts": len(carts) - counts.get("ok", 0),
+        "rollbacks": len(results) - attempt_counts.get("ok", 0),
+        "latency_ok": latency_summary(ok_latencies),
+        "latency_all": latency_summary(all_latencies),
+        "latency_checkout": latency_summary(checkout_latencies),
+        "holds": holds if args.reserve else None,
+        "units_sold": units_sold,
+        "stock_violations": violations
+    }
+
+    print(f"\nOrders/sec:        {report['orders_per_s']:.1f} ({counts.get('ok', 0)} placed in {wall:.1f}s)")
+    print(f"Checkouts:         {len(carts)} carts | {len(results)} attempts ({len(results) - len(carts)} retries)")
+    print(f"Outcomes:          {counts} per cart")
+    print(f"Attempts:          {attempt_counts}")
+    print(f"Rollbacks:         {report['rollbacks']} attempts rolled back | "
+          f"{report['failed_checkouts']} carts not placed")
+    if args.reserve:
+        print(f"Cart holds:        {holds['lines_held']} lines held | {holds['lines_refused']} refused "
+              f"({holds['conflicts']} lock conflicts) | {holds['empty_carts']} carts never reached checkout")
+    lat = report["latency_ok"]
+    print(f"Latency (placed):  p50 {lat['p50_ms']:.1f} ms | p95 {lat['p95_ms']:.1f} ms | p99 {lat['p99_ms']:.1f} ms")
+    lat = report["latency_checkout"]
+    print(f"Latency (retried): p50 {lat['p50_ms']:.1f} ms | p95 {lat['p95_ms']:.1f} ms | p99 {lat['p99_ms']:.1f} ms")
+    print(f"Units sold:        {units_sold}")
+    if violations:
+        print(f"✗ Stock invariant violated ({len(violations)}):")
+        for violation in violations[:20]:
+            print(f"  - {violation}")
+    else:
+        print("✓ Stock invariant holds: no negative stock, no oversell")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Results written to {args.output}")
+    return report
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Concurrent checkout load generator")
+    parser.add_argument("--host")
+    parser.add_argument("--user")
+    parser.add_argument("--password")
+    parser.add_argument("--database")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--checkouts", type=int, default=1000, help="total checkouts across all workers")
+    parser.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    parser.add_argument("--min-lines", type=int, default=1, help="minimum cart lines")
+    parser.add_argument("--max-lines", type=int, default=5, help="maximum cart lines")
+    parser.add_argument("--hot-items", type=int, default=5, help="number of hot items")
+    parser.add_argument("--hot-share", type=float, default=0.5, help="share of cart lines that hit hot items")
+    parser.add_argument("--rest-id", type=int, help="only use this restaurant's menu")
+    parser.add_argument("--items", type=int, help="only use the first N menu items")
+    parser.add_argument("--restock", type=int, help="set stock of the used items to this before the run")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="write this many checkouts per commit (group commit, as the async order queue does)")
+    parser.add_argument("--reserve", action="store_true", help="hold stock for each cart line before checkout")
+    parser.add_argument("--client-side", action="store_true",
+                        help="check out with statements sent from Python instead of one CALL Checkout")
+    parser.add_argument("--retries", type=int, default=0, help="retry deadlocked checkouts this many times")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the report as JSON")
+    return parser
+
+if __name__ == "__main__":
+    args = build_parser().parse_args()
+    try:
+        report = run(args)
+    except Error as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    raise SystemExit(1 if report is None or report["stock_violations"] else 0)
@@ -0,0 +1,333 @@
+"""
+FoodDelight application queries
+- Every SQL statement the Streamlit app runs against the hot paths, in one place
+- dbmstest1.py executes them; createfoodappdatabase.py --check-plans EXPLAINs
+  them and benchmark.py times them, so the checked SQL is the SQL that ships
+- Keyset paging helpers for the admin grids
+
+Nothing here opens a connection or imports Streamlit.
+"""
+
+# -------------------- AUTH --------------------
+CREDENTIAL_QUERY = "SELECT principal_id, password_hash FROM credentials WHERE role=%s AND login=%s"
+
+PRINCIPAL_QUERIES = {
+    "user": ("SELECT user_id, name, email, phone, address FROM user WHERE user_id=%s",
+             ["user_id", "name", "email", "phone", "address"]),
+    "partner": ("SELECT partner_id, name, phone FROM deliverypartner WHERE partner_id=%s",
+                ["partner_id", "name", "phone"])
+}
+
+# Accounts without credentials yet (login = email or name, password = phone).
+# Each branch is an index lookup; a match gets its credentials written
+LEGACY_LOGIN_QUERIES = {
+    "user": ("""
+        SELECT user_id, name, email, phone, address FROM user u
+        WHERE email=%s AND phone=%s
+          AND NOT EXISTS (SELECT 1 FROM credentials c WHERE c.role='user' AND c.principal_id=u.user_id)
+        UNION
+        SELECT user_id, name, email, phone, address FROM user u
+        WHERE name=%s AND phone=%s
+          AND NOT EXISTS (SELECT 1 FROM credentials c WHERE c.role='user' AND c.principal_id=u.user_id)
+    """, lambda login, password: (login, password, login, password)),
+    "partner": ("""
+        SELECT partner_id, name, phone FROM deliverypartner dp
+        WHERE name=%s AND phone=%s
+          AND NOT EXISTS (SELECT 1 FROM credentials c WHERE c.role='partner' AND c.principal_id=dp.partner_id)
+    """, lambda login, password: (login, password))
+}
+
+# -------------------- KPI SNAPSHOT --------------------
+# Counters are split into slots (see COUNTER_SLOTS in createfoodappdatabase.py)
+KPI_QUERY = "SELECT name, SUM(value) FROM kpi_counters GROUP BY name"
+
+# Used only when kpi_counters is empty (e.g. a database created before the counters existed)
+KPI_FALLBACK_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM orders) AS total_orders,
+        (SELECT COALESCE(SUM(total_amt), 0) FROM orders WHERE status='Delivered') AS delivered_revenue,
+        (SELECT COUNT(*) FROM user) AS total_users,
+        (SELECT COUNT(*) FROM restaurant) AS total_restaurants,
+        (SELECT COALESCE(SUM(rating), 0) FROM restaurant) AS restaurant_rating_sum,
+        (SELECT COUNT(rating) FROM restaurant) AS rated_restaurants,
+        (SELECT COUNT(*) FROM deliverypartner) AS total_partners
+"""
+
+# -------------------- MENU CATALOG --------------------
+CATALOG_RESTAURANTS_QUERY = "SELECT rest_id, name, address, rating FROM restaurant ORDER BY rating DESC"
+CATALOG_ITEMS_QUERY = "SELECT item_id, name, price, quantity, rest_id, updated_at FROM menuitem ORDER BY item_id"
+CATALOG_STOCK_DELTA_QUERY = """
+    SELECT item_id, name, price, quantity, rest_id, updated_at
+    FROM menuitem WHERE updated_at > %s
+"""
+
+# -------------------- CART AND CHECKOUT --------------------
+CART_HOLD_EXPIRY_QUERY = "SELECT MIN(expires_at) FROM stock_reservation WHERE cart_id=%s AND expires_at > NOW(3)"
+
+# SKIP LOCKED leaves holds that a checkout is converting right now alone
+RESERVATION_SWEEP_QUERY = """
+    SELECT res_id, item_id, quantity FROM stock_reservation
+    WHERE expires_at < NOW(3)
+    ORDER BY expires_at
+    LIMIT %s
+    FOR UPDATE SKIP LOCKED
+"""
+
+# Least-loaded, then highest-rated partner; partner_load is kept current by triggers
+# and idx_partner_load_pick turns this into a single index dive
+PARTNER_ASSIGNMENT_QUERY = """
+    SELECT partner_id FROM partner_load
+    ORDER BY active_orders, rating DESC
+    LIMIT 1
+"""
+
+# -------------------- DELIVERY PARTNER --------------------
+PARTNER_ORDER_SELECT = """
+    SELECT o.order_id, u.name as customer, u.address, o.total_amt, o.status,
+           p.status as payment_status, p.pay_id, p.method as payment_method, o.order_date
+    FROM orders o
+    JOIN user u ON o.user_id = u.user_id
+    LEFT JOIN payment p ON o.pay_id = p.pay_id
+"""
+PARTNER_ORDERS_QUERY = PARTNER_ORDER_SELECT + " WHERE o.partner_id = %s"
+# {ids} is one %s per changed order id
+PARTNER_FEED_ORDERS_QUERY = PARTNER_ORDER_SELECT + " WHERE o.order_id IN ({ids}) AND o.partner_id = %s"
+
+PARTNER_FEED_HEAD_QUERY = "SELECT COALESCE(MAX(event_id), 0) FROM order_events"
+
+# One range on idx_order_events_partner (partner_id, event_id)
+PARTNER_FEED_EVENTS_QUERY = """
+    SELECT event_id, order_id FROM order_events
+    WHERE partner_id = %s AND event_id > %s
+    ORDER BY event_id
+    LIMIT %s
+"""
+
+# A few slot rows of trigger-maintained counters, however long the partner's history
+PARTNER_STATS_QUERY = """
+    SELECT
+        SUM(assigned_orders) as total_deliveries,
+        SUM(delivered_orders) as successful_deliveries,
+        SUM(total_value) / NULLIF(SUM(assigned_orders), 0) as avg_order_value,
+        SUM(total_value) as total_delivery_value,
+        MAX(last_delivery_at) as last_delivery_at
+    FROM partner_stats
+    WHERE partner_id = %s
+"""
+
+# Ten newest from each side, so a quiet partner's list fills from the archive
+PARTNER_RECENT_DELIVERIES_QUERY = """
+    SELECT o.order_id, u.name as customer, o.total_amt, o.status, o.order_date
+    FROM ((SELECT order_id, user_id, total_amt, status, order_date FROM orders
+           WHERE partner_id = %s ORDER BY order_date DESC LIMIT 10)
+          UNION ALL
+          (SELECT order_id, user_id, total_amt, status, order_date FROM orders_archive
+           WHERE partner_id = %s ORDER BY order_date DESC LIMIT 10)) o
+    JOIN user u ON o.user_id = u.user_id
+    ORDER BY o.order_date DESC
+    LIMIT 10
+"""
+
+# -------------------- USER --------------------
+USER_ORDERS_QUERY = """
+    SELECT o.order_id, o.order_date, o.total_amt, o.status,
+           dp.name as delivery_partner, p.status as payment_status, p.method as payment_method
+    FROM orders o
+    LEFT JOIN deliverypartner dp ON o.partner_id = dp.partner_id
+    LEFT JOIN payment p ON o.pay_id = p.pay_id
+    WHERE o.user_id=%s
+    UNION ALL
+    SELECT o.order_id, o.order_date, o.total_amt, o.status,
+           dp.name as delivery_partner, p.status as payment_status, p.method as payment_method
+    FROM orders_archive o
+    LEFT JOIN deliverypartner dp ON o.partner_id = dp.partner_id
+    LEFT JOIN payment_archive p ON o.pay_id = p.pay_id AND p.order_date = o.order_date
+    WHERE o.user_id=%s
+    ORDER BY order_date DESC
+"""
+
+USER_ORDER_COUNT_QUERY = """
+    SELECT (SELECT COUNT(*) FROM orders WHERE user_id=%s)
+         + (SELECT COUNT(*) FROM orders_archive WHERE user_id=%s)
+"""
+
+# Only delivered orders with paid payments count as spent
+USER_TOTAL_SPENT_QUERY = """
+    SELECT (SELECT COALESCE(SUM(o.total_amt), 0)
+            FROM orders o
+            JOIN payment p ON o.pay_id = p.pay_id
+            WHERE o.user_id=%s AND o.status='Delivered' AND p.status='Paid')
+         + (SELECT COALESCE(SUM(o.total_amt), 0)
+            FROM orders_archive o
+            JOIN payment_archive p ON o.pay_id = p.pay_id AND p.order_date = o.order_date
+            WHERE o.user_id=%s AND o.status='Delivered' AND p.status='Paid')
+"""
+
+# -------------------- ADMIN --------------------
+ADMIN_RECENT_ORDERS_QUERY = """
+    SELECT o.order_id, u.name as customer, o.total_amt, o.status, o.order_date
+    FROM orders o
+    JOIN user u ON o.user_id = u.user_id
+    ORDER BY o.order_date DESC
+    LIMIT 10
+"""
+
+ADMIN_MENU_ITEMS_QUERY = """
+    SELECT m.item_id, m.name, m.price, m.quantity, r.name as restaurant, r.rest_id
+    FROM menuitem m
+    JOIN restaurant r ON m.rest_id = r.rest_id
+    ORDER BY m.item_id
+"""
+
+ADMIN_PARTNERS_QUERY = "SELECT partner_id, name, phone, rating FROM deliverypartner ORDER BY partner_id"
+
+# Paginated grids: select_sql, from_sql and sort_keys as show_paginated_grid
+# takes them. sort_keys are (sql_expr, result_column), most significant first,
+# ending in a unique column so the ordering is total.
+ADMIN_ORDERS_GRID = {
+    "select_sql": """SELECT o.order_id, u.name as customer, o.total_amt, o.status,
+                  o.order_date, dp.name as delivery_partner, p.status as payment_status""",
+    "from_sql": """FROM orders o
+           LEFT JOIN user u ON o.user_id = u.user_id
+           LEFT JOIN deliverypartner dp ON o.partner_id = dp.partner_id
+           LEFT JOIN payment p ON o.pay_id = p.pay_id""",
+    "sort_keys": [("o.order_date", "order_date"), ("o.order_id", "order_id")]
+}
+
+ADMIN_PAYMENTS_GRID = {
+    "select_sql": "SELECT p.pay_id, p.method, p.amount, p.status, u.name as customer",
+    "from_sql": """FROM payment p
+           JOIN orders o ON p.pay_id = o.pay_id
+           JOIN user u ON o.user_id = u.user_id""",
+    "sort_keys": [("p.pay_id", "pay_id")]
+}
+
+ADMIN_USERS_GRID = {
+    "select_sql": "SELECT user_id, name, email, phone, address",
+    "from_sql": "FROM user",
+    "sort_keys": [("user_id", "user_id")],
+    "descending": False
+}
+
+# Row counts of the unfiltered order and payment grids. They page through the
+# hot tables only, while the KPI counters keep counting archived orders.
+GRID_COUNT_QUERIES = {
+    "orders": "SELECT COUNT(*) FROM orders",
+    # one grid row per order with a payment and a customer
+    "payments": "SELECT COUNT(*) FROM orders WHERE pay_id IS NOT NULL AND user_id IS NOT NULL"
+}
+
+def keyset_condition(sort_keys, cursor, descending=True):
+    """WHERE fragment selecting rows strictly after cursor in (k1, k2, ...) order."""
+    op = "<" if descending else ">"
+    clauses, params = [], []
+    for i, (expr, _) in enumerate(sort_keys):
+        parts = [f"{prev_expr} = %s" for prev_expr, _ in sort_keys[:i]] + [f"{expr} {op} %s"]
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(cursor[:i + 1])
+    return "(" + " OR ".join(clauses) + ")", params
+
+def order_by_clause(sort_keys, descending=True):
+    direction = "DESC" if descending else "ASC"
+    return ", ".join(f"{expr} {direction}" for expr, _ in sort_keys)
+
+def grid_page_query(select_sql, from_sql, sort_keys, conditions=(), params=(), cursor=None,
+                    descending=True):
+    """SQL and params of the grid page after cursor (None = first page).
+
+    The SQL ends in LIMIT %s; the caller appends the row limit to the params.
+    """
+    conditions, params = list(conditions), list(params)
+    if cursor is not None:
+        condition, cursor_params = keyset_condition(sort_keys, cursor, descending)
+        conditions.append(condition)
+        params.extend(cursor_params)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return (f"{select_sql} {from_sql} {where} ORDER BY {order_by_clause(sort_keys, descending)} LIMIT %s",
+            tuple(params))
+
+# -------------------- LIVE ANALYTICS --------------------
+TOP_SPENDING_USERS_QUERY = """
+    SELECT u.user_id, u.name, u.email,
+           SUM(o.total_amt) as total_spent,
+           COUNT(o.order_id) as total_orders
+    FROM user u
+    JOIN orders_history o ON u.user_id = o.user_id
+    WHERE o.status = 'Delivered'
+    GROUP BY u.user_id, u.name, u.email
+    ORDER BY total_spent DESC
+    LIMIT 10
+"""
+
+BEST_RATED_RESTAURANTS_QUERY = """
+    SELECT r.rest_id, r.name, r.rating, COUNT(DISTINCT oi.order_id) as total_orders
+    FROM restaurant r
+    LEFT JOIN menuitem m ON r.rest_id = m.rest_id
+    LEFT JOIN orderitem_history oi ON m.item_id = oi.item_id
+    WHERE r.rating IS NOT NULL
+    GROUP BY r.rest_id, r.name, r.rating
+    ORDER BY r.rating DESC
+    LIMIT 10
+"""
+
+# Read from the trigger-maintained daily_sales rollup
+REVENUE_BY_METHOD_QUERY = """
+    SELECT
+        method as payment_method,
+        SUM(order_count) as total_orders,
+        SUM(revenue_sum) as total_revenue,
+        SUM(revenue_sum) / SUM(order_count) as avg_order_value
+    FROM daily_sales
+    WHERE status = 'Delivered'
+    GROUP BY method
+    HAVING SUM(order_count) > 0
+    ORDER BY total_revenue DESC
+"""
+
+# Read the trigger-maintained partner_stats counters: a few slot rows per partner
+PARTNER_PERFORMANCE_QUERY = """
+    SELECT
+        dp.partner_id,
+        dp.name as partner_name,
+        dp.rating,
+        ps.assigned_orders as total_deliveries,
+        ps.delivered_orders as successful_deliveries,
+        ps.total_value / ps.assigned_orders as avg_order_value
+    FROM (SELECT partner_id, SUM(assigned_orders) AS assigned_orders,
+                 SUM(delivered_orders) AS delivered_orders, SUM(total_value) AS total_value
+          FROM partner_stats GROUP BY partner_id) ps
+    JOIN deliverypartner dp ON dp.partner_id = ps.partner_id
+    WHERE ps.assigned_orders > 0
+    ORDER BY successful_deliveries DESC, dp.rating DESC
+"""
+
+# Read from the daily_sales rollup: cost grows with days, not orders.
+# Contains literal % characters: run it without parameters.
+MONTHLY_SALES_TREND_QUERY = """
+    SELECT
+        DATE_FORMAT(sale_date, '%Y-%m') as month,
+        SUM(order_count) as total_orders,
+        SUM(revenue_sum) as total_revenue,
+        SUM(revenue_sum) / SUM(order_count) as avg_order_value
+    FROM daily_sales
+    WHERE sale_date >= DATE(DATE_SUB(NOW(), INTERVAL 6 MONTH))
+    GROUP BY DATE_FORMAT(sale_date, '%Y-%m')
+    HAVING SUM(order_count) > 0
+    ORDER BY month DESC
+"""
+
+POPULAR_MENU_ITEMS_QUERY = """
+    SELECT
+        m.item_id,
+        m.name as item_name,
+        r.name as restaurant,
+        SUM(oi.quantity) as total_ordered,
+        SUM(oi.quantity * oi.price) as total_revenue
+    FROM menuitem m
+    JOIN restaurant r ON m.rest_id = r.rest_id
+    JOIN orderitem_history oi ON m.item_id = oi.item_id
+    WHERE oi.status = 'Delivered'
+    GROUP BY m.item_id, m.name, r.name
+    ORDER BY total_ordered DESC
+    LIMIT 15
+"""
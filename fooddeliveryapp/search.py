@@ -0,0 +1,162 @@
+"""
+FoodDelight catalog search
+- In-memory inverted index over restaurant names/addresses and menu item names
+- Search-as-you-type: every query term also matches tokens it is a prefix of,
+  found by bisecting a sorted token list
+- Typo tolerance: a term that matches no token is expanded to the tokens that
+  share the most trigrams with it
+- Documents are put and removed one at a time, so a catalog edit re-indexes
+  only the rows that changed
+
+The index holds no database state; the menu catalog in dbmstest1.py feeds it.
+"""
+
+import bisect
+import heapq
+import re
+import unicodedata
+from collections import defaultdict
+
+# exact / prefix / fuzzy: score factor of a term matching a token that way
+# fuzzy_min: trigram (Dice) similarity a token needs to count as a typo of a term
+# fuzzy_terms: tokens a misspelled term expands to, best first
+# prefix_terms: tokens a prefix expands to (shortest first)
+SEARCH_CONFIG = {
+    "exact": 1.0,
+    "prefix": 0.8,
+    "fuzzy": 0.6,
+    "fuzzy_min": 0.45,
+    "fuzzy_terms": 5,
+    "prefix_terms": 50
+}
+
+# Field weights: a restaurant name outranks a dish name, which outranks an
+# address or the restaurant a dish belongs to
+SEARCH_WEIGHTS = {"restaurant_name": 3.0, "address": 1.0, "item_name": 2.0, "item_restaurant": 0.5}
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def normalize(text):
+    """Lower-case and strip accents, so "Café" finds "cafe"."""
+    text = unicodedata.normalize("NFKD", text or "")
+    return "".join(ch for ch in text if not unicodedata.combining(ch)).lower()
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(normalize(text))
+
+def trigrams(token):
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class SearchIndex:
+    """Weighted token postings plus prefix and trigram lookups over them.
+
+    A document is a key (any hashable) and a list of (text, weight) fields;
+    a token found in several fields keeps its highest weight. A result must
+    match every query term; its score is the sum over terms of the best
+    field weight times how the term matched (exact, prefix or fuzzy).
+    """
+
+    def __init__(self, exact=1.0, prefix=0.8, fuzzy=0.6, fuzzy_min=0.45, fuzzy_terms=5, prefix_terms=50):
+        self.factors = {"exact": exact, "prefix": prefix, "fuzzy": fuzzy}
+        self.fuzzy_min = fuzzy_min
+        self.fuzzy_terms = fuzzy_terms
+        self.prefix_terms = prefix_terms
+        self._docs = {}                          # key -> {token: weight}
+        self._postings = {}                      # token -> {key: weight}
+        self._tokens = []                        # every indexed token, sorted
+        self._grams = defaultdict(set)           # trigram -> tokens containing it
+
+    def __len__(self):
+        return len(self._docs)
+
+    def put(self, key, fields):
+        """Index or re-index one document; returns False when nothing changed."""
+        weights = {}
+        for text, weight in fields:
+            for token in tokenize(text):
+                weights[token] = max(weight, weights.get(token, 0))
+        if self._docs.get(key) == weights:
+            return False
+        self.remove(key)
+        self._docs[key] = weights
+        for token, weight in weights.items():
+            posting = self._postings.get(token)
+            if posting is None:
+                posting = self._postings[token] = {}
+                bisect.insort(self._tokens, token)
+                for gram in trigrams(token):
+                    self._grams[gram].add(token)
+            posting[key] = weight
+        return True
+
+    def remove(self, key):
+        weights = self._docs.pop(key, None)
+        if not weights:
+            return
+        for token in weights:
+            posting = self._postings[token]
+            posting.pop(key, None)
+            if not posting:
+                del self._postings[token]
+                del self._tokens[bisect.bisect_left(self._tokens, token)]
+                for gram in trigrams(token):
+                    self._grams[gram].discard(token)
+                    if not self._grams[gram]:
+                        del self._grams[gram]
+
+    def keys(self):
+        return set(self._docs)
+
+    def _expand(self, term):
+        """Indexed tokens a query term matches, with their match factor."""
+        matches = {}
+        if term in self._postings:
+            matches[term] = self.factors["exact"]
+        start = bisect.bisect_right(self._tokens, term)
+        for token in self._tokens[start:start + self.prefix_terms]:
+            if not token.startswith(term):
+                break
+            # Shorter completions rank higher: "pan" prefers "paneer" to "pancakes"
+            matches[token] = self.factors["prefix"] * (0.5 + 0.5 * len(term) / len(token))
+        if matches or len(term) < 3:
+            return matches
+
+        term_grams = trigrams(term)
+        shared = defaultdict(int)
+        for gram in term_grams:
+            for token in self._grams.get(gram, ()):
+                shared[token] += 1
+        scored = []
+        for token, count in shared.items():
+            similarity = 2 * count / (len(term_grams) + len(trigrams(token)))
+            if similarity >= self.fuzzy_min:
+                scored.append((similarity, token))
+        for similarity, token in heapq.nlargest(self.fuzzy_terms, scored):
+            matches[token] = self.factors["fuzzy"] * similarity
+        return matches
+
+    def search(self, query, limit=20):
+        """Best-scoring keys matching every term of query, as (score, key) pairs."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        scores = None
+        for term in terms:
+            best = {}
+            for token, factor in self._expand(term).items():
+                for key, weight in self._postings[token].items():
+                    score = factor * weight
+                    if score > best.get(key, 0):
+                        best[key] = score
+            if scores is None:
+                scores = best
+            else:
+                scores = {key: score + best[key] for key, score in scores.items() if key in best}
+            if not scores:
+                return []
+        return heapq.nlargest(limit, ((score, key) for key, score in scores.items()),
+                              key=lambda hit: hit[0])
+
+    def stats(self):
+        return {"documents": len(self._docs), "tokens": len(self._tokens), "trigrams": len(self._grams)}
@@ -0,0 +1,108 @@
+"""place_order_batch against a scripted connection (no MySQL server needed)."""
+import logging
+import os
+import sys
+
+import mysql.connector
+import pytest
+import streamlit.logger
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# dbmstest1 is a Streamlit script; outside `streamlit run` it only warns about the missing runtime
+streamlit.logger.set_log_level(logging.ERROR)
+from dbmstest1 import place_order_batch  # noqa: E402
+
+class FakeCursor:
+    """Answers the statements write_order and place_order_batch issue.
+
+    Orders for a user in bad_users fail like a foreign key violation would;
+    writes since a savepoint are dropped when the batch rolls back to it.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.rows = []
+        self.rowcount = 0
+        self.lastrowid = None
+
+    def execute(self, query, params=()):
+        sql = " ".join(query.split())
+        self.rows, self.rowcount = [], 1
+        if sql.startswith("SAVEPOINT"):
+            self.conn.savepoints[sql.split()[1]] = len(self.conn.writes)
+        elif sql.startswith("ROLLBACK TO SAVEPOINT"):
+            del self.conn.writes[self.conn.savepoints[sql.split()[-1]]:]
+        elif sql.startswith("SELECT item_id, quantity FROM menuitem"):
+            self.rows = [(item_id, 100) for item_id in params]
+        elif sql.startswith("SELECT"):
+            self.rows = [(1,)] if "deliverypartner" in sql or "partner_load" in sql else []
+        elif sql.startswith("INSERT INTO payment"):
+            self.conn.writes.append(("payment", params))
+            self.lastrowid = len(self.conn.writes)
+        elif sql.startswith("INSERT INTO orders"):
+            if params[0] in self.conn.bad_users:
+                raise self.conn.error
+            self.conn.writes.append(("orders", params))
+            self.lastrowid = len(self.conn.writes)
+        elif sql.startswith("INSERT INTO order_intake"):
+            self.conn.writes.append(("order_intake", params))
+        elif sql.startswith("UPDATE menuitem"):
+            self.rowcount = sql.count("%s") // 3
+
+    def executemany(self, query, rows):
+        self.conn.writes.extend(("orderitem", row) for row in rows)
+
+    def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    def fetchall(self):
+        return self.rows
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self, bad_users=(), error=None):
+        self.bad_users = set(bad_users)
+        self.error = error or mysql.connector.errors.IntegrityError(
+            msg="Cannot add or update a child row: a foreign key constraint fails", errno=1452)
+        self.writes = []
+        self.savepoints = {}
+        self.committed = None
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def start_transaction(self):
+        self.writes, self.savepoints = [], {}
+
+    def commit(self):
+        self.committed = list(self.writes)
+
+    def rollback(self):
+        self.rolled_back = True
+        self.writes = []
+
+def entry(key, user_id):
+    return {'intake_key': key, 'user_id': user_id, 'payment_method': 'UPI', 'cart_id': None,
+            'cart': [{'item_id': 7, 'name': 'Dosa', 'price': 80, 'quantity': 2}]}
+
+def test_bad_entry_fails_alone():
+    conn = FakeConnection(bad_users={99})
+    results = place_order_batch(conn, [entry("a", 1), entry("b", 99), entry("c", 2)])
+    assert results["b"][0] is None and "foreign key" in results["b"][1]
+    assert results["a"][0] and results["c"][0] and results["a"][1] is None and results["c"][1] is None
+    intake = [params[0] for table, params in conn.committed if table == "order_intake"]
+    users = [params[0] for table, params in conn.committed if table == "orders"]
+    assert intake == ["a", "c"]
+    assert users == [1, 2]
+    assert not conn.rolled_back
+
+def test_deadlock_fails_whole_batch():
+    deadlock = mysql.connector.errors.InternalError(msg="Deadlock found", errno=1213)
+    conn = FakeConnection(bad_users={99}, error=deadlock)
+    with pytest.raises(mysql.connector.errors.InternalError):
+        place_order_batch(conn, [entry("a", 1), entry("b", 99)])
+    assert conn.rolled_back and conn.committed is None